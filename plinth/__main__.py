@@ -4,10 +4,11 @@
 import argparse
 import importlib
 import logging
+import os
 import sys
 
 from . import (__version__, cfg, frontpage, glib, log, menu, module_loader,
-               setup, utils, web_framework, web_server)
+               profiler, setup, utils, web_framework, web_server)
 
 if utils.is_axes_old():
     import axes
@@ -42,6 +43,12 @@ def parse_arguments():
                         help='list package dependencies for essential modules')
     parser.add_argument('--list-modules', default=False, nargs='*',
                         help='list modules')
+    parser.add_argument(
+        '--profile-startup', default=None, nargs='?', const='',
+        metavar='FILE',
+        help=('log time and memory taken by each step of startup and write '
+              'them as JSON to FILE (default: startup-profile.json in data '
+              'directory)'))
 
     return parser.parse_args()
 
@@ -86,10 +93,10 @@ def list_modules(modules_type):
 
 def run_diagnostics_and_exit():
     """Run diagostics on all modules and exit."""
-    module = importlib.import_module('plinth.modules.diagnostics.diagnostics')
+    module = importlib.import_module('plinth.modules.diagnostics')
     error_code = 0
     try:
-        module.run_on_all_modules()
+        module.run_on_all_enabled_modules()
     except Exception as exception:
         logger.exception('Error running diagnostics - %s', exception)
         error_code = 2
@@ -122,6 +129,9 @@ def main():
     """Initialize and start the application"""
     arguments = parse_arguments()
 
+    if arguments.profile_startup is not None:
+        profiler.start()
+
     if arguments.develop:
         # use the root and plinth.config of the current working directory
         config_path, root_directory = cfg.get_fallback_config_paths()
@@ -131,6 +141,11 @@ def main():
 
     adapt_config(arguments)
 
+    if arguments.list_dependencies is not False or \
+       arguments.list_modules is not False:
+        # Information from all the modules is needed
+        cfg.lazy_app_loading = False
+
     log.init()
 
     web_framework.init()
@@ -166,6 +181,11 @@ def main():
     glib.run()
 
     web_server.init()
+
+    if arguments.profile_startup is not None:
+        profiler.finish(arguments.profile_startup or os.path.join(
+            cfg.data_dir, 'startup-profile.json'))
+
     web_server.run(on_web_server_stop)
 
 
@@ -0,0 +1,429 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Long running privileged process that executes actions on behalf of FreedomBox
+Service.
+
+Running an action with sudo means spawning sudo, a new Python interpreter and
+importing all the modules needed by the action for every call. The action
+server is an opt-in alternative. It runs as root, imports all the Python
+actions once during startup and listens on a Unix socket. For each request, it
+forks a copy of itself and runs the main() function of the already imported
+action with the given options, input and standard file descriptors. Each
+action still runs in its own process, so any global state an action modifies
+does not leak into subsequent actions.
+
+Actions that can't be imported (for example, non-Python scripts or scripts that
+changed on disk after the server started) are executed as usual with exec()
+from the forked process.
+
+The protocol is simple. Client connects, writes a JSON encoded request and
+closes its writing end. Server writes a JSON encoded response and closes the
+connection. Binary data (input, output and error) is base64 encoded.
+
+Request: {"action": "name", "options": ["a", "b"], "input": "base64"}
+
+Response: {"returncode": 0, "output": "base64", "error": "base64"}
+       or {"exception": "message"} if the request was rejected.
+
+Only connections from root and from the configured user are served. Contract
+checks described in plinth.actions are performed by the client and repeated by
+the server.
+
+The 'batch' action uses the same request and response format to run a list of
+actions in a single privileged process. It reads a JSON list of requests on
+its standard input and prints a JSON list of responses. Under the action
+server, actions run by it are already imported.
+
+"""
+
+import argparse
+import base64
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import os
+import pwd
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import traceback
+
+from plinth import cfg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '/run/plinth/actions.socket'
+
+BATCH_ACTION = 'batch'
+
+_loaded_actions = {}
+
+
+class ActionServerUnavailable(Exception):
+    """Raised when a connection could not be made to the action server."""
+
+
+def load_actions(actions_dir):
+    """Import all Python actions in the actions directory."""
+    for entry in sorted(os.scandir(actions_dir), key=lambda item: item.name):
+        if entry.name.startswith('.') or not entry.is_file():
+            continue
+
+        load_action(entry.name, entry.path)
+
+    logger.info('Imported actions - %s', sorted(_loaded_actions))
+
+
+def load_action(action, path):
+    """Import an action if it is a Python script.
+
+    Actions that fail to import are later executed as separate programs.
+
+    """
+    if not _is_python_script(path):
+        return
+
+    try:
+        module = _import_action(action, path)
+    except BaseException as exception:
+        logger.warning('Unable to import action %s, will execute it: %s',
+                       action, exception)
+        return
+
+    _loaded_actions[action] = (os.stat(path).st_mtime, module)
+
+
+def _is_python_script(path):
+    """Return whether a file is a Python script by looking at its shebang."""
+    with open(path, 'rb') as file_handle:
+        first_line = file_handle.readline()
+
+    return first_line.startswith(b'#!') and b'python' in first_line
+
+
+def _import_action(name, path):
+    """Import an action script as module without running its main()."""
+    module_name = 'plinth_action_' + name.replace('-', '_')
+    loader = importlib.machinery.SourceFileLoader(module_name, path)
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    if not callable(getattr(module, 'main', None)):
+        raise AttributeError('Action does not have main()')
+
+    return module
+
+
+def _get_loaded_action(action, path):
+    """Return the imported action module if it is still current."""
+    try:
+        mtime, module = _loaded_actions[action]
+    except KeyError:
+        return None
+
+    try:
+        if os.stat(path).st_mtime != mtime:
+            return None
+    except OSError:
+        return None
+
+    return module
+
+
+def get_action_path(action):
+    """Return path to an action after validating it.
+
+    Validation is same as the contract checks 3A, 3B, 3C and 3E in
+    plinth.actions.
+
+    """
+    if not isinstance(action, str) or not action:
+        raise ValueError('Action must be a non-empty string.')
+
+    if os.sep in action:
+        raise ValueError('Action cannot contain: ' + os.sep)
+
+    path = os.path.join(cfg.actions_dir, action)
+    if not os.path.realpath(path).startswith(cfg.actions_dir):
+        raise ValueError('Action has to be in directory %s' % cfg.actions_dir)
+
+    if not os.access(path, os.F_OK):
+        raise ValueError('Action must exist in action directory.')
+
+    return path
+
+
+def _validate_options(options):
+    """Raise ValueError if options are not a list of strings."""
+    if not isinstance(options, (list, tuple)) or \
+       not all(isinstance(option, str) for option in options):
+        raise ValueError('Options must be list or tuple.')
+
+
+def run_action(action, options, input=None):
+    """Run an action in a forked process and return its results.
+
+    Return a tuple of return code, output and error. Output and error are
+    bytes.
+
+    """
+    path = get_action_path(action)
+    _validate_options(options)
+
+    with tempfile.TemporaryFile() as stdin, \
+            tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        if input:
+            stdin.write(input)
+            stdin.seek(0)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            returncode = 1
+            try:
+                os.dup2(stdin.fileno(), 0)
+                os.dup2(stdout.fileno(), 1)
+                os.dup2(stderr.fileno(), 2)
+                returncode = _execute_action(action, path, options)
+            finally:
+                os._exit(returncode)
+
+        _, status = os.waitpid(pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return returncode, stdout.read(), stderr.read()
+
+
+def _execute_action(action, path, options):
+    """Run action in the current (forked) process and return exit code."""
+    module = _get_loaded_action(action, path)
+    if not module:
+        os.execv(path, [path] + list(options))
+
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', closefd=False)
+    sys.stderr = open(2, 'w', closefd=False)
+    sys.argv = [path] + list(options)
+    try:
+        module.main()
+        returncode = 0
+    except SystemExit as exception:
+        returncode = _get_exit_code(exception.code)
+    except BaseException:
+        traceback.print_exc()
+        returncode = 1
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return returncode
+
+
+def _get_exit_code(code):
+    """Return process exit code similar to interpreter for sys.exit(code)."""
+    if code is None:
+        return 0
+
+    if isinstance(code, int):
+        return code
+
+    print(code, file=sys.stderr)
+    return 1
+
+
+def encode_request(action, options, input=None):
+    """Return a request to run an action that can be JSON encoded."""
+    request = {'action': action, 'options': list(options or [])}
+    if input is not None:
+        request['input'] = base64.b64encode(input).decode()
+
+    return request
+
+
+def decode_response(response):
+    """Return return code, output and error bytes from a response."""
+    return (response['returncode'], base64.b64decode(response['output']),
+            base64.b64decode(response['error']))
+
+
+def handle_batch_request(requests):
+    """Run a list of decoded requests and return a list of responses.
+
+    Actions that are not yet imported are imported before they are run. This
+    way, they are imported once even if they are run multiple times.
+
+    """
+    responses = []
+    for request in requests:
+        action = request.get('action')
+        if action == BATCH_ACTION:
+            responses.append({'exception': 'Batch action cannot be nested.'})
+            continue
+
+        try:
+            path = get_action_path(action)
+        except ValueError as exception:
+            responses.append({'exception': str(exception)})
+            continue
+
+        if not _get_loaded_action(action, path):
+            load_action(action, path)
+
+        responses.append(handle_request(request))
+
+    return responses
+
+
+def handle_request(request):
+    """Process a decoded request and return a response to be encoded."""
+    try:
+        input_ = request.get('input')
+        if input_ is not None:
+            input_ = base64.b64decode(input_)
+
+        returncode, output, error = run_action(request.get('action'),
+                                               request.get('options', []),
+                                               input_)
+    except ValueError as exception:
+        return {'exception': str(exception)}
+
+    return {
+        'returncode': returncode,
+        'output': base64.b64encode(output).decode(),
+        'error': base64.b64encode(error).decode(),
+    }
+
+
+def _get_peer_uid(connection):
+    """Return the user ID of the process on the other end of a connection."""
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                        struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single request from a client."""
+
+    def handle(self):
+        """Read a request, run the action and write the response."""
+        uid = _get_peer_uid(self.request)
+        if uid not in self.server.allowed_uids:
+            logger.warning('Rejecting connection from user ID %s', uid)
+            return
+
+        try:
+            request = json.loads(self.rfile.read().decode())
+        except ValueError:
+            response = {'exception': 'Invalid request.'}
+        else:
+            response = handle_request(request)
+
+        self.wfile.write(json.dumps(response).encode())
+
+
+class ActionServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handling each connection in a forked process."""
+
+    def __init__(self, socket_path, allowed_uids):
+        """Initialize the server and listen on the given socket path."""
+        self.allowed_uids = set(allowed_uids)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        super().__init__(socket_path, _RequestHandler)
+
+
+def send_request(socket_path, request):
+    """Send a request to the action server and return the response.
+
+    Raise ActionServerUnavailable if connection to the server could not be
+    established. Once the request is sent, any failure is raised as is.
+
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            client.connect(socket_path)
+        except OSError as exception:
+            raise ActionServerUnavailable(str(exception))
+
+        client.sendall(json.dumps(request).encode())
+        client.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+
+            chunks.append(chunk)
+    finally:
+        client.close()
+
+    return json.loads(b''.join(chunks).decode())
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Privileged action server for FreedomBox Service',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--socket', default=None,
+                        help='path of the Unix socket to listen on')
+    parser.add_argument('--user', default='plinth',
+                        help='user allowed to connect in addition to root')
+    parser.add_argument('--develop', action='store_true', default=False,
+                        help='use configuration from current source folder')
+    return parser.parse_args()
+
+
+def _read_config(develop):
+    """Read configuration from source folder or from default location."""
+    if develop:
+        cfg.read(*cfg.get_fallback_config_paths())
+    else:
+        cfg.read()
+
+
+def main():
+    """Start the action server and serve requests forever."""
+    arguments = parse_arguments()
+    _read_config(arguments.develop)
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(name)s: %(levelname)s: %(message)s')
+
+    socket_path = arguments.socket or cfg.action_server_socket or \
+        DEFAULT_SOCKET
+    user = pwd.getpwnam(arguments.user)
+
+    load_actions(cfg.actions_dir)
+    # Actions may read the default configuration when imported
+    _read_config(arguments.develop)
+
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    old_umask = os.umask(0o117)
+    try:
+        server = ActionServer(socket_path, {0, user.pw_uid})
+    finally:
+        os.umask(old_umask)
+
+    os.chown(socket_path, 0, user.pw_gid)
+
+    logger.info('Listening for action requests on %s', socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+if __name__ == '__main__':
+    main()
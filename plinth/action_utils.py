@@ -9,6 +9,8 @@ import shutil
 import subprocess
 import tempfile
 
+from plinth import systemd
+
 logger = logging.getLogger(__name__)
 
 UWSGI_ENABLED_PATH = '/etc/uwsgi/apps-enabled/{config_name}.ini'
@@ -29,8 +31,13 @@ def service_daemon_reload():
 def service_is_running(servicename):
     """Return whether a service is currently running.
 
-    Does not need to run as root.
+    Does not need to run as root. Answered from systemd unit state cache when
+    available.
     """
+    is_running = systemd.is_running(servicename)
+    if is_running is not None:
+        return is_running
+
     try:
         if is_systemd_running():
             subprocess.run(['systemctl', 'status', servicename], check=True,
@@ -54,7 +61,13 @@ def service_is_enabled(service_name, strict_check=False):
     query. Until we understand better, a conservative work around is to pass
     strict=True to services effected by this behavior.
 
+    Answered from systemd unit state cache when available.
+
     """
+    is_enabled = systemd.is_enabled(service_name, strict_check=strict_check)
+    if is_enabled is not None:
+        return is_enabled
+
     try:
         process = subprocess.run(['systemctl', 'is-enabled', service_name],
                                  check=True, stdout=subprocess.PIPE,
@@ -73,15 +73,21 @@ Actions run commands with this contract (version 1.1):
 
 7. Option
 
+8. (optimization) When an action server is configured and reachable,
+   super-user actions that are not run in background are executed by it
+   instead of through sudo.  All the above promises and restrictions hold.  See
+   plinth.action_server for more information.
+
 """
 
+import json
 import logging
 import os
 import re
 import shlex
 import subprocess
 
-from plinth import cfg
+from plinth import action_server, cfg
 from plinth.errors import ActionError
 
 logger = logging.getLogger(__name__)
@@ -105,6 +111,41 @@ def superuser_run(action, options=None, input=None, run_in_background=False,
                 log_error=log_error)
 
 
+def run_batch(commands, log_error=True):
+    """Run a list of actions as root in a single privileged invocation.
+
+    'commands' is a list of (action, options, input) tuples with the same
+    meaning as the arguments to superuser_run(). Actions run one after the
+    other in the given order. Failure of an action does not prevent the
+    following actions from running.
+
+    Return a list containing an (output, error) tuple for each command. 'error'
+    is None if the action succeeded or an ActionError instance otherwise.
+
+    All contract checks are performed on all the commands before any of them
+    are run. See actions._run for more information.
+
+    """
+    requests = []
+    for action, options, input_ in commands:
+        options = options or []
+        cmd = _get_command(action, options)
+        _log_command(['sudo', '-n'] + cmd)
+        requests.append(action_server.encode_request(action, options, input_))
+
+    if not requests:
+        return []
+
+    output = superuser_run(action_server.BATCH_ACTION,
+                           input=json.dumps(requests).encode())
+    responses = json.loads(output)
+
+    return [
+        _get_response_result(action, options, response, log_error)
+        for (action, options, _), response in zip(commands, responses)
+    ]
+
+
 def run_as_user(action, options=None, input=None, run_in_background=False,
                 become_user=None):
     """Run a command as a different user.
@@ -133,31 +174,7 @@ def _run(action, options=None, input=None, run_in_background=False,
     if options is None:
         options = []
 
-    # Contract 3A and 3B: don't call anything outside of the actions directory.
-    if os.sep in action:
-        raise ValueError('Action cannot contain: ' + os.sep)
-
-    cmd = os.path.join(cfg.actions_dir, action)
-    if not os.path.realpath(cmd).startswith(cfg.actions_dir):
-        raise ValueError('Action has to be in directory %s' % cfg.actions_dir)
-
-    # Contract 3C: interpret shell escape sequences as literal file names.
-    # Contract 3E: fail if the action doesn't exist or exists elsewhere.
-    if not os.access(cmd, os.F_OK):
-        raise ValueError('Action must exist in action directory.')
-
-    cmd = [cmd]
-
-    # Contract: 3C, 3D: don't allow shell special characters in
-    # options be interpreted by the shell.  When using
-    # subprocess.Popen with list invocation and not shell invocation,
-    # escaping is unnecessary as each argument is passed directly to
-    # the command and not parsed by a shell.
-    if options:
-        if not isinstance(options, (list, tuple)):
-            raise ValueError('Options must be list or tuple.')
-
-        cmd += list(options)  # No escaping necessary
+    cmd = _get_command(action, options)
 
     # Contract 1: commands can run via sudo.
     sudo_call = []
@@ -176,6 +193,13 @@ def _run(action, options=None, input=None, run_in_background=False,
 
     _log_command(cmd)
 
+    if run_as_root and not run_in_background and cfg.action_server_socket:
+        try:
+            return _run_on_action_server(action, options, input, log_error)
+        except action_server.ActionServerUnavailable as exception:
+            logger.warning('Action server unavailable, using sudo: %s',
+                           exception)
+
     # Contract 3C: don't interpret shell escape sequences.
     # Contract 5 (and 6-ish).
     kwargs = {
@@ -204,6 +228,84 @@ def _run(action, options=None, input=None, run_in_background=False,
     return proc
 
 
+def _get_command(action, options):
+    """Return the command for an action after performing contract checks."""
+    # Contract 3A and 3B: don't call anything outside of the actions directory.
+    if os.sep in action:
+        raise ValueError('Action cannot contain: ' + os.sep)
+
+    cmd = os.path.join(cfg.actions_dir, action)
+    if not os.path.realpath(cmd).startswith(cfg.actions_dir):
+        raise ValueError('Action has to be in directory %s' % cfg.actions_dir)
+
+    # Contract 3C: interpret shell escape sequences as literal file names.
+    # Contract 3E: fail if the action doesn't exist or exists elsewhere.
+    if not os.access(cmd, os.F_OK):
+        raise ValueError('Action must exist in action directory.')
+
+    cmd = [cmd]
+
+    # Contract: 3C, 3D: don't allow shell special characters in
+    # options be interpreted by the shell.  When using
+    # subprocess.Popen with list invocation and not shell invocation,
+    # escaping is unnecessary as each argument is passed directly to
+    # the command and not parsed by a shell.
+    if options:
+        if not isinstance(options, (list, tuple)):
+            raise ValueError('Options must be list or tuple.')
+
+        cmd += list(options)  # No escaping necessary
+
+    return cmd
+
+
+def _run_on_action_server(action, options, input, log_error):
+    """Run an action as root using the action server.
+
+    Raise action_server.ActionServerUnavailable if the server could not be
+    reached so that the caller may fall back to using sudo.
+
+    """
+    request = action_server.encode_request(action, options, input)
+    try:
+        response = action_server.send_request(cfg.action_server_socket,
+                                              request)
+    except action_server.ActionServerUnavailable:
+        raise
+    except (OSError, ValueError) as exception:
+        raise ActionError(action, '', str(exception))
+
+    output, error = _get_response_result(action, options, response, log_error)
+    if error:
+        raise error
+
+    return output
+
+
+def _get_response_result(action, options, response, log_error):
+    """Return output and ActionError (or None) from an action response.
+
+    A request rejected by the server, such as a nested batch or an action
+    failing the contract checks, results in an ActionError with the reason.
+
+    """
+    if 'exception' in response:
+        if log_error:
+            logger.error('Action rejected - %s, %s, %s', action, options,
+                         response['exception'])
+        return '', ActionError(action, '', response['exception'])
+
+    returncode, output, error = action_server.decode_response(response)
+    output, error = output.decode(), error.decode()
+    if returncode != 0:
+        if log_error:
+            logger.error('Error executing action - %s, %s, %s, %s', action,
+                         options, output, error)
+        return output, ActionError(action, output, error)
+
+    return output, None
+
+
 def _log_command(cmd):
     """Log a command with special pretty formatting to catch the eye."""
     cmd = list(cmd)  # Make a copy of the command not to affect the original
@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Cache data that is expensive to compute, such as status shown on app pages.
+
+Data is stored in the Django cache configured by the 'cache_backend' option.
+A function is cached by decorating it with :py:func:`cached` and given a key.
+Code that changes the data returned by the function must invalidate the key
+using :py:func:`invalidate` or the 'invalidate' attribute of the decorated
+function. All the data cached for a key, including data for different
+arguments of the function, is invalidated together.
+"""
+
+import functools
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'plinth:'
+
+DEFAULT_TIMEOUT = 300
+
+_MISSING = object()
+
+
+def _get_cache():
+    """Return the default Django cache."""
+    from django.core.cache import cache
+    return cache
+
+
+def _get_generation(key):
+    """Return the current generation of the data cached for a key."""
+    cache = _get_cache()
+    generation_key = KEY_PREFIX + key + ':generation'
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, uuid.uuid4().hex, None)
+        generation = cache.get(generation_key)
+
+    return generation
+
+
+def _make_key(key, generation, args, kwargs):
+    """Return the key for data cached for a key and function arguments."""
+    arguments = repr((args, sorted(kwargs.items())))
+    return '{}{}:{}:{}'.format(KEY_PREFIX, key, generation,
+                               uuid.uuid5(uuid.NAMESPACE_OID, arguments).hex)
+
+
+def cached(key, timeout=DEFAULT_TIMEOUT):
+    """Return a decorator to cache return values of a function.
+
+    key must be unique to the function. Arguments of the function, if any, are
+    made part of the actual key using their repr(). timeout is the number of
+    seconds after which the cached value is discarded.
+
+    """
+
+    def decorator(func):
+        """Wrap the function with caching."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            """Return value from cache or call the function and cache it."""
+            cache = _get_cache()
+            generation = _get_generation(key)
+            cache_key = _make_key(key, generation, args, kwargs)
+            value = cache.get(cache_key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            value = func(*args, **kwargs)
+            cache.set(cache_key, value, timeout)
+            return value
+
+        wrapper.invalidate = functools.partial(invalidate, key)
+        return wrapper
+
+    return decorator
+
+
+def invalidate(key):
+    """Discard all the data cached for a key."""
+    logger.debug('Invalidating cache for %s', key)
+    _get_cache().set(KEY_PREFIX + key + ':generation', uuid.uuid4().hex,
+                     None)
@@ -22,6 +22,31 @@ use_x_forwarded_host = False
 secure_proxy_ssl_header = None
 develop = False
 server_dir = '/'
+action_server_socket = None
+diagnostics_workers = 4
+diagnostics_timeout = 300
+cache_backend = 'locmem'
+lazy_app_loading = False
+init_workers = 1
+init_timeout = 30
+database_journal_mode = 'wal'
+database_synchronous = 'normal'
+database_cache_size = -8000
+database_mmap_size = 67108864
+database_conn_max_age = 600
+session_backend = 'cached_db'
+server_thread_pool = 10
+server_long_request_threads = 10
+server_socket_queue_size = 64
+server_socket_timeout = 10
+server_accepted_queue_size = -1
+server_accepted_queue_timeout = 10
+server_keep_alive = True
+server_static_precompressed = True
+server_static_max_age = 31536000
+backups_nice = 10
+backups_ionice = 'best-effort'
+backups_bandwidth_limit = 0
 
 config_file = None
 
@@ -96,9 +121,52 @@ def read(config_path=None, root_directory=None):
                          section, name)
             raise
         else:
-            if datatype == 'int':
-                value = int(value)
-            elif datatype == 'bool':
-                value = (value.lower() == 'true')
+            globals()[name] = _convert_value(value, datatype)
+
+    # Options that may be omitted from the configuration file
+    optional_config_items = (
+        ('Actions', 'action_server_socket', 'string', None),
+        ('Diagnostics', 'diagnostics_workers', 'int', 4),
+        ('Diagnostics', 'diagnostics_timeout', 'int', 300),
+        ('Cache', 'cache_backend', 'string', 'locmem'),
+        ('Apps', 'lazy_app_loading', 'bool', False),
+        ('Apps', 'init_workers', 'int', 1),
+        ('Apps', 'init_timeout', 'int', 30),
+        ('Database', 'database_journal_mode', 'string', 'wal'),
+        ('Database', 'database_synchronous', 'string', 'normal'),
+        ('Database', 'database_cache_size', 'int', -8000),
+        ('Database', 'database_mmap_size', 'int', 67108864),
+        ('Database', 'database_conn_max_age', 'int', 600),
+        ('Sessions', 'session_backend', 'string', 'cached_db'),
+        ('WebServer', 'server_thread_pool', 'int', 10),
+        ('WebServer', 'server_long_request_threads', 'int', 10),
+        ('WebServer', 'server_socket_queue_size', 'int', 64),
+        ('WebServer', 'server_socket_timeout', 'int', 10),
+        ('WebServer', 'server_accepted_queue_size', 'int', -1),
+        ('WebServer', 'server_accepted_queue_timeout', 'int', 10),
+        ('WebServer', 'server_keep_alive', 'bool', True),
+        ('WebServer', 'server_static_precompressed', 'bool', True),
+        ('WebServer', 'server_static_max_age', 'int', 31536000),
+        ('Backups', 'backups_nice', 'int', 10),
+        ('Backups', 'backups_ionice', 'string', 'best-effort'),
+        ('Backups', 'backups_bandwidth_limit', 'int', 0),
+    )
+
+    for section, name, datatype, default in optional_config_items:
+        try:
+            value = parser.get(section, name)
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            globals()[name] = default
+        else:
+            globals()[name] = _convert_value(value, datatype)
+
+
+def _convert_value(value, datatype):
+    """Convert a configuration value read as string into given datatype."""
+    if datatype == 'int':
+        return int(value)
+
+    if datatype == 'bool':
+        return value.lower() == 'true'
 
-            globals()[name] = value
+    return value
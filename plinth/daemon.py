@@ -3,14 +3,61 @@
 Component for managing a background daemon or any systemd unit.
 """
 
+import collections
+import contextlib
+import functools
 import socket
 import subprocess
+import threading
+import time
 
 import psutil
 from django.utils.translation import ugettext as _
 
 from plinth import action_utils, actions, app
 
+# Socket type and family (if restricted) of sockets for each kind of port
+_KINDS = {
+    'tcp': (socket.SOCK_STREAM, None),
+    'tcp4': (socket.SOCK_STREAM, None),
+    'tcp6': (socket.SOCK_STREAM, socket.AF_INET6),
+    'udp': (socket.SOCK_DGRAM, None),
+    'udp4': (socket.SOCK_DGRAM, None),
+    'udp6': (socket.SOCK_DGRAM, socket.AF_INET6),
+}
+
+# Socket snapshot and timings of diagnostic checks in the current thread
+_local = threading.local()
+
+
+def timed_check(function):
+    """Decorate a diagnostic check to record the time it takes.
+
+    The time is recorded only inside :func:`check_timings`. A check returning
+    a list of results runs them together and each of them is recorded with the
+    time of the whole call, unless it was already recorded by a check called
+    from it.
+
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start_time = time.monotonic()
+        results = function(*args, **kwargs)
+        timings = getattr(_local, 'check_timings', None)
+        if timings is not None:
+            duration = time.monotonic() - start_time
+            checks = results
+            if results and not isinstance(results[0], (list, tuple)):
+                checks = [results]
+
+            for test, _result in checks:
+                timings.setdefault(str(test), duration)
+
+        return results
+
+    return wrapper
+
 
 class Daemon(app.LeaderComponent):
     """Component to manage a background daemon or any systemd unit."""
@@ -80,6 +127,7 @@ class Daemon(app.LeaderComponent):
 
         return results
 
+    @timed_check
     def _diagnose_unit_is_running(self):
         """Check if a daemon is running."""
         message = _('Service {service_name} is running').format(
@@ -97,6 +145,7 @@ def app_is_running(app_):
     return True
 
 
+@timed_check
 def diagnose_port_listening(port, kind='tcp', listen_address=None):
     """Run a diagnostic on whether a port is being listened on.
 
@@ -119,15 +168,23 @@ def diagnose_port_listening(port, kind='tcp', listen_address=None):
 
 def _check_port(port, kind='tcp', listen_address=None):
     """Return whether a port is being listened on."""
-    run_kind = kind
+    connections = None
+    snapshot = getattr(_local, 'socket_snapshot', None)
+    if snapshot and kind in _KINDS:
+        connections = snapshot.get_connections(port, kind)
 
-    if kind == 'tcp4':
-        run_kind = 'tcp'
+    if connections is None:
+        run_kind = kind
 
-    if kind == 'udp4':
-        run_kind = 'udp'
+        if kind == 'tcp4':
+            run_kind = 'tcp'
 
-    for connection in psutil.net_connections(run_kind):
+        if kind == 'udp4':
+            run_kind = 'udp'
+
+        connections = psutil.net_connections(run_kind)
+
+    for connection in connections:
         # TCP connections must have status='listen'
         if kind in ('tcp', 'tcp4', 'tcp6') and \
            connection.status != psutil.CONN_LISTEN:
@@ -161,6 +218,81 @@ def _check_port(port, kind='tcp', listen_address=None):
     return False
 
 
+class SocketSnapshot:
+    """Index of all the internet sockets on the system.
+
+    The socket table is read once, on first use, and indexed by port and
+    socket type. Looking up sockets for a port is then independent of the
+    number of sockets on the system.
+
+    """
+
+    def __init__(self):
+        """Initialize the snapshot without reading the socket table."""
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_connections(self, port, kind):
+        """Return sockets with given local port and kind."""
+        socket_type, family = _KINDS[kind]
+        with self._lock:
+            if self._index is None:
+                self._index = collections.defaultdict(list)
+                for connection in psutil.net_connections('inet'):
+                    if connection.laddr:
+                        key = (connection.laddr[1], connection.type)
+                        self._index[key].append(connection)
+
+        connections = self._index.get((port, socket_type), [])
+        if family:
+            connections = [
+                connection for connection in connections
+                if connection.family == family
+            ]
+
+        return connections
+
+
+@contextlib.contextmanager
+def socket_snapshot(snapshot=None):
+    """Answer port listening checks in the context from one snapshot.
+
+    Use this when running a large number of diagnostic tests together. The
+    snapshot only applies to checks made by the current thread. To share it
+    with other threads, pass the yielded snapshot to this function in each of
+    them.
+
+    """
+    if snapshot is None:
+        snapshot = SocketSnapshot()
+
+    previous_snapshot = getattr(_local, 'socket_snapshot', None)
+    _local.socket_snapshot = snapshot
+    try:
+        yield snapshot
+    finally:
+        _local.socket_snapshot = previous_snapshot
+
+
+@contextlib.contextmanager
+def check_timings():
+    """Record the time taken by diagnostic checks made in the context.
+
+    Yields a dictionary filled with the description of each check made by the
+    current thread mapped to the seconds it took. Only checks decorated with
+    :func:`timed_check` are recorded.
+
+    """
+    previous_timings = getattr(_local, 'check_timings', None)
+    timings = {}
+    _local.check_timings = timings
+    try:
+        yield timings
+    finally:
+        _local.check_timings = previous_timings
+
+
+@timed_check
 def diagnose_netcat(host, port, input='', negate=False):
     """Run a diagnostic using netcat."""
     try:
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tune SQLite connections to the data file.
+
+All of FreedomBox's state is kept in a single SQLite file that is accessed by
+web requests and by background tasks such as setup and diagnostics. Each new
+connection is configured with the journal mode, synchronous mode, page cache
+size and memory mapping size set in the [Database] section of configuration.
+"""
+
+import logging
+
+from django.db.backends.signals import connection_created
+
+from plinth import cfg
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MODES = ('delete', 'truncate', 'persist', 'memory', 'wal', 'off')
+
+SYNCHRONOUS_MODES = ('off', 'normal', 'full', 'extra')
+
+
+def init():
+    """Tune each new connection to the database."""
+    connection_created.connect(_on_connection_created,
+                               dispatch_uid='plinth-database-tuning')
+
+
+def get_pragmas():
+    """Return a list of (pragma, value) to run on each new connection."""
+    pragmas = []
+    journal_mode = (cfg.database_journal_mode or '').lower()
+    if journal_mode in JOURNAL_MODES:
+        pragmas.append(('journal_mode', journal_mode))
+    elif journal_mode:
+        logger.warning('Ignoring unknown database journal mode: %s',
+                       journal_mode)
+
+    synchronous = (cfg.database_synchronous or '').lower()
+    if synchronous in SYNCHRONOUS_MODES:
+        pragmas.append(('synchronous', synchronous))
+    elif synchronous:
+        logger.warning('Ignoring unknown database synchronous mode: %s',
+                       synchronous)
+
+    pragmas.append(('cache_size', int(cfg.database_cache_size)))
+    pragmas.append(('mmap_size', int(cfg.database_mmap_size)))
+    return pragmas
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    """Set pragmas on a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in get_pragmas():
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
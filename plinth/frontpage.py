@@ -8,8 +8,7 @@ import logging
 import os
 
 from plinth import app, cfg
-
-from . import actions
+from plinth.utils import get_user_groups
 
 logger = logging.getLogger(__name__)
 
@@ -109,9 +108,7 @@ class Shortcut(app.FollowerComponent):
         if not username:
             return cls._all_shortcuts
 
-        # XXX: Turn this into an API call in users module and cache
-        output = actions.superuser_run('users', ['get-user-groups', username])
-        user_groups = set(output.strip().split('\n'))
+        user_groups = get_user_groups(username)
 
         if 'admin' in user_groups:  # Admin has access to all services
             return cls._all_shortcuts
@@ -1,15 +1,37 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 """
 Simple key/value store using Django models
+
+Values are cached in memory after they are read from the database. Writes go
+to the database and update the cache once committed. Values read inside a
+transaction are not cached as the transaction may be rolled back.
 """
 
+import copy
+import json
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
 from plinth.models import KVStore
 
+_MISSING = object()
+
+_cache = {}
+_cache_lock = threading.Lock()
+_generation = 0
+_stats = {'hits': 0, 'misses': 0}
+
 
 def get(key):
     """Return the value of a key"""
-    # pylint: disable-msg=E1101
-    return KVStore.objects.get(pk=key).value
+    value = _read([key])[key]
+    if value is _MISSING:
+        raise KVStore.DoesNotExist('Key {} does not exist'.format(key))
+
+    return value
 
 
 def get_default(key, default_value):
@@ -20,12 +42,107 @@ def get_default(key, default_value):
         return default_value
 
 
+def get_many(keys, default_value=None):
+    """Return a dictionary of values of keys using a single query.
+
+    default_value is returned for keys that don't exist.
+
+    """
+    values = _read(keys)
+    return {
+        key: default_value if value is _MISSING else value
+        for key, value in values.items()
+    }
+
+
 def set(key, value):  # pylint: disable-msg=W0622
     """Store the value of a key"""
     store = KVStore(key=key, value=value)
     store.save()
+    _store_on_commit({key: value})
+
+
+def set_many(values):
+    """Store values of keys from a dictionary in a single transaction."""
+    with transaction.atomic():
+        for key, value in values.items():
+            KVStore(key=key, value=value).save()
+
+        _store_on_commit(values)
 
 
 def delete(key):
     """Delete a key"""
     return KVStore.objects.get(key=key).delete()
+
+
+def get_stats():
+    """Return number of cache hits and misses and number of cached keys."""
+    with _cache_lock:
+        return dict(_stats, size=len(_cache))
+
+
+def clear_cache():
+    """Forget all the cached values."""
+    global _generation
+    with _cache_lock:
+        _cache.clear()
+        _generation += 1
+
+
+def _read(keys):
+    """Return values of keys from cache or database, _MISSING if not found."""
+    values = {}
+    with _cache_lock:
+        for key in keys:
+            values[key] = _cache.get(key, _MISSING)
+
+        missed = [key for key in keys if key not in _cache]
+        _stats['hits'] += len(values) - len(missed)
+        _stats['misses'] += len(missed)
+        generation = _generation
+
+    if missed:
+        for store in KVStore.objects.filter(key__in=missed):
+            values[store.key] = store.value
+
+        if not connection.in_atomic_block:
+            with _cache_lock:
+                if generation == _generation:
+                    _cache.update({key: values[key] for key in missed})
+
+    return {key: _copy(value) for key, value in values.items()}
+
+
+def _store_on_commit(values):
+    """Cache written values once the current transaction commits."""
+    with _cache_lock:
+        generation = _generation
+
+    def store():
+        with _cache_lock:
+            if generation == _generation:
+                _cache.update({
+                    key: json.loads(json.dumps(value))
+                    for key, value in values.items()
+                })
+
+    transaction.on_commit(store)
+
+
+def _copy(value):
+    """Return a copy of a cached value that callers may modify."""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+
+    return value
+
+
+@receiver(post_save, sender=KVStore)
+@receiver(post_delete, sender=KVStore)
+def _on_kvstore_change(sender, instance, **kwargs):
+    """Forget the cached value of a key that is written or deleted."""
+    global _generation
+    with _cache_lock:
+        _cache.pop(instance.key, None)
+        _generation += 1
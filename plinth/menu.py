@@ -48,6 +48,10 @@ class Menu(app.FollowerComponent):
         self.short_description = short_description
         self.icon = icon
         self.url = url
+        self.url_name = url_name
+        self.url_args = url_args
+        self.url_kwargs = url_kwargs
+        self.parent_url_name = parent_url_name
         self.order = order
         self.advanced = advanced
         self.items = []
@@ -60,6 +64,19 @@ class Menu(app.FollowerComponent):
         # Add self to global list of menu items
         self._all_menus[url] = self
 
+    def remove(self):
+        """Remove this menu item from its parent and global list."""
+        if self.parent_url_name:
+            parent_menu = self.get(self.parent_url_name)
+            parent_menu.items.remove(self)
+
+        del self._all_menus[self.url]
+
+    @classmethod
+    def list(cls):
+        """Return a list of all menu items."""
+        return cls._all_menus.values()
+
     @classmethod
     def get(cls, urlname, url_args=None, url_kwargs=None):
         """Return a menu item with given URL name."""
@@ -35,12 +35,14 @@ class SetupMiddleware(MiddlewareMixin):
         if user_requests_login:
             return
 
-        # Perform a URL resolution. This is slightly inefficient as
-        # Django will do this resolution again.
-        try:
-            resolver_match = urls.resolve(request.path_info)
-        except urls.Resolver404:
-            return
+        # Django resolves the URL before calling view middleware. Resolve it
+        # only when the request did not go through Django's handler.
+        resolver_match = getattr(request, 'resolver_match', None)
+        if not resolver_match:
+            try:
+                resolver_match = urls.resolve(request.path_info)
+            except urls.Resolver404:
+                return
 
         if not resolver_match.namespaces or not len(resolver_match.namespaces):
             # Requested URL does not belong to any application
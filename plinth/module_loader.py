@@ -1,30 +1,75 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 """
 Discover, load and manage FreedomBox applications.
+
+When the 'lazy_app_loading' option is set, modules of apps that are not
+installed are not imported during startup. Instead, their menu items and URL
+names are created from a manifest written during an earlier startup in which
+all the modules were loaded. Such a module is imported and initialized when a
+URL handled by it is first requested or when its setup is requested.
 """
 
 import collections
 import importlib
+import importlib.util
+import json
 import logging
+import os
 import pathlib
 import re
-
-import django
-
-from plinth import cfg, setup
-from plinth.signals import post_module_loading, pre_module_loading
+import threading
+import time
+
+import django.conf.urls
+from django.urls import Resolver404, URLPattern, URLResolver
+from django.urls.resolvers import RegexPattern
+from django.utils import translation
+from django.utils.datastructures import MultiValueDict
+from django.utils.functional import cached_property
+from django.utils.regex_helper import normalize
+from django.utils.translation import ugettext_lazy
+
+from plinth import __version__, cfg, menu, profiler, setup
+from plinth.signals import (post_app_loading, post_module_loading,
+                            pre_module_loading)
 
 logger = logging.getLogger(__name__)
 
 loaded_modules = collections.OrderedDict()
 _modules_to_load = None
 
+_manifest = None
+_lazy_modules = None
+_lazy_menus = {}
+_lazy_lock = threading.RLock()
+_url_resolvers = {}
+
 
 def include_urls():
-    """Include the URLs of the modules into main Django project."""
+    """Include the URLs of the modules into main Django project.
+
+    URLs of all modules are included together with an index of the path
+    prefixes they handle, so that resolving a path only tries the modules that
+    may handle it.
+
+    """
+    from plinth import urls
+    lazy_modules = _get_lazy_modules()
+    resolvers = []
     for module_import_path in get_modules_to_load():
         module_name = module_import_path.split('.')[-1]
-        _include_module_urls(module_import_path, module_name)
+        with profiler.measure('urls', module_name):
+            if module_name in lazy_modules:
+                resolver = _include_lazy_module_urls(module_import_path,
+                                                     module_name)
+            else:
+                resolver = _include_module_urls(module_import_path,
+                                                module_name)
+
+        if resolver:
+            resolvers.append(resolver)
+
+    urls.urlpatterns += [_ModuleURLIndex(resolvers)]
 
 
 def load_modules():
@@ -33,11 +78,17 @@ def load_modules():
     import them from modules directory.
     """
     pre_module_loading.send_robust(sender="module_loader")
+    lazy_modules = _get_lazy_modules()
     modules = {}
     for module_import_path in get_modules_to_load():
         module_name = module_import_path.split('.')[-1]
+        if module_name in lazy_modules:
+            continue
+
         try:
-            modules[module_name] = importlib.import_module(module_import_path)
+            with profiler.measure('import', module_name):
+                modules[module_name] = importlib.import_module(
+                    module_import_path)
         except Exception as exception:
             logger.exception('Could not import %s: %s', module_import_path,
                              exception)
@@ -59,13 +110,63 @@ def load_modules():
 
     logger.info('Module load order - %s', ordered_modules)
 
+    _InitScheduler(ordered_modules, modules).run()
     for module_name in ordered_modules:
-        _initialize_module(module_name, modules[module_name])
         loaded_modules[module_name] = modules[module_name]
 
+    for module_name in lazy_modules:
+        _add_lazy_module_menus(module_name)
+
+    if lazy_modules:
+        logger.info('Modules to load when needed - %s', sorted(lazy_modules))
+
+    if cfg.lazy_app_loading and _read_manifest() is None:
+        _write_manifest()
+
     post_module_loading.send_robust(sender="module_loader")
 
 
+def load_module(module_name):
+    """Import and initialize a module that was not loaded during startup.
+
+    Return the loaded module. Modules that are already loaded are returned as
+    is. Raise KeyError if the module is not one of the modules to be loaded.
+
+    """
+    with _lazy_lock:
+        if module_name in loaded_modules:
+            return loaded_modules[module_name]
+
+        module_import_path = _get_lazy_modules()[module_name]
+        logger.info('Loading module on demand - %s', module_name)
+        with profiler.measure('import', module_name):
+            module = importlib.import_module(module_import_path)
+
+        for dependency in getattr(module, 'depends', []):
+            load_module(dependency)
+
+        for menu_item in _lazy_menus.pop(module_name, []):
+            menu_item.remove()
+
+        with profiler.measure('init', module_name):
+            _initialize_module(module_name, module)
+
+        loaded_modules[module_name] = module
+
+        resolver = _url_resolvers.get(module_name)
+        if isinstance(resolver, _LazyModuleURLResolver):
+            resolver.reset()
+
+    post_app_loading.send_robust(sender='module_loader',
+                                 module_name=module_name)
+    return module
+
+
+def is_module_lazy(module_name):
+    """Return whether a module is to be loaded only when needed."""
+    return module_name in _get_lazy_modules()
+
+
 def _insert_modules(module_name, module, remaining_modules, ordered_modules):
     """Insert modules into a list based on dependency order"""
     if module_name in ordered_modules:
@@ -93,20 +194,526 @@ def _insert_modules(module_name, module, remaining_modules, ordered_modules):
     ordered_modules.append(module_name)
 
 
+class _InitScheduler:
+    """Initialize modules concurrently, each after its dependencies.
+
+    Up to 'init_workers' modules are initialized at a time. Waiting stops when
+    all modules are initialized or when the remaining modules are all taking,
+    or waiting for modules taking, longer than 'init_timeout' seconds. Such
+    modules continue to be initialized in the background. A thread running a
+    module that timed out can't be stopped, so it no longer counts towards
+    'init_workers' and another module is started in its place.
+
+    """
+
+    def __init__(self, ordered_modules, modules):
+        """Initialize the scheduler."""
+        self.ordered_modules = ordered_modules
+        self.modules = modules
+        self.dependencies = {
+            module_name: {
+                dependency
+                for dependency in getattr(modules[module_name], 'depends', [])
+                if dependency in ordered_modules
+            }
+            for module_name in ordered_modules
+        }
+        self.submitted = set()
+        self.finished = set()
+        self.timed_out = set()
+        self.start_times = {}
+        self.exception = None
+        self.condition = threading.Condition()
+
+    def run(self):
+        """Initialize the modules and wait for them to finish or time out."""
+        if not self.ordered_modules:
+            return
+
+        # Setup related initialization is quick and is done upfront so that
+        # all modules are usable even if their init() does not finish in time.
+        for module_name in self.ordered_modules:
+            setup.init(module_name, self.modules[module_name])
+
+        with self.condition:
+            self._submit_ready()
+            while not self._is_settled():
+                self.condition.wait(timeout=1)
+                self._check_timeouts()
+
+        if self.exception:
+            raise self.exception
+
+        if self.timed_out:
+            logger.warning(
+                'Continuing without waiting for initialization of - %s',
+                [
+                    module_name for module_name in self.ordered_modules
+                    if module_name not in self.finished
+                ])
+
+    def _submit_ready(self):
+        """Start initializing modules whose dependencies are initialized."""
+        running = self.submitted - self.finished - self.timed_out
+        for module_name in self.ordered_modules:
+            if len(running) >= max(cfg.init_workers, 1):
+                break
+
+            if module_name not in self.submitted and \
+               self.dependencies[module_name] <= self.finished:
+                self.submitted.add(module_name)
+                running.add(module_name)
+                thread = threading.Thread(target=self._initialize,
+                                          args=(module_name, ),
+                                          name='init-' + module_name,
+                                          daemon=True)
+                thread.start()
+
+    def _initialize(self, module_name):
+        """Initialize a module in a worker thread."""
+        with self.condition:
+            self.start_times[module_name] = time.monotonic()
+
+        try:
+            with profiler.measure('init', module_name):
+                _initialize_module(module_name, self.modules[module_name])
+        except Exception as exception:
+            self.exception = self.exception or exception
+        finally:
+            with self.condition:
+                self.finished.add(module_name)
+                if module_name in self.timed_out:
+                    logger.info('Initialization finished late for - %s',
+                                module_name)
+
+                self._submit_ready()
+                self.condition.notify_all()
+
+    def _check_timeouts(self):
+        """Stop waiting for modules taking too long to initialize."""
+        now = time.monotonic()
+        for module_name, start_time in self.start_times.items():
+            if module_name not in self.finished and \
+               module_name not in self.timed_out and \
+               now - start_time > cfg.init_timeout:
+                logger.warning('Initialization timed out for module - %s',
+                               module_name)
+                self.timed_out.add(module_name)
+
+        self._submit_ready()
+
+    def _is_settled(self):
+        """Return whether there is no module left to wait for."""
+        if self.exception:
+            return True
+
+        blocked = set()
+        for module_name in self.ordered_modules:
+            if module_name in self.finished:
+                continue
+
+            if module_name in self.timed_out or \
+               self.dependencies[module_name] & blocked:
+                blocked.add(module_name)
+            else:
+                return False
+
+        return True
+
+
 def _include_module_urls(module_import_path, module_name):
-    """Include the module's URLs in global project URLs list"""
-    from plinth import urls
+    """Return a resolver for the module's URLs or None if it has none."""
     url_module = module_import_path + '.urls'
     try:
-        urls.urlpatterns += [
-            django.conf.urls.url(
-                r'', django.conf.urls.include((url_module, module_name)))
-        ]
+        resolver = django.conf.urls.url(
+            r'', django.conf.urls.include((url_module, module_name)))
     except ImportError:
         logger.debug('No URLs for %s', module_name)
         if cfg.develop:
             raise
 
+        return None
+
+    _url_resolvers[module_name] = resolver
+    return resolver
+
+
+def _include_lazy_module_urls(module_import_path, module_name):
+    """Return a resolver for URLs of a module without importing it."""
+    entry = _read_manifest()['modules'][module_name]
+    resolver = _LazyModuleURLResolver(entry['url_prefixes'],
+                                      entry['url_names'],
+                                      module_import_path + '.urls',
+                                      module_name)
+    _url_resolvers[module_name] = resolver
+    return resolver
+
+
+class _ModuleURLIndex(URLResolver):
+    """Resolver for URLs of all modules indexed by the path prefixes.
+
+    Each module's URLs are included with an empty pattern and Django would try
+    all of them in turn for every request. Instead, the literal prefix of each
+    URL pattern up to its last '/' is recorded. Resolving a path only tries, in
+    the original order, the modules having a pattern whose prefix is one of
+    the path's leading directories. Modules with patterns that don't begin
+    with a literal prefix are always tried.
+
+    """
+
+    def __init__(self, resolvers):
+        """Initialize the resolver and build the index."""
+        super().__init__(RegexPattern(r''), resolvers)
+        self.index = collections.defaultdict(set)
+        for position, resolver in enumerate(resolvers):
+            for prefix in _get_resolver_prefixes(resolver):
+                self.index[prefix[:prefix.rfind('/') + 1]].add(position)
+
+        self.index = dict(self.index)
+
+    def get_resolvers(self, path):
+        """Return the resolvers that may handle a path in order."""
+        positions = set(self.index.get('', ()))
+        index = path.find('/')
+        while index >= 0:
+            positions.update(self.index.get(path[:index + 1], ()))
+            index = path.find('/', index + 1)
+
+        return [self.url_patterns[position] for position in sorted(positions)]
+
+    def resolve(self, path):
+        """Resolve a path by trying only the modules that may handle it."""
+        path = str(path)
+        tried = []
+        for resolver in self.get_resolvers(path):
+            try:
+                match = resolver.resolve(path)
+            except Resolver404 as exception:
+                sub_tried = exception.args[0].get('tried')
+                if sub_tried is not None:
+                    tried.extend([resolver] + item for item in sub_tried)
+                else:
+                    tried.append([resolver])
+            else:
+                if match:
+                    return match
+
+                tried.append([resolver])
+
+        raise Resolver404({'tried': tried, 'path': path})
+
+
+class _PrefixPattern(RegexPattern):
+    """URL pattern matching paths starting with any of the given prefixes.
+
+    Like an include with an empty pattern, nothing is consumed from the path
+    and nothing is added to reversed URLs.
+
+    """
+
+    def __init__(self, prefixes):
+        """Initialize the pattern."""
+        super().__init__(r'')
+        self.prefixes = tuple(prefixes)
+
+    def match(self, path):
+        """Return the path as is if it starts with one of the prefixes."""
+        if path.startswith(self.prefixes):
+            return path, (), {}
+
+        return None
+
+    def __str__(self):
+        """Return a description of the pattern."""
+        return '|'.join(self.prefixes)
+
+
+class _LazyModuleURLResolver(URLResolver):
+    """Resolver for URLs of a module that is loaded when first needed.
+
+    Until the module is loaded, URLs are reversed using names recorded in the
+    manifest. Resolving a URL that starts with one of the module's URL
+    prefixes loads the module.
+
+    """
+
+    def __init__(self, prefixes, url_names, urlconf_name, module_name):
+        """Initialize the resolver."""
+        super().__init__(_PrefixPattern(prefixes), urlconf_name,
+                         app_name=module_name, namespace=module_name)
+        self.module_name = module_name
+        self.url_names = url_names
+
+    @cached_property
+    def urlconf_module(self):
+        """Load the module and return its URLs module."""
+        load_module(self.module_name)
+        return importlib.import_module(self.urlconf_name)
+
+    def _populate(self):
+        """Populate reverse lookups from the manifest until loaded."""
+        if self.module_name in loaded_modules:
+            return super()._populate()
+
+        lookups = MultiValueDict()
+        for name, regex, default_args in reversed(self.url_names):
+            lookups.appendlist(name, (normalize(regex), regex.lstrip('^'),
+                                      default_args, {}))
+
+        language_code = translation.get_language()
+        self._namespace_dict[language_code] = {}
+        self._app_dict[language_code] = {}
+        self._reverse_dict[language_code] = lookups
+        self._populated = True
+
+    def reset(self):
+        """Forget reverse lookups populated from the manifest."""
+        self._reverse_dict.clear()
+        self._namespace_dict.clear()
+        self._app_dict.clear()
+        self._populated = False
+
+
+def _get_lazy_modules():
+    """Return modules, not yet setup, to load only when needed.
+
+    Return a dictionary of module names to module import paths.
+
+    """
+    global _lazy_modules
+    if _lazy_modules is not None:
+        return _lazy_modules
+
+    candidates = get_lazy_module_candidates()
+    setup_versions = setup._get_setup_versions() if candidates else {}
+    _lazy_modules = {}
+    for module_import_path in candidates:
+        module_name = module_import_path.split('.')[-1]
+        if not setup_versions.get(module_name):
+            _lazy_modules[module_name] = module_import_path
+
+    return _lazy_modules
+
+
+def get_lazy_module_candidates():
+    """Return import paths of modules that may be loaded only when needed.
+
+    These are modules marked in the manifest as not necessary during startup
+    unless their app has been setup. Return an empty list if loading modules
+    when needed is disabled or the manifest is not current.
+
+    """
+    if not cfg.lazy_app_loading:
+        return []
+
+    manifest = _read_manifest()
+    if not manifest:
+        return []
+
+    return [
+        entry['import_path'] for entry in manifest['modules'].values()
+        if entry['lazy']
+    ]
+
+
+def get_module_directory(module_import_path):
+    """Return the directory of a module without importing it."""
+    spec = importlib.util.find_spec(module_import_path)
+    return spec.submodule_search_locations[0]
+
+
+def _add_lazy_module_menus(module_name):
+    """Create menu items of a module that is not loaded from the manifest."""
+    entry = _read_manifest()['modules'][module_name]
+    for properties in entry['menus']:
+        properties = dict(properties)
+        for key in ('name', 'short_description'):
+            if properties[key] is not None:
+                properties[key] = ugettext_lazy(properties[key])
+
+        menu_item = menu.Menu(**properties)
+        _lazy_menus.setdefault(module_name, []).append(menu_item)
+
+
+def _get_manifest_path():
+    """Return the path of the manifest file."""
+    return os.path.join(cfg.data_dir, 'app-manifest.json')
+
+
+def _read_manifest():
+    """Return the manifest if it is current, otherwise None."""
+    global _manifest
+    if _manifest is not None:
+        return _manifest or None
+
+    _manifest = {}
+    try:
+        with open(_get_manifest_path(), 'r') as file_handle:
+            manifest = json.load(file_handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exception:
+        logger.warning('Unable to read app manifest: %s', exception)
+        return None
+
+    if manifest.get('version') != __version__ or \
+       manifest.get('modules_to_load') != sorted(get_modules_to_load()):
+        logger.info('App manifest is outdated, loading all modules')
+        return None
+
+    _manifest = manifest
+    return _manifest
+
+
+def _write_manifest():
+    """Record information needed to load modules later in the manifest."""
+    dependencies = set()
+    for module in loaded_modules.values():
+        dependencies.update(getattr(module, 'depends', []))
+
+    modules = {}
+    for module_name, module in loaded_modules.items():
+        entry = _get_manifest_entry(module_name, module)
+        if module_name in dependencies:
+            entry['lazy'] = False
+
+        modules[module_name] = entry
+
+    manifest = {
+        'version': __version__,
+        'modules_to_load': sorted(get_modules_to_load()),
+        'modules': modules,
+    }
+    try:
+        with open(_get_manifest_path(), 'w') as file_handle:
+            json.dump(manifest, file_handle, indent=2)
+    except (OSError, TypeError, ValueError) as exception:
+        logger.warning('Unable to write app manifest: %s', exception)
+    else:
+        logger.info('App manifest written to %s', _get_manifest_path())
+
+
+def _get_manifest_entry(module_name, module):
+    """Return information about a loaded module to store in the manifest."""
+    entry = {
+        'import_path': module.__name__,
+        'lazy': False,
+        'url_prefixes': [],
+        'url_names': [],
+        'menus': [],
+    }
+    if getattr(module, 'is_essential', False) or \
+       hasattr(module, 'first_boot_steps') or \
+       os.path.isdir(os.path.join(os.path.dirname(module.__file__),
+                                  'templatetags')):
+        return entry
+
+    resolver = _url_resolvers.get(module_name)
+    urls = _get_manifest_urls(resolver) if resolver else None
+    if urls is None:
+        return entry
+
+    entry['url_prefixes'], entry['url_names'] = urls
+    with translation.override(None):
+        for menu_item in menu.Menu.list():
+            if not str(menu_item.url_name).startswith(module_name + ':'):
+                continue
+
+            entry['menus'].append({
+                'component_id': menu_item.component_id,
+                'name': _get_msgid(menu_item.name),
+                'short_description': _get_msgid(menu_item.short_description),
+                'icon': menu_item.icon,
+                'url_name': menu_item.url_name,
+                'url_args': menu_item.url_args,
+                'url_kwargs': menu_item.url_kwargs,
+                'parent_url_name': menu_item.parent_url_name,
+                'order': menu_item.order,
+                'advanced': menu_item.advanced,
+            })
+
+    try:
+        json.dumps(entry)
+    except (TypeError, ValueError):
+        entry['menus'] = []
+        return entry
+
+    entry['lazy'] = True
+    return entry
+
+
+def _get_msgid(string):
+    """Return the untranslated form of a lazily translated string."""
+    return None if string is None else str(string)
+
+
+def _get_manifest_urls(resolver):
+    """Return URL prefixes and named URLs handled by a module's resolver.
+
+    Return None if the module's URLs can't be reversed or matched without
+    importing it.
+
+    """
+    prefixes = []
+    names = []
+    for pattern in resolver.url_patterns:
+        if not isinstance(pattern, URLPattern) or pattern.pattern.converters:
+            return None
+
+        prefix = _get_pattern_prefix(pattern)
+        if not prefix:
+            return None
+
+        prefixes.append(prefix)
+        if pattern.name:
+            regex = pattern.pattern.regex.pattern
+            names.append([pattern.name, regex, pattern.default_args])
+
+    return prefixes, names
+
+
+def _get_resolver_prefixes(resolver):
+    """Return prefixes of paths that may be handled by a module's resolver.
+
+    An empty prefix is returned if any path may be handled.
+
+    """
+    if isinstance(resolver, _LazyModuleURLResolver):
+        return list(resolver.pattern.prefixes)
+
+    prefixes = []
+    for pattern in resolver.url_patterns:
+        prefix = _get_pattern_prefix(pattern)
+        if prefix is None:
+            return ['']
+
+        prefixes.append(prefix)
+
+    return prefixes
+
+
+def _get_pattern_prefix(pattern):
+    """Return the literal text that paths matched by a URL pattern begin with.
+
+    Return None if the pattern is not anchored to the beginning of the path or
+    may match alternatives.
+
+    """
+    try:
+        regex = pattern.pattern.regex.pattern
+    except AttributeError:
+        return None
+
+    match = re.match(r'\^([\w/-]*)', regex)
+    if not match or '|' in regex:
+        return None
+
+    prefix = match.group(1)
+    if regex[len(prefix) + 1:len(prefix) + 2] in ('?', '*', '{'):
+        prefix = prefix[:-1]
+
+    return prefix
+
 
 def _initialize_module(module_name, module):
     """Call initialization method in the module if it exists"""
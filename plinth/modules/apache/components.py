@@ -9,6 +9,9 @@ import subprocess
 from django.utils.translation import ugettext as _
 
 from plinth import action_utils, actions, app
+from plinth.daemon import timed_check
+
+from . import url_checker
 
 
 class Webserver(app.LeaderComponent):
@@ -106,6 +109,7 @@ class Uwsgi(app.LeaderComponent):
             and action_utils.service_is_running('uwsgi')
 
 
+@timed_check
 def diagnose_url(url, kind=None, env=None, check_certificate=True,
                  extra_options=None, wrapper=None, expected_output=None):
     """Run a diagnostic on whether a URL is accessible.
@@ -114,7 +118,11 @@ def diagnose_url(url, kind=None, env=None, check_certificate=True,
     """
     result = check_url(url, kind, env, check_certificate, extra_options,
                        wrapper, expected_output)
+    return _get_url_result(url, kind, result)
+
 
+def _get_url_result(url, kind, result):
+    """Return the result of a URL diagnostic test with its description."""
     if kind:
         return [
             _('Access URL {url} on tcp{kind}').format(url=url, kind=kind),
@@ -124,20 +132,57 @@ def diagnose_url(url, kind=None, env=None, check_certificate=True,
     return [_('Access URL {url}').format(url=url), result]
 
 
+@timed_check
 def diagnose_url_on_all(url, **kwargs):
-    """Run a diagnostic on whether a URL is accessible."""
-    results = []
-    for address in action_utils.get_addresses():
-        current_url = url.format(host=address['url_address'])
-        results.append(
-            diagnose_url(current_url, kind=address['kind'], **kwargs))
+    """Run a diagnostic on whether a URL is accessible.
+
+    URLs on all the addresses are checked concurrently unless curl is needed.
+
+    """
+    urls = [(url.format(host=address['url_address']), address['kind'])
+            for address in action_utils.get_addresses()]
+
+    if _needs_curl(kwargs.get('env'), kwargs.get('extra_options'),
+                   kwargs.get('wrapper')):
+        return [
+            diagnose_url(current_url, kind=kind, **kwargs)
+            for current_url, kind in urls
+        ]
 
-    return results
+    results = url_checker.check_urls(
+        urls, check_certificate=kwargs.get('check_certificate', True),
+        expected_output=kwargs.get('expected_output'))
+    return [
+        _get_url_result(current_url, kind, result)
+        for (current_url, kind), result in zip(urls, results)
+    ]
+
+
+def _needs_curl(env, extra_options, wrapper):
+    """Return whether a URL check needs to be done by running curl.
+
+    Proxies set in environment, curl options and wrappers such as torsocks are
+    not supported by the built-in URL checker.
+
+    """
+    return bool(env is not None or extra_options or wrapper)
 
 
 def check_url(url, kind=None, env=None, check_certificate=True,
               extra_options=None, wrapper=None, expected_output=None):
     """Check whether a URL is accessible."""
+    if not _needs_curl(env, extra_options, wrapper):
+        return url_checker.check_url(url, kind, check_certificate,
+                                     expected_output)
+
+    return _check_url_with_curl(url, kind, env, check_certificate,
+                                extra_options, wrapper, expected_output)
+
+
+def _check_url_with_curl(url, kind=None, env=None, check_certificate=True,
+                         extra_options=None, wrapper=None,
+                         expected_output=None):
+    """Check whether a URL is accessible by running curl."""
     command = ['curl', '--location', '-f', '-w', '%{response_code}']
 
     if kind == '6':
@@ -8,7 +8,8 @@ from unittest.mock import call, patch
 
 import pytest
 
-from plinth.modules.apache.components import (Uwsgi, Webserver, check_url,
+from plinth.modules.apache.components import (Uwsgi, Webserver,
+                                              _check_url_with_curl, check_url,
                                               diagnose_url,
                                               diagnose_url_on_all)
 
@@ -213,39 +214,82 @@ def test_diagnose_url(get_addresses, check):
     ]
 
 
+@patch('plinth.modules.apache.url_checker.check_urls')
+@patch('plinth.action_utils.get_addresses')
+def test_diagnose_url_on_all_concurrently(get_addresses, check_urls):
+    """Test that URLs on all addresses are checked together."""
+    get_addresses.return_value = [{
+        'kind': '4',
+        'url_address': 'test-host-1'
+    }, {
+        'kind': '6',
+        'url_address': '[::1]'
+    }]
+    check_urls.return_value = ['passed', 'failed']
+    result = diagnose_url_on_all('https://{host}/test',
+                                 check_certificate=False,
+                                 expected_output='test-expected')
+    assert result == [
+        ['Access URL https://test-host-1/test on tcp4', 'passed'],
+        ['Access URL https://[::1]/test on tcp6', 'failed'],
+    ]
+    check_urls.assert_called_once_with(
+        [('https://test-host-1/test', '4'), ('https://[::1]/test', '6')],
+        check_certificate=False, expected_output='test-expected')
+
+
+@patch('plinth.modules.apache.components._check_url_with_curl')
+@patch('plinth.modules.apache.url_checker.check_url')
+def test_check_url(native_check_url, curl_check_url):
+    """Test that curl is used only when necessary."""
+    url = 'http://localhost/test'
+    native_check_url.return_value = 'passed'
+    assert check_url(url, kind='6', check_certificate=False,
+                     expected_output='test') == 'passed'
+    native_check_url.assert_called_with(url, '6', False, 'test')
+    curl_check_url.assert_not_called()
+
+    for kwargs in ({'env': {}}, {'wrapper': 'torsocks'},
+                   {'extra_options': ['--proxy', 'test']}):
+        native_check_url.reset_mock()
+        check_url(url, **kwargs)
+        native_check_url.assert_not_called()
+        curl_check_url.assert_called()
+
+
 @patch('subprocess.run')
-def test_check_url(run):
-    """Test checking whether a URL is accessible."""
+def test_check_url_with_curl(run):
+    """Test checking whether a URL is accessible using curl."""
     url = 'http://localhost/test'
     basic_command = ['curl', '--location', '-f', '-w', '%{response_code}']
     extra_args = {'env': None, 'check': True, 'stdout': -1, 'stderr': -1}
 
     # Basic
-    assert check_url(url) == 'passed'
+    assert _check_url_with_curl(url) == 'passed'
     run.assert_called_with(basic_command + [url], **extra_args)
 
     # Wrapper
-    check_url(url, wrapper='test-wrapper')
+    _check_url_with_curl(url, wrapper='test-wrapper')
     run.assert_called_with(['test-wrapper'] + basic_command + [url],
                            **extra_args)
 
     # No certificate check
-    check_url(url, check_certificate=False)
+    _check_url_with_curl(url, check_certificate=False)
     run.assert_called_with(basic_command + [url, '-k'], **extra_args)
 
     # Extra options
-    check_url(url, extra_options=['test-opt1', 'test-opt2'])
+    _check_url_with_curl(url, extra_options=['test-opt1', 'test-opt2'])
     run.assert_called_with(basic_command + [url, 'test-opt1', 'test-opt2'],
                            **extra_args)
 
     # TCP4/TCP6
-    check_url(url, kind='4')
+    _check_url_with_curl(url, kind='4')
     run.assert_called_with(basic_command + [url, '-4'], **extra_args)
-    check_url(url, kind='6')
+    _check_url_with_curl(url, kind='6')
     run.assert_called_with(basic_command + [url, '-6'], **extra_args)
 
     # IPv6 Link Local URLs
-    check_url('https://[::2%eth0]/test', kind='6')
+    _check_url_with_curl('https://[::2%eth0]/test', kind='6')
     run.assert_called_with(
         basic_command + ['--interface', 'eth0', 'https://[::2]/test', '-6'],
         **extra_args)
@@ -254,15 +298,15 @@ def test_check_url(run):
     exception = subprocess.CalledProcessError(returncode=1, cmd=['curl'])
     run.side_effect = exception
     run.side_effect.stdout = b'500'
-    assert check_url(url) == 'failed'
+    assert _check_url_with_curl(url) == 'failed'
 
     # Return code 401, 405
     run.side_effect = exception
     run.side_effect.stdout = b' 401 '
-    assert check_url(url) == 'passed'
+    assert _check_url_with_curl(url) == 'passed'
     run.side_effect.stdout = b'405\n'
-    assert check_url(url) == 'passed'
+    assert _check_url_with_curl(url) == 'passed'
 
     # Error
     run.side_effect = FileNotFoundError()
-    assert check_url(url) == 'error'
+    assert _check_url_with_curl(url) == 'error'
@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for built-in URL checker.
+"""
+
+import http.server
+import threading
+
+import pytest
+
+from plinth.modules.apache import url_checker
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Respond to test requests."""
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        """Count the number of connections made."""
+        super().setup()
+        _Handler.connections += 1
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Respond to a GET request based on path."""
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'hello ', b'chunked world'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        status, headers = {
+            '/ok': (200, {}),
+            '/unauthorized': (401, {}),
+            '/missing': (404, {}),
+            '/redirect': (302, {'Location': '/ok'}),
+            '/loop': (302, {'Location': '/loop'}),
+        }[self.path]
+        body = b'hello world'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Don't log requests."""
+
+
+@pytest.fixture(name='server_url')
+def fixture_server_url():
+    """Run a HTTP server in a thread and return its URL."""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    _Handler.connections = 0
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture(name='checker')
+def fixture_checker():
+    """Return a new URL checker."""
+    return url_checker.URLChecker(max_concurrent_checks=2, timeout=5)
+
+
+@pytest.mark.parametrize('path,expected_output,result', [
+    ('/ok', None, 'passed'),
+    ('/ok', 'world', 'passed'),
+    ('/ok', 'missing', 'failed'),
+    ('/chunked', 'chunked world', 'passed'),
+    ('/unauthorized', None, 'passed'),
+    ('/missing', None, 'failed'),
+    ('/redirect', 'world', 'passed'),
+    ('/loop', None, 'failed'),
+])
+def test_check_url(checker, server_url, path, expected_output, result):
+    """Test checking URLs with various responses."""
+    urls = [(server_url + path, None)]
+    assert checker.check_urls(urls, expected_output=expected_output) == \
+        [result]
+
+
+def test_check_url_kind(checker, server_url):
+    """Test that connections are made only using the requested IP version."""
+    url = server_url + '/ok'
+    assert checker.check_urls([(url, '4'), (url, '6')]) == \
+        ['passed', 'failed']
+
+
+def test_check_url_invalid(checker, server_url):
+    """Test that invalid and unreachable URLs fail."""
+    port = int(server_url.rsplit(':', 1)[1])
+    urls = [('ftp://127.0.0.1/', None), ('http:///', None),
+            ('http://127.0.0.1:{}/'.format(port + 1), None)]
+    assert checker.check_urls(urls) == ['failed', 'failed', 'failed']
+
+
+def test_connections_reused(checker, server_url):
+    """Test that connections are kept alive and reused."""
+    urls = [(server_url + '/ok', '4')] * 10
+    assert checker.check_urls(urls) == ['passed'] * 10
+    assert _Handler.connections <= 2
+
+
+def test_global_checker(server_url):
+    """Test the module level functions."""
+    assert url_checker.get_checker() is url_checker.get_checker()
+    assert url_checker.check_url(server_url + '/ok') == 'passed'
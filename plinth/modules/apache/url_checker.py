@@ -0,0 +1,318 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Check whether URLs are accessible without spawning processes.
+
+All checks are run as coroutines on a single event loop running in a
+background thread. This allows URL checks requested from any thread, such as
+from the diagnostics of multiple apps running in parallel, to proceed
+concurrently while limiting the total number of checks in progress. Connections
+are kept alive and reused for further checks on the same server.
+"""
+
+import asyncio
+import logging
+import re
+import socket
+import ssl
+import threading
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of URL checks in progress at any time
+MAX_CONCURRENT_CHECKS = 16
+
+# Time in seconds after which a URL check is considered failed
+TIMEOUT = 30
+
+# Maximum number of redirects to follow, same as curl
+MAX_REDIRECTS = 50
+
+# Maximum number of idle connections to keep for each server
+MAX_IDLE_CONNECTIONS = 4
+
+# HTTP status codes that indicate that the URL is accessible even though the
+# request itself was not successful.
+ACCEPTED_ERROR_CODES = (401, 405)
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+_FAMILIES = {None: 0, '4': socket.AF_INET, '6': socket.AF_INET6}
+
+_checker = None
+_checker_lock = threading.Lock()
+
+
+class ProtocolError(Exception):
+    """Raised when the server's response is not valid HTTP."""
+
+
+class _Response:
+    """Response to a HTTP request."""
+
+    def __init__(self, version, status, headers, body, reusable):
+        self.version = version
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.reusable = reusable
+
+
+class URLChecker:
+    """Check URLs concurrently on an event loop in a background thread."""
+
+    def __init__(self, max_concurrent_checks=MAX_CONCURRENT_CHECKS,
+                 timeout=TIMEOUT):
+        """Start the event loop thread."""
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._max_concurrent_checks = max_concurrent_checks
+        self._idle_connections = {}
+        self._thread = threading.Thread(target=self._run_loop, daemon=True,
+                                        name='url-checker')
+        self._thread.start()
+
+    def _run_loop(self):
+        """Run the event loop forever."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def check_urls(self, urls, check_certificate=True, expected_output=None):
+        """Check a list of (url, kind) tuples and return a list of results.
+
+        Each result is one of 'passed', 'failed' or 'error'. 'error' is
+        returned only on unexpected errors in the checker itself.
+
+        """
+        futures = [
+            asyncio.run_coroutine_threadsafe(
+                self._check(url, kind, check_certificate, expected_output),
+                self._loop) for url, kind in urls
+        ]
+        return [future.result() for future in futures]
+
+    async def _check(self, url, kind, check_certificate, expected_output):
+        """Check a URL and return the result."""
+        if not self._semaphore:
+            # Create on the event loop's thread
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_checks)
+
+        async with self._semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    self._get(url, kind, check_certificate), self.timeout)
+            except (OSError, EOFError, ValueError, ProtocolError,
+                    asyncio.TimeoutError) as exception:
+                logger.debug('Error accessing URL %s: %s', url, exception)
+                return 'failed'
+            except Exception:
+                logger.exception('Error checking URL %s', url)
+                return 'error'
+
+        if response.status >= 400:
+            if response.status in ACCEPTED_ERROR_CODES:
+                return 'passed'
+
+            return 'failed'
+
+        if expected_output and \
+           expected_output not in response.body.decode(errors='replace'):
+            return 'failed'
+
+        return 'passed'
+
+    async def _get(self, url, kind, check_certificate):
+        """Make a GET request following redirects and return the response."""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._request(url, kind, check_certificate)
+            location = response.headers.get('location')
+            if response.status not in REDIRECT_CODES or not location:
+                return response
+
+            url = urllib.parse.urljoin(url, location)
+
+        raise ProtocolError('Too many redirects')
+
+    async def _request(self, url, kind, check_certificate):
+        """Make a single GET request, reusing an idle connection if any."""
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError('Invalid URL: {}'.format(url))
+
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port, kind, check_certificate)
+        # Host header and server name must not have the IPv6 zone index
+        host = re.sub(r'%[^\]]*', '', parts.netloc.rsplit('@', 1)[-1])
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request = ('GET {path} HTTP/1.1\r\n'
+                   'Host: {host}\r\n'
+                   'User-Agent: FreedomBox\r\n'
+                   'Accept: */*\r\n'
+                   '\r\n').format(path=path, host=host).encode()
+
+        connection = self._get_idle_connection(key)
+        if connection:
+            try:
+                response = await self._send(connection, request)
+            except (OSError, EOFError, ProtocolError):
+                # Server closed the idle connection, retry on a new one
+                connection[1].close()
+                connection = None
+            except BaseException:
+                connection[1].close()
+                raise
+
+        if not connection:
+            connection = await self._connect(parts, port, kind,
+                                             check_certificate)
+            try:
+                response = await self._send(connection, request)
+            except BaseException:
+                connection[1].close()
+                raise
+
+        if response.reusable:
+            self._put_idle_connection(key, connection)
+        else:
+            connection[1].close()
+
+        return response
+
+    @staticmethod
+    async def _connect(parts, port, kind, check_certificate):
+        """Open a new connection to the server of a URL."""
+        ssl_context = None
+        server_hostname = None
+        if parts.scheme == 'https':
+            ssl_context = ssl.create_default_context()
+            if not check_certificate:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+
+            server_hostname = parts.hostname.split('%', 1)[0]
+
+        # Zone index of IPv6 link local addresses is handled by getaddrinfo()
+        return await asyncio.open_connection(parts.hostname, port,
+                                             ssl=ssl_context,
+                                             family=_FAMILIES[kind],
+                                             server_hostname=server_hostname)
+
+    async def _send(self, connection, request):
+        """Send a request on a connection and read the response."""
+        reader, writer = connection
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError('Connection closed by server')
+
+        match = re.match(rb'HTTP/(\d\.\d) (\d{3})', status_line)
+        if not match:
+            raise ProtocolError('Invalid status line: {}'.format(status_line))
+
+        version, status = match.group(1).decode(), int(match.group(2))
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise EOFError('Connection closed by server')
+
+            if line in (b'\r\n', b'\n'):
+                break
+
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = version == '1.1' and \
+            headers.get('connection', '').lower() != 'close'
+        if status < 200 or status in (204, 304):
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            try:
+                length = int(headers['content-length'])
+            except ValueError:
+                raise ProtocolError('Invalid content length')
+
+            body = await reader.readexactly(length)
+        else:
+            body = await reader.read()
+            reusable = False
+
+        return _Response(version, status, headers, body, reusable)
+
+    @staticmethod
+    async def _read_chunked(reader):
+        """Read a body sent with chunked transfer encoding."""
+        chunks = []
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b';', 1)[0], 16)
+            except ValueError:
+                raise ProtocolError('Invalid chunk size')
+
+            if not size:
+                break
+
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+        # Skip trailers
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+        return b''.join(chunks)
+
+    def _get_idle_connection(self, key):
+        """Return an idle connection to a server if one is available."""
+        connections = self._idle_connections.get(key, [])
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+
+            writer.close()
+
+        return None
+
+    def _put_idle_connection(self, key, connection):
+        """Keep a connection for reuse by further requests to a server."""
+        connections = self._idle_connections.setdefault(key, [])
+        if len(connections) < MAX_IDLE_CONNECTIONS:
+            connections.append(connection)
+        else:
+            connection[1].close()
+
+
+def get_checker():
+    """Return the URL checker, starting it if necessary."""
+    global _checker
+    with _checker_lock:
+        if not _checker:
+            _checker = URLChecker()
+
+        return _checker
+
+
+def check_urls(urls, check_certificate=True, expected_output=None):
+    """Check a list of (url, kind) tuples concurrently and return results.
+
+    kind can be None, '4' for IPv4 or '6' for IPv6. IPv6 link local addresses
+    must be scoped with an interface name like in http://[fe80::1%eth0]/.
+
+    """
+    return get_checker().check_urls(urls, check_certificate, expected_output)
+
+
+def check_url(url, kind=None, check_certificate=True, expected_output=None):
+    """Check whether a URL is accessible and return the result."""
+    return check_urls([(url, kind)], check_certificate, expected_output)[0]
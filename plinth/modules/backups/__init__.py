@@ -3,6 +3,7 @@
 FreedomBox app to manage backup archives.
 """
 
+import functools
 import json
 import os
 import pathlib
@@ -63,6 +64,17 @@ def init():
     if setup_helper.get_state() != 'needs-setup' and app.is_enabled():
         app.set_enabled(True)
 
+        # Continue jobs queued before the service was stopped
+        from plinth import glib
+
+        from . import jobs
+        glib.schedule(3, jobs.resume, repeat=False)
+
+        # Check every 5 minutes for scheduled backups, every minute in debug
+        # mode
+        interval = 60 if cfg.develop else 300
+        glib.schedule(interval, jobs.run_schedules)
+
 
 def setup(helper, old_version=None):
     """Install and configure the module."""
@@ -73,7 +85,25 @@ def setup(helper, old_version=None):
     helper.call('post', app.enable)
 
 
-def _backup_handler(packet, encryption_passphrase=None):
+def get_limit_arguments():
+    """Return backups action arguments limiting resources used by borg."""
+    return [
+        '--nice',
+        str(cfg.backups_nice), '--ionice', cfg.backups_ionice,
+        '--bandwidth-limit',
+        str(cfg.backups_bandwidth_limit)
+    ]
+
+
+def _run(arguments, input=None, job=None):
+    """Run a backups action script command, as part of a job if given."""
+    if job:
+        return job.run_action('backups', arguments, input=input)
+
+    return actions.superuser_run('backups', arguments, input=input)
+
+
+def _backup_handler(packet, encryption_passphrase=None, job=None):
     """Performs backup operation on packet."""
     if not os.path.exists(MANIFESTS_FOLDER):
         os.makedirs(MANIFESTS_FOLDER)
@@ -92,13 +122,14 @@ def _backup_handler(packet, encryption_passphrase=None):
 
     paths = packet.directories + packet.files
     paths.append(manifest_path)
-    arguments = ['create-archive', '--path', packet.path, '--paths'] + paths
+    arguments = ['create-archive', '--path', packet.path] + \
+        get_limit_arguments() + ['--paths'] + paths
     input_data = ''
     if encryption_passphrase:
         input_data = json.dumps(
             {'encryption_passphrase': encryption_passphrase})
 
-    actions.superuser_run('backups', arguments, input=input_data.encode())
+    _run(arguments, input=input_data.encode(), job=job)
 
 
 def get_exported_archive_apps(path):
@@ -108,16 +139,17 @@ def get_exported_archive_apps(path):
     return output.splitlines()
 
 
-def _restore_exported_archive_handler(packet, encryption_passphrase=None):
+def _restore_exported_archive_handler(packet, encryption_passphrase=None,
+                                      job=None):
     """Perform restore operation on packet."""
     locations = {'directories': packet.directories, 'files': packet.files}
     locations_data = json.dumps(locations)
-    actions.superuser_run('backups',
-                          ['restore-exported-archive', '--path', packet.path],
-                          input=locations_data.encode())
+    arguments = ['restore-exported-archive', '--path', packet.path
+                 ] + get_limit_arguments()
+    _run(arguments, input=locations_data.encode(), job=job)
 
 
-def restore_archive_handler(packet, encryption_passphrase=None):
+def restore_archive_handler(packet, encryption_passphrase=None, job=None):
     """Perform restore operation on packet."""
     locations = {
         'directories': packet.directories,
@@ -127,14 +159,15 @@ def restore_archive_handler(packet, encryption_passphrase=None):
     locations_data = json.dumps(locations)
     arguments = [
         'restore-archive', '--path', packet.path, '--destination', '/'
-    ]
-    actions.superuser_run('backups', arguments, input=locations_data.encode())
+    ] + get_limit_arguments()
+    _run(arguments, input=locations_data.encode(), job=job)
 
 
-def restore_from_upload(path, apps=None):
+def restore_from_upload(path, apps=None, job=None):
     """Restore files from an uploaded .tar.gz backup file"""
-    api.restore_apps(_restore_exported_archive_handler, app_names=apps,
-                     create_subvolume=False, backup_file=path)
+    handler = functools.partial(_restore_exported_archive_handler, job=job)
+    api.restore_apps(handler, app_names=apps, create_subvolume=False,
+                     backup_file=path)
 
 
 def get_known_hosts_path():
@@ -165,14 +165,16 @@ def backup_apps(backup_handler, path, app_names=None,
         snapshotted = False
 
     packet = Packet('backup', 'apps', backup_root, apps, path)
-    _run_operation(backup_handler, packet,
-                   encryption_passphrase=encryption_passphrase)
-
-    if snapshotted:
-        _delete_snapshot(snapshot)
-    else:
-        _restore_services(original_state)
-        _lockdown_apps(apps, lockdown=False)
+    try:
+        _run_operation(backup_handler, packet,
+                       encryption_passphrase=encryption_passphrase)
+    finally:
+        # Bring services back even if the backup failed or was cancelled
+        if snapshotted:
+            _delete_snapshot(snapshot)
+        else:
+            _restore_services(original_state)
+            _lockdown_apps(apps, lockdown=False)
 
 
 def restore_apps(restore_handler, app_names=None, create_subvolume=True,
@@ -195,14 +197,17 @@ def restore_apps(restore_handler, app_names=None, create_subvolume=True,
         subvolume = False
 
     packet = Packet('restore', 'apps', restore_root, apps, backup_file)
-    _run_operation(restore_handler, packet,
-                   encryption_passphrase=encryption_passphrase)
+    try:
+        _run_operation(restore_handler, packet,
+                       encryption_passphrase=encryption_passphrase)
+    finally:
+        # Bring services back even if the restore failed or was cancelled
+        if not subvolume:
+            _restore_services(original_state)
+            _lockdown_apps(apps, lockdown=False)
 
     if subvolume:
         _switch_to_subvolume(subvolume)
-    else:
-        _restore_services(original_state)
-        _lockdown_apps(apps, lockdown=False)
 
 
 def _install_apps_before_restore(apps):
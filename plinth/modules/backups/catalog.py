@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Catalog of archives in backup repositories kept in KVStore table in database.
+
+Listing the archives of a repository and reading the apps in an archive run
+borg, which is slow for large repositories and for remote ones accessed over
+sshfs. The catalog remembers the archives of each repository along with their
+sizes and apps so that pages can be shown without running borg. It is updated
+when archives are created or deleted and when it is refreshed on request.
+"""
+
+import threading
+import time
+
+from plinth import kvstore
+from plinth.models import KVStore
+
+# Prefix of kvstore key for catalog of a repository
+STORAGE_KEY_PREFIX = 'backups_catalog_'
+
+_lock = threading.RLock()
+
+
+def _get_key(uuid):
+    """Return kvstore key for catalog of a repository."""
+    return STORAGE_KEY_PREFIX + uuid
+
+
+def get(uuid):
+    """Return catalog of a repository or None if it has not been made."""
+    return kvstore.get_default(_get_key(uuid), None)
+
+
+def get_archives(uuid):
+    """Return archives of a repository or None if not known."""
+    catalog = get(uuid)
+    return catalog['archives'] if catalog else None
+
+
+def get_archive(uuid, name):
+    """Return an archive in catalog of a repository or None."""
+    for archive in get_archives(uuid) or []:
+        if archive['name'] == name:
+            return archive
+
+    return None
+
+
+def set_archives(uuid, archives):
+    """Replace archives in catalog of a repository."""
+    with _lock:
+        kvstore.set(_get_key(uuid), {
+            'archives': archives,
+            'updated': time.time()
+        })
+
+
+def update_archive(uuid, name, **values):
+    """Update details of an archive in catalog of a repository."""
+    with _lock:
+        archives = get_archives(uuid)
+        if archives is None:
+            return
+
+        for archive in archives:
+            if archive['name'] == name:
+                archive.update(values)
+                set_archives(uuid, archives)
+                return
+
+
+def remove_archive(uuid, name):
+    """Remove an archive from catalog of a repository."""
+    with _lock:
+        archives = get_archives(uuid)
+        if archives is None:
+            return
+
+        set_archives(
+            uuid, [archive for archive in archives if archive['name'] != name])
+
+
+def delete(uuid):
+    """Forget catalog of a repository."""
+    with _lock:
+        try:
+            kvstore.delete(_get_key(uuid))
+        except KVStore.DoesNotExist:
+            pass
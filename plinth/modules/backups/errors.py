@@ -21,3 +21,7 @@ class BorgRepositoryExists(BorgError):
 
 class BorgUnencryptedRepository(BorgError):
     """Attempt to provide password on an unencrypted repository."""
+
+
+class JobCancelled(PlinthError):
+    """A backup job was cancelled while it was running."""
@@ -65,6 +65,55 @@ class CreateArchiveForm(forms.Form):
         self.fields['repository'].choices = _get_repository_choices()
 
 
+class ScheduleForm(forms.Form):
+    enabled = forms.BooleanField(label=_('Enable scheduled backups'),
+                                 required=False)
+    frequency = forms.ChoiceField(
+        label=_('Frequency'), choices=[('hourly', _('Every hour')),
+                                       ('daily', _('Every day')),
+                                       ('weekly', _('Every week'))])
+    hour = forms.TypedChoiceField(
+        label=_('Time'), coerce=int,
+        choices=[(hour, '{:02}:00'.format(hour)) for hour in range(24)],
+        help_text=_('Time of the day at which daily and weekly backups are '
+                    'created. Weekly backups are created on Sundays. Choose '
+                    'a time when the system is not busy.'))
+    keep_daily = forms.IntegerField(
+        label=_('Daily backups to keep'), min_value=0,
+        help_text=_('The latest scheduled backup of each of these many days '
+                    'is kept. Older scheduled backups are deleted unless '
+                    'kept for a week or month. Backups created manually are '
+                    'never deleted.'))
+    keep_weekly = forms.IntegerField(label=_('Weekly backups to keep'),
+                                     min_value=0)
+    keep_monthly = forms.IntegerField(label=_('Monthly backups to keep'),
+                                      min_value=0)
+    selected_apps = forms.MultipleChoiceField(
+        label=_('Included apps'), help_text=_('Apps to include in the backup'),
+        widget=forms.CheckboxSelectMultiple)
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the form with selectable apps."""
+        super().__init__(*args, **kwargs)
+        apps = api.get_all_apps_for_backup()
+        self.fields['selected_apps'].choices = _get_app_choices(apps)
+        self.fields['selected_apps'].initial = [app.name for app in apps]
+
+    def clean(self):
+        """Check that scheduled backups are kept for some time."""
+        cleaned_data = super().clean()
+        keep = [
+            cleaned_data.get(field)
+            for field in ('keep_daily', 'keep_weekly', 'keep_monthly')
+        ]
+        if cleaned_data.get('enabled') and not any(keep):
+            raise ValidationError(
+                _('At least one daily, weekly or monthly backup must be '
+                  'kept.'))
+
+        return cleaned_data
+
+
 class RestoreForm(forms.Form):
     selected_apps = forms.MultipleChoiceField(
         label=_('Select the apps you want to restore'),
@@ -0,0 +1,394 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Queue of backup operations run one at a time in a background thread.
+
+Creating, restoring and deleting archives may take many minutes. Instead of
+running them while a web request waits, they are added to a queue kept in
+KVStore table in database and run by a worker thread. Progress reported by
+borg is kept in memory and shown on the backups page. Jobs may be cancelled
+while they wait or run. Jobs still queued when the service stops are run after
+it starts again. Scheduled backups that are due are added to the queue
+periodically.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from uuid import uuid1
+
+from plinth import actions, kvstore
+from plinth.errors import ActionError
+
+from . import errors, restore_from_upload, schedules
+from .repository import get_instance, get_repositories
+
+logger = logging.getLogger(__name__)
+
+STORAGE_KEY = 'backups_jobs'
+
+# Number of finished jobs to remember
+HISTORY_SIZE = 10
+
+ACTIVE_STATES = ('queued', 'running', 'cancelling')
+
+_jobs = None
+_lock = threading.RLock()
+_worker = None
+
+
+class Job:
+    """A backup operation in the queue."""
+
+    def __init__(self, operation, parameters, job_id=None, state='queued',
+                 created=None, started=None, finished=None, error=None):
+        """Initialize the job."""
+        self.job_id = job_id or str(uuid1())
+        self.operation = operation
+        self.parameters = parameters
+        self.state = state
+        self.created = created or time.time()
+        self.started = started
+        self.finished = finished
+        self.error = error
+        self.progress = {}
+        self._process = None
+
+    @property
+    def is_active(self):
+        """Return whether the job is waiting or running."""
+        return self.state in ACTIVE_STATES
+
+    def to_dict(self):
+        """Return the job as stored in database."""
+        return {
+            'job_id': self.job_id,
+            'operation': self.operation,
+            'parameters': self.parameters,
+            'state': self.state,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+        }
+
+    def get_view_content(self):
+        """Return the job with its progress as needed by the view."""
+        return dict(self.to_dict(), progress=self.progress,
+                    is_active=self.is_active)
+
+    def run_action(self, action, arguments, input=None):
+        """Run an action script command as superuser and read its progress.
+
+        The command is asked to report progress as JSON lines on stderr, in
+        the format used by borg's --log-json option. Log messages from these
+        lines form the error of the raised ActionError if the command fails.
+        Output is read in another thread at the same time, so that the
+        command does not wait for either of the pipes to be emptied. If the
+        command succeeds, its output is returned even if the job was cancelled
+        meanwhile.
+
+        """
+        with _lock:
+            if self.state == 'cancelling':
+                raise errors.JobCancelled()
+
+            process = actions.superuser_run(action,
+                                            arguments + ['--progress'],
+                                            run_in_background=True)
+            self._process = process
+
+        messages = []
+        output = []
+        reader = threading.Thread(
+            target=lambda: output.append(process.stdout.read()), daemon=True)
+        try:
+            reader.start()
+            process.stdin.write(input or b'')
+            process.stdin.close()
+            for line in process.stderr:
+                self._read_progress(line.decode(errors='replace'), messages)
+
+            reader.join()
+            process.wait()
+        finally:
+            with _lock:
+                self._process = None
+
+        output = b''.join(output).decode()
+        if process.returncode == 0:
+            return output
+
+        if self.state == 'cancelling':
+            raise errors.JobCancelled()
+
+        raise ActionError(action, output, '\n'.join(messages))
+
+    def _read_progress(self, line, messages):
+        """Update progress or collect message from a line of output."""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+
+        if not isinstance(record, dict):
+            messages.append(line.rstrip('\n'))
+            return
+
+        if record.get('type') == 'archive_progress':
+            self.progress = {
+                'size': record.get('original_size'),
+                'files': record.get('nfiles'),
+            }
+        elif record.get('type') == 'progress_percent':
+            if record.get('total'):
+                self.progress = {
+                    'percent': record['current'] * 100 // record['total']
+                }
+        elif record.get('type') == 'log_message':
+            messages.append(record.get('message', ''))
+
+    def cancel(self):
+        """Cancel the job if it is waiting or stop it if it is running."""
+        with _lock:
+            if self.state == 'queued':
+                _finish(self, 'cancelled')
+            elif self.state == 'running':
+                self.state = 'cancelling'
+                if self._process:
+                    self._process.terminate()
+
+
+def _create_archive(job):
+    """Create an archive in a repository."""
+    repository = get_instance(job.parameters['repository'])
+    if repository.flags.get('mountable'):
+        repository.mount()
+
+    repository.create_archive(job.parameters['name'], job.parameters['apps'],
+                              job=job)
+
+
+def _restore_archive(job):
+    """Restore apps from an archive in a repository."""
+    repository = get_instance(job.parameters['repository'])
+    repository.restore_archive(job.parameters['name'], job.parameters['apps'],
+                               job=job)
+
+
+def _restore_upload(job):
+    """Restore apps from an uploaded exported archive."""
+    restore_from_upload(job.parameters['path'], job.parameters['apps'],
+                        job=job)
+
+
+def _delete_archive(job):
+    """Delete an archive from a repository."""
+    repository = get_instance(job.parameters['repository'])
+    repository.delete_archive(job.parameters['name'], job=job)
+
+
+def _run_schedule(job):
+    """Create an archive for a schedule, prune old ones and record it."""
+    uuid = job.parameters['repository']
+    schedule = schedules.get(uuid)
+    run = {
+        'name': job.parameters['name'],
+        'started': job.started,
+        'state': 'succeeded',
+        'error': None
+    }
+    try:
+        repository = get_instance(uuid)
+        if repository.flags.get('mountable'):
+            repository.mount()
+
+        repository.create_archive(job.parameters['name'], schedule['apps'],
+                                  job=job)
+        repository.prune_archives(schedules.ARCHIVE_PREFIX,
+                                  keep_daily=schedule['keep_daily'],
+                                  keep_weekly=schedule['keep_weekly'],
+                                  keep_monthly=schedule['keep_monthly'],
+                                  job=job)
+    except Exception as exception:
+        cancelled = job.state == 'cancelling'
+        run['state'] = 'cancelled' if cancelled else 'failed'
+        run['error'] = None if cancelled else str(exception)
+        raise
+    finally:
+        run['finished'] = time.time()
+        schedules.record_run(uuid, run)
+
+
+OPERATIONS = {
+    'create': _create_archive,
+    'restore': _restore_archive,
+    'restore-upload': _restore_upload,
+    'delete': _delete_archive,
+    'schedule': _run_schedule,
+}
+
+
+def _get_jobs():
+    """Return list of jobs, reading it from database if necessary."""
+    global _jobs
+    with _lock:
+        if _jobs is None:
+            _jobs = [
+                Job(**job) for job in kvstore.get_default(STORAGE_KEY, [])
+            ]
+
+        return _jobs
+
+
+def _save():
+    """Write jobs to database forgetting the oldest finished ones."""
+    with _lock:
+        finished = [job for job in _jobs if not job.is_active]
+        for job in finished[:-HISTORY_SIZE]:
+            _jobs.remove(job)
+
+        kvstore.set(STORAGE_KEY, [job.to_dict() for job in _jobs])
+
+
+def _finish(job, state, error=None):
+    """Mark a job as finished and clean up after it."""
+    with _lock:
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        _save()
+
+    if job.operation == 'restore-upload':
+        try:
+            os.remove(job.parameters['path'])
+        except FileNotFoundError:
+            pass
+
+
+def get_jobs():
+    """Return jobs in the queue and recently finished ones."""
+    with _lock:
+        return list(_get_jobs())
+
+
+def get_job(job_id):
+    """Return a job with given ID or None."""
+    for job in get_jobs():
+        if job.job_id == job_id:
+            return job
+
+    return None
+
+
+def submit(operation, **parameters):
+    """Add a job to the queue and return it."""
+    if operation not in OPERATIONS:
+        raise ValueError('Unknown backup operation: ' + operation)
+
+    job = Job(operation, parameters)
+    with _lock:
+        _get_jobs().append(job)
+        _save()
+        _start_worker()
+
+    return job
+
+
+def cancel(job_id):
+    """Cancel a job with given ID and return whether it was active."""
+    job = get_job(job_id)
+    if not job or not job.is_active:
+        return False
+
+    job.cancel()
+    return True
+
+
+def run_schedules(_data=None):
+    """Queue backups to repositories whose schedules are due.
+
+    A backup is not queued if the previous one for the same repository is
+    still waiting or running.
+
+    """
+    now = datetime.datetime.now()
+    busy_repositories = {
+        job.parameters['repository']
+        for job in get_jobs() if job.operation == 'schedule' and job.is_active
+    }
+    for repository in get_repositories():
+        schedule = schedules.get(repository.uuid)
+        if not repository.is_usable() or not schedules.is_due(schedule, now):
+            continue
+
+        schedules.update(repository.uuid, last_scheduled=now.timestamp())
+        if repository.uuid in busy_repositories:
+            logger.warning('Skipping scheduled backup to %s, previous one '
+                           'has not finished', repository.name)
+            continue
+
+        submit('schedule', repository=repository.uuid,
+               name=schedules.get_archive_name(now))
+
+
+def resume(_data=None):
+    """Run jobs queued before the service was stopped.
+
+    Jobs that were running when the service stopped did not finish and are
+    marked as failed.
+
+    """
+    with _lock:
+        for job in _get_jobs():
+            if job.state in ('running', 'cancelling'):
+                _finish(job, 'failed', 'Interrupted by restart of service')
+
+        _start_worker()
+
+
+def _start_worker():
+    """Start the worker thread if jobs are waiting and it is not running."""
+    global _worker
+    with _lock:
+        if _worker or not any(job.state == 'queued' for job in _get_jobs()):
+            return
+
+        _worker = threading.Thread(target=_run_worker, daemon=True)
+        _worker.start()
+
+
+def _run_worker():
+    """Run queued jobs one at a time until none are left."""
+    global _worker
+    while True:
+        with _lock:
+            job = next((job for job in _get_jobs() if job.state == 'queued'),
+                       None)
+            if not job:
+                _worker = None
+                return
+
+            job.state = 'running'
+            job.started = time.time()
+            _save()
+
+        _run_job(job)
+
+
+def _run_job(job):
+    """Run a job and record its result."""
+    logger.info('Running backup job %s: %s', job.operation, job.parameters)
+    try:
+        OPERATIONS[job.operation](job)
+    except Exception as exception:
+        if job.state == 'cancelling':
+            _finish(job, 'cancelled')
+            return
+
+        logger.exception('Backup job %s failed: %s', job.operation, exception)
+        _finish(job, 'failed', str(exception))
+    else:
+        _finish(job, 'succeeded')
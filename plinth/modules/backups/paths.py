@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Match paths of archive members against files and directories to restore.
+"""
+
+
+class PathFilter:
+    """Set of files and directories to match paths against.
+
+    A path matches if it is one of the files, one of the directories or is
+    inside one of the directories. Directories are kept in a tree of path
+    components, so matching takes time proportional to the depth of the path
+    and not to the number of directories.
+
+    """
+
+    def __init__(self, directories=(), files=()):
+        """Initialize the filter."""
+        self.files = {_normalize(path) for path in files}
+        self.tree = {}
+        for directory in directories:
+            self._add_directory(directory)
+
+    def _add_directory(self, directory):
+        """Add a directory to the tree unless it is inside another."""
+        components = _split(directory)
+        if not components:
+            self.tree = True
+            return
+
+        node = self.tree
+        for component in components[:-1]:
+            if node is True:
+                return
+
+            node = node.setdefault(component, {})
+
+        # Replace any directories inside this one with a marker
+        if node is not True:
+            node[components[-1]] = True
+
+    def match(self, path):
+        """Return whether a path is to be restored."""
+        components = _split(path)
+        return '/' + '/'.join(components) in self.files or \
+            self._in_tree(components)
+
+    def get_directories(self):
+        """Return directories not inside another directory."""
+        if self.tree is True:
+            return ['/']
+
+        directories = []
+        nodes = [('', self.tree)]
+        while nodes:
+            prefix, node = nodes.pop()
+            for component, child in node.items():
+                path = prefix + '/' + component
+                if child is True:
+                    directories.append(path)
+                else:
+                    nodes.append((path, child))
+
+        return sorted(directories)
+
+    def get_files(self):
+        """Return files not inside any of the directories."""
+        return sorted(path for path in self.files
+                      if not self._in_tree(_split(path)))
+
+    def _in_tree(self, components):
+        """Return whether a path is inside one of the directories."""
+        node = self.tree
+        for component in components:
+            if node is True:
+                return True
+
+            node = node.get(component)
+            if node is None:
+                return False
+
+        return node is True
+
+
+def _split(path):
+    """Return components of an absolute or relative path."""
+    return [
+        component for component in path.split('/')
+        if component and component != '.'
+    ]
+
+
+def _normalize(path):
+    """Return an absolute path without trailing or repeated slashes."""
+    return '/' + '/'.join(_split(path))
@@ -5,6 +5,7 @@ Remote and local Borg backup repositories
 
 import abc
 import contextlib
+import functools
 import io
 import json
 import logging
@@ -19,8 +20,9 @@ from plinth import actions, cfg
 from plinth.errors import ActionError
 from plinth.utils import format_lazy
 
-from . import (_backup_handler, api, errors, get_known_hosts_path,
-               restore_archive_handler, split_path, store)
+from . import (_backup_handler, api, catalog, errors, get_known_hosts_path,
+               get_limit_arguments, restore_archive_handler, schedules,
+               split_path, store)
 
 logger = logging.getLogger(__name__)
 
@@ -151,7 +153,7 @@ class BaseBorgRepository(abc.ABC):
         try:
             repository['mounted'] = self.is_mounted
             if repository['mounted']:
-                repository['archives'] = self.list_archives()
+                repository['archives'] = self.get_archives()
         except (errors.BorgError, ActionError) as err:
             repository['error'] = str(err)
 
@@ -166,17 +168,118 @@ class BaseBorgRepository(abc.ABC):
         return sorted(archives, key=lambda archive: archive['start'],
                       reverse=True)
 
-    def create_archive(self, archive_name, app_names):
+    def get_archives(self):
+        """Return archives from the catalog, making it if necessary."""
+        archives = catalog.get_archives(self.uuid)
+        if archives is None:
+            archives = self.refresh_catalog(inspect=False)
+
+        return archives
+
+    def refresh_catalog(self, inspect=True):
+        """Update the catalog with the archives in this repository.
+
+        Archives already in the catalog are kept as they are. If inspect is
+        True, sizes and apps of other archives are read, otherwise they are
+        read when first needed.
+
+        """
+        known_archives = {
+            archive['name']: archive
+            for archive in catalog.get_archives(self.uuid) or []
+        }
+        archives = []
+        for archive in self.list_archives():
+            known_archive = known_archives.get(archive['name'])
+            if known_archive and known_archive['id'] == archive['id']:
+                archive = known_archive
+            else:
+                archive = dict(archive, size=None, deduplicated_size=None,
+                               apps=None)
+
+            if inspect:
+                self._try_inspect_archive(archive)
+
+            archives.append(archive)
+
+        catalog.set_archives(self.uuid, archives)
+        return archives
+
+    def _try_inspect_archive(self, archive):
+        """Read size and apps of an archive and return whether it worked."""
+        try:
+            self._inspect_archive(archive)
+        except (errors.BorgError, ActionError, LookupError,
+                ValueError) as exception:
+            logger.warning('Unable to read details of archive %s: %s',
+                           archive['name'], exception)
+            return False
+
+        return True
+
+    def _inspect_archive(self, archive):
+        """Read size and apps of an archive if not already known."""
+        archive_path = self._get_archive_path(archive['name'])
+        if archive['size'] is None:
+            output = self.run(['info', '--path', archive_path])
+            stats = json.loads(output)['archives'][0]['stats']
+            archive['size'] = stats['original_size']
+            archive['deduplicated_size'] = stats['deduplicated_size']
+
+        if archive['apps'] is None:
+            output = self.run(['get-archive-apps', '--path', archive_path])
+            archive['apps'] = output.splitlines()
+
+    def create_archive(self, archive_name, app_names, job=None):
         """Create a new archive in this repository with given name."""
         archive_path = self._get_archive_path(archive_name)
         passphrase = self.credentials.get('encryption_passphrase', None)
-        api.backup_apps(_backup_handler, path=archive_path,
-                        app_names=app_names, encryption_passphrase=passphrase)
+        handler = functools.partial(_backup_handler, job=job)
+        api.backup_apps(handler, path=archive_path, app_names=app_names,
+                        encryption_passphrase=passphrase)
+
+        # Only the new archive is inspected, others are read when needed
+        self._try_refresh_catalog(inspect=False)
+        archive = catalog.get_archive(self.uuid, archive_name)
+        if archive and self._try_inspect_archive(archive):
+            catalog.update_archive(
+                self.uuid, archive_name, size=archive['size'],
+                deduplicated_size=archive['deduplicated_size'],
+                apps=archive['apps'])
+
+    def _try_refresh_catalog(self, inspect=True):
+        """Refresh the catalog or forget it if that fails."""
+        try:
+            self.refresh_catalog(inspect=inspect)
+        except (errors.BorgError, ActionError) as exception:
+            logger.warning('Unable to update catalog of archives: %s',
+                           exception)
+            catalog.delete(self.uuid)
 
-    def delete_archive(self, archive_name):
+    def delete_archive(self, archive_name, job=None):
         """Delete an archive with given name from this repository."""
         archive_path = self._get_archive_path(archive_name)
-        self.run(['delete-archive', '--path', archive_path])
+        self.run(['delete-archive', '--path', archive_path] +
+                 get_limit_arguments(), job=job)
+        catalog.remove_archive(self.uuid, archive_name)
+
+    def prune_archives(self, prefix, keep_daily=0, keep_weekly=0,
+                       keep_monthly=0, job=None):
+        """Delete old archives whose names start with prefix.
+
+        The latest archive of each of the given number of days, weeks and
+        months is kept.
+
+        """
+        arguments = [
+            'prune', '--path', self.borg_path, '--prefix', prefix,
+            '--keep-daily',
+            str(keep_daily), '--keep-weekly',
+            str(keep_weekly), '--keep-monthly',
+            str(keep_monthly)
+        ]
+        self.run(arguments + get_limit_arguments(), job=job)
+        self._try_refresh_catalog(inspect=False)
 
     def initialize(self):
         """Initialize / create a borg repository."""
@@ -201,9 +304,16 @@ class BaseBorgRepository(abc.ABC):
 
         return {}
 
-    def _run(self, cmd, arguments, superuser=True, **kwargs):
-        """Run a backups or sshfs action script command."""
+    def _run(self, cmd, arguments, superuser=True, job=None, **kwargs):
+        """Run a backups or sshfs action script command.
+
+        If a job is given, the command is run as superuser as part of it.
+
+        """
         try:
+            if job:
+                return job.run_action(cmd, arguments, **kwargs)
+
             if superuser:
                 return actions.superuser_run(cmd, arguments, **kwargs)
 
@@ -211,14 +321,14 @@ class BaseBorgRepository(abc.ABC):
         except ActionError as err:
             self.reraise_known_error(err)
 
-    def run(self, arguments, superuser=True):
+    def run(self, arguments, superuser=True, job=None):
         """Add credentials and run a backups action script command."""
         for key in self.credentials.keys():
             if key not in self.known_credentials:
                 raise ValueError('Unknown credentials entry: %s' % key)
 
         input_data = json.dumps(self._get_encryption_data())
-        return self._run('backups', arguments, superuser=superuser,
+        return self._run('backups', arguments, superuser=superuser, job=job,
                          input=input_data.encode())
 
     def get_download_stream(self, archive_name):
@@ -244,7 +354,8 @@ class BaseBorgRepository(abc.ABC):
 
                 return chunk
 
-        args = ['export-tar', '--path', self._get_archive_path(archive_name)]
+        args = ['export-tar', '--path',
+                self._get_archive_path(archive_name)] + get_limit_arguments()
         input_data = json.dumps(self._get_encryption_data())
         proc = self._run('backups', args, run_in_background=True)
         proc.stdin.write(input_data.encode())
@@ -268,7 +379,7 @@ class BaseBorgRepository(abc.ABC):
 
     def get_archive(self, name):
         """Return a specific archive from this repository with given name."""
-        for archive in self.list_archives():
+        for archive in self.get_archives():
             if archive['name'] == name:
                 return archive
 
@@ -276,15 +387,22 @@ class BaseBorgRepository(abc.ABC):
 
     def get_archive_apps(self, archive_name):
         """Get list of apps included in an archive."""
+        archive = catalog.get_archive(self.uuid, archive_name)
+        if archive and archive['apps'] is not None:
+            return archive['apps']
+
         archive_path = self._get_archive_path(archive_name)
         output = self.run(['get-archive-apps', '--path', archive_path])
-        return output.splitlines()
+        apps = output.splitlines()
+        catalog.update_archive(self.uuid, archive_name, apps=apps)
+        return apps
 
-    def restore_archive(self, archive_name, apps=None):
+    def restore_archive(self, archive_name, apps=None, job=None):
         """Restore an archive from this repository to the system."""
         archive_path = self._get_archive_path(archive_name)
         passphrase = self.credentials.get('encryption_passphrase', None)
-        api.restore_apps(restore_archive_handler, app_names=apps,
+        handler = functools.partial(restore_archive_handler, job=job)
+        api.restore_apps(handler, app_names=apps,
                          create_subvolume=False, backup_file=archive_path,
                          encryption_passphrase=passphrase)
 
@@ -345,6 +463,8 @@ class BorgRepository(BaseBorgRepository):
     def remove(self):
         """Remove a repository from the kvstore."""
         store.delete(self.uuid)
+        catalog.delete(self.uuid)
+        schedules.delete(self.uuid)
 
 
 class SshBorgRepository(BaseBorgRepository):
@@ -419,6 +539,8 @@ class SshBorgRepository(BaseBorgRepository):
         """Remove a repository from the kvstore and delete its mountpoint"""
         self.umount()
         store.delete(self.uuid)
+        catalog.delete(self.uuid)
+        schedules.delete(self.uuid)
         try:
             if os.path.exists(self._mountpoint):
                 try:
@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Schedules of automatic backups kept in KVStore table in database.
+
+Each repository may have a schedule to create an archive every hour, day or
+week. Daily and weekly archives are created at a chosen hour of the day, so
+that backups run when the system is not busy. Weekly archives are created on
+Sundays. After an archive is created, older archives created by the schedule
+are pruned keeping the given number of daily, weekly and monthly archives.
+Archives created manually are never pruned. A history of recent runs is kept
+along with the schedule.
+"""
+
+import datetime
+import threading
+import time
+
+from plinth import kvstore
+from plinth.models import KVStore
+
+# Prefix of kvstore key for schedule of a repository
+STORAGE_KEY_PREFIX = 'backups_schedule_'
+
+# Prefix of names of archives created by schedules, used to prune only them
+ARCHIVE_PREFIX = 'scheduled-'
+
+FREQUENCIES = {
+    'hourly': datetime.timedelta(hours=1),
+    'daily': datetime.timedelta(days=1),
+    'weekly': datetime.timedelta(weeks=1),
+}
+
+# Number of runs to remember
+HISTORY_SIZE = 20
+
+DEFAULT_SCHEDULE = {
+    'enabled': False,
+    'frequency': 'daily',
+    'hour': 2,
+    'keep_daily': 7,
+    'keep_weekly': 4,
+    'keep_monthly': 6,
+    'apps': None,
+    'last_scheduled': None,
+    'history': [],
+}
+
+_lock = threading.RLock()
+
+
+def _get_key(uuid):
+    """Return kvstore key for schedule of a repository."""
+    return STORAGE_KEY_PREFIX + uuid
+
+
+def get(uuid):
+    """Return schedule of a repository with defaults for missing values.
+
+    apps is None if all apps are to be backed up.
+
+    """
+    schedule = kvstore.get_default(_get_key(uuid), {})
+    return dict(DEFAULT_SCHEDULE, **schedule)
+
+
+def update(uuid, **values):
+    """Change values in schedule of a repository.
+
+    When a schedule is first enabled, it is considered to have been run just
+    then, so that the first archive is created at the next scheduled time.
+
+    """
+    with _lock:
+        schedule = dict(get(uuid), **values)
+        if schedule['enabled'] and schedule['last_scheduled'] is None:
+            schedule['last_scheduled'] = time.time()
+
+        kvstore.set(_get_key(uuid), schedule)
+
+
+def delete(uuid):
+    """Forget schedule of a repository."""
+    with _lock:
+        try:
+            kvstore.delete(_get_key(uuid))
+        except KVStore.DoesNotExist:
+            pass
+
+
+def record_run(uuid, run):
+    """Add a run of the schedule of a repository to its history."""
+    with _lock:
+        history = [run] + get(uuid)['history'][:HISTORY_SIZE - 1]
+        update(uuid, history=history)
+
+
+def get_last_due_time(schedule, now):
+    """Return the latest time not after now at which a backup is due."""
+    due_time = now.replace(minute=0, second=0, microsecond=0)
+    if schedule['frequency'] == 'hourly':
+        return due_time
+
+    due_time = due_time.replace(hour=schedule['hour'])
+    if due_time > now:
+        due_time -= FREQUENCIES['daily']
+
+    if schedule['frequency'] == 'weekly':
+        days_since_sunday = (due_time.weekday() - 6) % 7
+        due_time -= datetime.timedelta(days=days_since_sunday)
+
+    return due_time
+
+
+def get_next_due_time(schedule, now):
+    """Return the time after now at which the next backup is due."""
+    return get_last_due_time(schedule, now) + \
+        FREQUENCIES[schedule['frequency']]
+
+
+def is_due(schedule, now):
+    """Return whether a backup is to be created now.
+
+    A backup missed while the service was not running is created once, as
+    soon as possible.
+
+    """
+    if not schedule['enabled']:
+        return False
+
+    last_due_time = get_last_due_time(schedule, now)
+    return last_due_time.timestamp() > (schedule['last_scheduled'] or 0)
+
+
+def get_archive_name(now):
+    """Return name of an archive created by a schedule."""
+    return ARCHIVE_PREFIX + now.strftime('%Y-%m-%d:%H:%M')
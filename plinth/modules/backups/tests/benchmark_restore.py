@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Benchmark selecting members of an exported archive to restore.
+
+A synthetic archive is created with many empty files spread across the
+directories of a few apps and a large data directory, like an archive of
+Nextcloud or gitweb data. The time taken to read the members of the archive one
+at a time is measured. Separately, the time taken to decide which members to
+restore is measured by scanning the list of directories for each member, as
+done earlier, and by using a path filter. Nothing is extracted. Run with:
+
+    python3 -m plinth.modules.backups.tests.benchmark_restore
+"""
+
+import argparse
+import tarfile
+import tempfile
+import time
+
+from plinth.modules.backups.paths import PathFilter
+
+DIRECTORY_COUNT = 60
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark selecting members of an archive to restore',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--entries', type=int, default=500000,
+                        help='number of files in the archive')
+    return parser.parse_args()
+
+
+def get_locations():
+    """Return directories and files to restore like those of many apps."""
+    directories = [
+        '/var/lib/app{}/'.format(number) for number in range(DIRECTORY_COUNT)
+    ]
+    directories.append('/var/lib/data/')
+    files = ['/etc/app{}.conf'.format(number) for number in range(20)]
+    return {'directories': directories, 'files': files}
+
+
+def create_archive(path, entries):
+    """Write an archive with given number of empty files."""
+    with tarfile.open(path, 'w:gz', compresslevel=1) as tar_handle:
+        for number in range(entries):
+            if number % 10:
+                name = 'var/lib/data/{}/{}/file{}'.format(
+                    number % 97, number % 89, number)
+            else:
+                name = 'var/lib/other/file{}'.format(number)
+
+            tar_handle.addfile(tarfile.TarInfo(name))
+
+
+def read_names(path):
+    """Return names of members read one at a time from the archive."""
+    with tarfile.open(path) as tar_handle:
+        return [member.name for member in tar_handle]
+
+
+def select_by_scanning(names, locations):
+    """Return number of members selected as done earlier."""
+    selected = 0
+    for name in names:
+        path = '/' + name
+        if path in locations['files']:
+            selected += 1
+        else:
+            for directory in locations['directories']:
+                if path.startswith(directory):
+                    selected += 1
+                    break
+
+    return selected
+
+
+def select_with_filter(names, locations):
+    """Return number of members selected using a path filter."""
+    path_filter = PathFilter(locations['directories'], locations['files'])
+    selected = 0
+    for name in names:
+        if path_filter.match(name):
+            selected += 1
+
+    return selected
+
+
+def measure(function, *args):
+    """Return result of a function and seconds taken."""
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def main():
+    """Run the benchmark and print results."""
+    arguments = parse_arguments()
+    locations = get_locations()
+    with tempfile.NamedTemporaryFile(suffix='.tar.gz') as file_handle:
+        create_archive(file_handle.name, arguments.entries)
+        names, read_time = measure(read_names, file_handle.name)
+
+    scanned, scan_time = measure(select_by_scanning, names, locations)
+    filtered, filter_time = measure(select_with_filter, names, locations)
+
+    assert scanned == filtered
+    print('Members selected:  {:8d} of {}'.format(filtered, arguments.entries))
+    print('Reading archive:   {:8.2f}s'.format(read_time))
+    print('Scanning list:     {:8.2f}s'.format(scan_time))
+    print('Path filter:       {:8.2f}s'.format(filter_time))
+    print('Speedup:           {:8.2f}x'.format(scan_time / filter_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ import json
 import os
 import pathlib
 import subprocess
+import tarfile
 import uuid
 
 import pytest
@@ -106,6 +107,40 @@ def test_create_export_delete_archive(data_directory, backup_directory):
     assert not content
 
 
+def test_export_manifest_first(data_directory, backup_directory, tmp_path):
+    """Test that manifest is the first member of an exported archive."""
+    manifest_file = pathlib.Path(backups.MANIFESTS_FOLDER) / 'test-export.json'
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    manifest_file.write_text(json.dumps({'apps': [{'name': 'testapp'}]}))
+
+    path = backup_directory / 'test_export'
+    repository = BorgRepository(str(path))
+    repository.initialize()
+    try:
+        actions.superuser_run('backups', [
+            'create-archive', '--path', '::'.join([str(path), 'archive']),
+            '--paths',
+            str(data_directory),
+            str(manifest_file)
+        ])
+    finally:
+        manifest_file.unlink()
+
+    export_file = tmp_path / 'export.tar.gz'
+    with export_file.open('wb') as file_handle:
+        for chunk in repository.get_download_stream('archive'):
+            file_handle.write(chunk)
+
+    with tarfile.open(export_file) as tar_handle:
+        names = tar_handle.getnames()
+
+    manifest_name = os.path.relpath(manifest_file, '/')
+    assert names[0] == manifest_name
+    assert names.count(manifest_name) == 1
+    assert os.path.relpath(data_directory, '/') in names
+    assert backups.get_exported_archive_apps(str(export_file)) == ['testapp']
+
+
 @pytest.mark.usefixtures('needs_ssh_config')
 def test_remote_backup_actions():
     """
@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tests for catalog of archives in backup repositories.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from .. import catalog
+from ..repository import BorgRepository
+
+pytestmark = pytest.mark.django_db
+
+_archives = [
+    {
+        'name': 'first',
+        'id': 'id-1',
+        'start': '2020-01-01T00:00:00.000000',
+        'time': '2020-01-01T00:00:00.000000'
+    },
+    {
+        'name': 'second',
+        'id': 'id-2',
+        'start': '2020-01-02T00:00:00.000000',
+        'time': '2020-01-02T00:00:00.000000'
+    },
+]
+
+
+def test_catalog():
+    """Test storing and updating archives of a repository."""
+    assert catalog.get('test-uuid') is None
+    assert catalog.get_archives('test-uuid') is None
+
+    catalog.set_archives('test-uuid', [{'name': 'a'}, {'name': 'b'}])
+    assert catalog.get_archives('test-uuid') == [{'name': 'a'}, {'name': 'b'}]
+    assert catalog.get('test-uuid')['updated']
+    assert catalog.get_archive('test-uuid', 'b') == {'name': 'b'}
+    assert catalog.get_archive('test-uuid', 'c') is None
+
+    catalog.update_archive('test-uuid', 'b', apps=['x'])
+    assert catalog.get_archive('test-uuid', 'b') == {
+        'name': 'b',
+        'apps': ['x']
+    }
+
+    catalog.remove_archive('test-uuid', 'a')
+    assert catalog.get_archives('test-uuid') == [{'name': 'b', 'apps': ['x']}]
+
+    catalog.delete('test-uuid')
+    catalog.delete('test-uuid')
+    assert catalog.get('test-uuid') is None
+
+
+class _FakeBorg:
+    """Answer backups action script commands like borg would."""
+
+    def __init__(self, archives):
+        """Initialize the fake."""
+        self.archives = archives
+        self.calls = []
+
+    def run(self, arguments, superuser=True, job=None):
+        """Return output of a backups action script command."""
+        self.calls.append(arguments[0])
+        if arguments[0] == 'list-repo':
+            return json.dumps({'archives': self.archives})
+
+        if arguments[0] == 'info':
+            stats = {'original_size': 1000, 'deduplicated_size': 100}
+            return json.dumps({'archives': [{'stats': stats}]})
+
+        if arguments[0] == 'get-archive-apps':
+            return 'app1\napp2\n'
+
+        return ''
+
+
+@pytest.fixture(name='borg')
+def fixture_borg():
+    """Return a repository with borg replaced by a fake."""
+    borg = _FakeBorg(list(_archives))
+    repository = BorgRepository('/tmp/repository', uuid='test-uuid')
+    with patch.object(repository, 'run', borg.run):
+        yield repository, borg
+
+
+def test_get_archives(borg):
+    """Test that archives are listed by borg only when catalog is empty."""
+    repository, fake = borg
+    archives = repository.get_archives()
+    assert [archive['name'] for archive in archives] == ['second', 'first']
+    assert archives[0]['size'] is None
+    assert archives[0]['apps'] is None
+    assert fake.calls == ['list-repo']
+
+    assert repository.get_archives() == archives
+    assert repository.get_archive('first')['id'] == 'id-1'
+    assert repository.get_view_content()['archives'] == archives
+    assert fake.calls == ['list-repo']
+
+
+def test_refresh_catalog(borg):
+    """Test that only archives not already in catalog are inspected."""
+    repository, fake = borg
+    archives = repository.refresh_catalog()
+    assert archives[0]['size'] == 1000
+    assert archives[0]['deduplicated_size'] == 100
+    assert archives[0]['apps'] == ['app1', 'app2']
+    assert fake.calls.count('info') == 2
+
+    fake.calls.clear()
+    fake.archives.append({
+        'name': 'third',
+        'id': 'id-3',
+        'start': '2020-01-03T00:00:00.000000',
+        'time': '2020-01-03T00:00:00.000000'
+    })
+    fake.archives.remove(_archives[0])
+    archives = repository.refresh_catalog()
+    assert [archive['name'] for archive in archives] == ['third', 'second']
+    assert fake.calls == ['list-repo', 'info', 'get-archive-apps']
+
+
+def test_archive_apps(borg):
+    """Test that apps of an archive are read once and remembered."""
+    repository, fake = borg
+    repository.get_archives()
+    assert repository.get_archive_apps('first') == ['app1', 'app2']
+    assert repository.get_archive_apps('first') == ['app1', 'app2']
+    assert fake.calls == ['list-repo', 'get-archive-apps']
+
+
+def test_delete_archive(borg):
+    """Test that deleted archive is removed from catalog."""
+    repository, fake = borg
+    repository.get_archives()
+    repository.delete_archive('first')
+    assert [archive['name'] for archive in repository.get_archives()] == \
+        ['second']
+    assert fake.calls == ['list-repo', 'delete-archive']
+
+
+@patch('plinth.modules.backups.api.backup_apps')
+def test_create_archive(backup_apps, borg):
+    """Test that created archive is added to catalog."""
+    repository, fake = borg
+    repository.get_archives()
+    fake.archives.append({
+        'name': 'third',
+        'id': 'id-3',
+        'start': '2020-01-03T00:00:00.000000',
+        'time': '2020-01-03T00:00:00.000000'
+    })
+    with patch.object(repository, 'run', wraps=fake.run) as run:
+        repository.create_archive('third', ['app1'])
+
+    assert repository.get_archive('third')['apps'] == ['app1', 'app2']
+    assert repository.get_archive('third')['size'] == 1000
+    assert backup_apps.called
+
+    # Other archives are not inspected
+    inspected = [
+        call[0][0][0] for call in run.call_args_list
+        if call[0][0][0] in ('info', 'get-archive-apps')
+    ]
+    assert inspected == ['info', 'get-archive-apps']
+    assert catalog.get_archive(repository.uuid, 'first')['apps'] is None
+
+
+def test_prune_archives(borg):
+    """Test that pruned archives are removed from catalog."""
+    repository, fake = borg
+    repository.get_archives()
+    fake.archives.remove(_archives[0])
+    with patch.object(repository, 'run', wraps=fake.run) as run:
+        repository.prune_archives('scheduled-', keep_daily=7)
+
+    arguments = run.call_args_list[0][0][0]
+    assert arguments[:11] == [
+        'prune', '--path', '/tmp/repository', '--prefix', 'scheduled-',
+        '--keep-daily', '7', '--keep-weekly', '0', '--keep-monthly', '0'
+    ]
+    assert [archive['name'] for archive in repository.get_archives()] == \
+        ['second']
@@ -88,3 +88,5 @@ def _upload_and_restore(browser, app_name, downloaded_file_path):
     with functional.wait_for_page_update(browser,
                                          expected_url='/plinth/sys/backups/'):
         functional.submit(browser)
+
+    functional.backup_wait_for_jobs(browser)
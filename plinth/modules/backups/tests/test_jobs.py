@@ -0,0 +1,355 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tests for queue of backup jobs.
+"""
+
+import datetime
+import json
+import subprocess
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from plinth import kvstore
+from plinth.errors import ActionError
+
+from .. import errors, jobs, schedules
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fixture_jobs():
+    """Start with an empty queue and don't run a worker thread."""
+    jobs._jobs = None
+    with patch('plinth.modules.backups.jobs._start_worker'):
+        yield
+
+    jobs._jobs = None
+
+
+@pytest.fixture(name='operation')
+def fixture_operation():
+    """Replace operations with a fake recording its jobs."""
+    operation = []
+    with patch.dict(jobs.OPERATIONS, {
+            'create': operation.append,
+            'delete': operation.append
+    }):
+        yield operation
+
+
+def _start_process(script):
+    """Return a process running a Python script like a background action."""
+    return subprocess.Popen([sys.executable, '-c', script],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+
+
+def test_submit(operation):
+    """Test that jobs are stored and run in order."""
+    job1 = jobs.submit('create', repository='root', name='a', apps=['x'])
+    job2 = jobs.submit('delete', repository='root', name='b')
+    assert [job.state for job in jobs.get_jobs()] == ['queued', 'queued']
+    assert jobs.get_job(job2.job_id) is job2
+    assert kvstore.get(jobs.STORAGE_KEY)[0]['parameters'] == {
+        'repository': 'root',
+        'name': 'a',
+        'apps': ['x']
+    }
+
+    jobs._run_worker()
+    assert operation == [job1, job2]
+    assert job1.state == 'succeeded'
+    assert job1.started and job1.finished
+    assert [job['state'] for job in kvstore.get(jobs.STORAGE_KEY)] == \
+        ['succeeded', 'succeeded']
+
+    with pytest.raises(ValueError):
+        jobs.submit('unknown')
+
+
+def test_failure():
+    """Test that error of a failed job is recorded."""
+    def _fail(job):
+        raise errors.BorgError('Repository not found')
+
+    with patch.dict(jobs.OPERATIONS, {'create': _fail}):
+        job = jobs.submit('create', repository='root', name='a', apps=[])
+        jobs._run_worker()
+
+    assert job.state == 'failed'
+    assert job.error == 'Repository not found'
+
+
+def test_cancel_queued(operation, tmp_path):
+    """Test cancelling a job that is waiting."""
+    path = tmp_path / 'upload.tar.gz'
+    path.touch()
+    with patch.dict(jobs.OPERATIONS, {'restore-upload': operation.append}):
+        job = jobs.submit('restore-upload', path=str(path), apps=[])
+
+    assert jobs.cancel(job.job_id)
+    assert job.state == 'cancelled'
+    assert not path.exists()
+    assert not jobs.cancel(job.job_id)
+    assert not jobs.cancel('unknown')
+
+    jobs._run_worker()
+    assert not operation
+
+
+def test_resume(operation):
+    """Test that jobs interrupted by a restart fail and queued ones run."""
+    kvstore.set(jobs.STORAGE_KEY, [
+        jobs.Job('create', {}, state='running').to_dict(),
+        jobs.Job('delete', {}).to_dict()
+    ])
+    with patch('plinth.modules.backups.jobs._start_worker') as start_worker:
+        jobs.resume()
+        start_worker.assert_called_once_with()
+
+    running, queued = jobs.get_jobs()
+    assert running.state == 'failed'
+    assert running.error
+    assert queued.state == 'queued'
+
+
+def test_history(operation):
+    """Test that only recent finished jobs are remembered."""
+    for number in range(jobs.HISTORY_SIZE + 2):
+        jobs.submit('delete', repository='root', name=str(number))
+        jobs._run_worker()
+
+    names = [job.parameters['name'] for job in jobs.get_jobs()]
+    assert names == [str(number + 2) for number in range(jobs.HISTORY_SIZE)]
+    assert len(kvstore.get(jobs.STORAGE_KEY)) == jobs.HISTORY_SIZE
+
+
+@pytest.mark.parametrize('line, progress', [
+    ({
+        'type': 'archive_progress',
+        'original_size': 1000,
+        'nfiles': 10
+    }, {
+        'size': 1000,
+        'files': 10
+    }),
+    ({
+        'type': 'progress_percent',
+        'current': 25,
+        'total': 200
+    }, {
+        'percent': 12
+    }),
+    ({
+        'type': 'progress_percent',
+        'finished': True
+    }, {}),
+    ({
+        'type': 'file_status',
+        'path': 'a'
+    }, {}),
+])
+def test_read_progress(line, progress):
+    """Test reading progress reported by borg."""
+    job = jobs.Job('create', {})
+    messages = []
+    job._read_progress(json.dumps(line) + '\n', messages)
+    assert job.progress == progress
+    assert not messages
+
+
+def test_read_messages():
+    """Test collecting messages reported by borg."""
+    job = jobs.Job('create', {})
+    messages = []
+    job._read_progress('{"type": "log_message", "message": "error 1"}\n',
+                       messages)
+    job._read_progress('error 2\n', messages)
+    assert messages == ['error 1', 'error 2']
+    assert job.progress == {}
+
+
+@patch('plinth.actions.superuser_run')
+def test_run_action(superuser_run):
+    """Test running an action script command in a job."""
+    superuser_run.return_value = _start_process(
+        'import sys\n'
+        'sys.stderr.write(\'{"type": "progress_percent", "current": 1, '
+        '"total": 2}\\n\')\n'
+        'sys.stdout.write(sys.stdin.read())\n')
+    job = jobs.Job('create', {})
+    assert job.run_action('backups', ['info'], input=b'output') == 'output'
+    superuser_run.assert_called_with('backups', ['info', '--progress'],
+                                     run_in_background=True)
+    assert job.progress == {'percent': 50}
+
+    superuser_run.return_value = _start_process(
+        'import sys\n'
+        'sys.stderr.write(\'{"type": "log_message", '
+        '"message": "failed"}\\n\')\n'
+        'sys.exit(2)\n')
+    with pytest.raises(ActionError, match='failed'):
+        job.run_action('backups', ['info'])
+
+
+@patch('plinth.actions.superuser_run')
+def test_run_action_large_output(superuser_run):
+    """Test that large output and progress are read without blocking."""
+    superuser_run.return_value = _start_process(
+        'import sys\n'
+        'sys.stdout.write("x" * 1000000)\n'
+        'sys.stdout.flush()\n'
+        'sys.stderr.write("y\\n" * 100000)\n')
+    job = jobs.Job('create', {})
+    thread = threading.Thread(
+        target=lambda: job.run_action('backups', ['info']), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+@patch('plinth.actions.superuser_run')
+def test_run_action_cancelled_after_success(superuser_run):
+    """Test that output is returned if cancelled after command succeeded."""
+    superuser_run.return_value = _start_process(
+        'import sys\n'
+        'sys.stdout.write("output")\n')
+    job = jobs.Job('create', {}, state='running')
+    original_wait = superuser_run.return_value.wait
+
+    def _wait():
+        result = original_wait()
+        job.cancel()
+        return result
+
+    superuser_run.return_value.wait = _wait
+    assert job.run_action('backups', ['info']) == 'output'
+    assert job.state == 'cancelling'
+
+
+@patch('plinth.actions.superuser_run')
+def test_cancel_running(superuser_run):
+    """Test that cancelling a running job stops its action."""
+    superuser_run.return_value = _start_process(
+        'import sys, time\n'
+        'sys.stderr.write("started\\n")\n'
+        'sys.stderr.flush()\n'
+        'time.sleep(30)\n')
+    started = threading.Event()
+    job = jobs.submit('create', repository='root', name='a', apps=[])
+    job.state = 'running'
+
+    def _read_progress(line, messages):
+        started.set()
+
+    # Database is not written from the thread running the job
+    with patch.object(job, '_read_progress', _read_progress), \
+            patch('plinth.modules.backups.jobs._save'):
+        thread = threading.Thread(target=jobs._run_job, args=[job])
+        with patch.dict(jobs.OPERATIONS,
+                        {'create': lambda job: job.run_action('backups', [])}):
+            thread.start()
+            assert started.wait(10)
+            job.cancel()
+            thread.join(10)
+
+    assert job.state == 'cancelled'
+    assert superuser_run.return_value.returncode != 0
+
+
+class _FakeRepository:
+    """Repository recording the operations performed on it."""
+
+    flags = {}
+
+    def __init__(self, uuid, usable=True, error=None):
+        """Initialize the repository."""
+        self.uuid = uuid
+        self.name = uuid
+        self.usable = usable
+        self.error = error
+        self.calls = []
+
+    def is_usable(self):
+        """Return whether the repository is usable."""
+        return self.usable
+
+    def create_archive(self, name, apps, job=None):
+        """Record creating an archive."""
+        self.calls.append(('create', name, apps))
+        if self.error:
+            raise self.error
+
+    def prune_archives(self, prefix, job=None, **keep):
+        """Record pruning archives."""
+        self.calls.append(('prune', prefix, keep))
+
+
+@patch('plinth.modules.backups.jobs.datetime')
+@patch('plinth.modules.backups.jobs.get_repositories')
+def test_run_schedules(get_repositories, datetime_module):
+    """Test that due scheduled backups are queued once."""
+    now = datetime.datetime(2020, 5, 6, 10, 30)
+    datetime_module.datetime.now.return_value = now
+    get_repositories.return_value = [
+        _FakeRepository('due'),
+        _FakeRepository('unusable', usable=False),
+        _FakeRepository('disabled'),
+        _FakeRepository('done')
+    ]
+    yesterday = datetime.datetime(2020, 5, 5, 10, 0).timestamp()
+    for uuid in ('due', 'unusable'):
+        schedules.update(uuid, enabled=True, last_scheduled=yesterday)
+
+    schedules.update('done', enabled=True)
+
+    jobs.run_schedules()
+    job, = jobs.get_jobs()
+    assert job.operation == 'schedule'
+    assert job.parameters == {
+        'repository': 'due',
+        'name': 'scheduled-2020-05-06:10:30'
+    }
+    assert schedules.get('due')['last_scheduled'] == now.timestamp()
+
+    # Not queued again while the earlier backup is waiting
+    schedules.update('due', last_scheduled=yesterday)
+    jobs.run_schedules()
+    assert len(jobs.get_jobs()) == 1
+    assert schedules.get('due')['last_scheduled'] == now.timestamp()
+
+
+@pytest.mark.parametrize('error', [None, errors.BorgError('No space left')])
+@patch('plinth.modules.backups.jobs.get_instance')
+def test_run_schedule(get_instance, error):
+    """Test creating an archive for a schedule and pruning old ones."""
+    repository = _FakeRepository('test-uuid', error=error)
+    get_instance.return_value = repository
+    schedules.update('test-uuid', enabled=True, apps=['app1'], keep_daily=2,
+                     keep_weekly=0, keep_monthly=1)
+    job = jobs.submit('schedule', repository='test-uuid',
+                      name='scheduled-test')
+    jobs._run_worker()
+
+    run, = schedules.get('test-uuid')['history']
+    assert run['name'] == 'scheduled-test'
+    assert run['started'] == job.started
+    assert run['finished']
+    assert repository.calls[0] == ('create', 'scheduled-test', ['app1'])
+    if error:
+        assert job.state == 'failed'
+        assert run['state'] == 'failed'
+        assert run['error'] == 'No space left'
+        assert len(repository.calls) == 1
+    else:
+        assert job.state == 'succeeded'
+        assert run['state'] == 'succeeded'
+        assert repository.calls[1] == ('prune', 'scheduled-', {
+            'keep_daily': 2,
+            'keep_weekly': 0,
+            'keep_monthly': 1
+        })
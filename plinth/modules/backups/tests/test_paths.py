@@ -0,0 +1,60 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tests for matching paths of archive members.
+"""
+
+import pytest
+
+from plinth.modules.backups.paths import PathFilter
+
+
+@pytest.fixture(name='path_filter')
+def fixture_path_filter():
+    """Return a filter with a few directories and files."""
+    directories = [
+        '/var/lib/app/', '/var/lib/app/nested', '/etc/app', '/srv//data/'
+    ]
+    files = ['/etc/other.conf', '/var/lib/app/file', '/etc/app.conf']
+    return PathFilter(directories, files)
+
+
+@pytest.mark.parametrize('path', [
+    'var/lib/app', 'var/lib/app/', 'var/lib/app/a/b', '/etc/app/app.conf',
+    'etc/other.conf', 'etc/app.conf', './srv/data/x', 'srv/data'
+])
+def test_match(path_filter, path):
+    """Test that files and contents of directories match."""
+    assert path_filter.match(path)
+
+
+@pytest.mark.parametrize('path', [
+    '', '/', 'var', 'var/lib', 'var/lib/apps', 'var/lib/app-x/file',
+    'etc/other.conf.bak', 'etc/app.conf/x', 'etc', 'srv'
+])
+def test_no_match(path_filter, path):
+    """Test that other paths, including those sharing a prefix, don't match.
+    """
+    assert not path_filter.match(path)
+
+
+def test_locations(path_filter):
+    """Test that directories and files inside others are dropped."""
+    assert path_filter.get_directories() == [
+        '/etc/app', '/srv/data', '/var/lib/app'
+    ]
+    assert path_filter.get_files() == ['/etc/app.conf', '/etc/other.conf']
+
+
+def test_root_directory():
+    """Test that every path matches if root directory is to be restored."""
+    path_filter = PathFilter(['/var/lib/app', '/'])
+    assert path_filter.match('any/path')
+    assert path_filter.get_directories() == ['/']
+
+
+def test_empty():
+    """Test that nothing matches an empty filter."""
+    path_filter = PathFilter()
+    assert not path_filter.match('var/lib/app')
+    assert path_filter.get_directories() == []
+    assert path_filter.get_files() == []
@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tests for schedules of automatic backups.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from .. import schedules
+
+pytestmark = pytest.mark.django_db
+
+
+def test_schedule():
+    """Test storing schedule of a repository."""
+    assert schedules.get('test-uuid') == schedules.DEFAULT_SCHEDULE
+
+    schedules.update('test-uuid', frequency='weekly', keep_daily=3)
+    schedule = schedules.get('test-uuid')
+    assert schedule['frequency'] == 'weekly'
+    assert schedule['keep_daily'] == 3
+    assert schedule['keep_weekly'] == 4
+    assert schedule['last_scheduled'] is None
+
+    schedules.update('test-uuid', enabled=True)
+    assert schedules.get('test-uuid')['last_scheduled']
+
+    schedules.delete('test-uuid')
+    schedules.delete('test-uuid')
+    assert schedules.get('test-uuid') == schedules.DEFAULT_SCHEDULE
+
+
+def test_history():
+    """Test that only recent runs are remembered."""
+    for number in range(schedules.HISTORY_SIZE + 2):
+        schedules.record_run('test-uuid', {'name': str(number)})
+
+    history = schedules.get('test-uuid')['history']
+    assert len(history) == schedules.HISTORY_SIZE
+    assert history[0]['name'] == str(schedules.HISTORY_SIZE + 1)
+    assert history[-1]['name'] == '2'
+
+
+@pytest.mark.parametrize('frequency, now, last_due_time, next_due_time', [
+    ('hourly', datetime(2020, 5, 6, 10, 30), datetime(2020, 5, 6, 10, 0),
+     datetime(2020, 5, 6, 11, 0)),
+    ('daily', datetime(2020, 5, 6, 10, 30), datetime(2020, 5, 6, 2, 0),
+     datetime(2020, 5, 7, 2, 0)),
+    ('daily', datetime(2020, 5, 6, 1, 30), datetime(2020, 5, 5, 2, 0),
+     datetime(2020, 5, 6, 2, 0)),
+    ('daily', datetime(2020, 5, 6, 2, 0), datetime(2020, 5, 6, 2, 0),
+     datetime(2020, 5, 7, 2, 0)),
+    ('weekly', datetime(2020, 5, 6, 10, 30), datetime(2020, 5, 3, 2, 0),
+     datetime(2020, 5, 10, 2, 0)),
+    ('weekly', datetime(2020, 5, 3, 1, 0), datetime(2020, 4, 26, 2, 0),
+     datetime(2020, 5, 3, 2, 0)),
+    ('weekly', datetime(2020, 5, 3, 3, 0), datetime(2020, 5, 3, 2, 0),
+     datetime(2020, 5, 10, 2, 0)),
+])
+def test_due_time(frequency, now, last_due_time, next_due_time):
+    """Test finding times at which backups are due."""
+    schedule = dict(schedules.DEFAULT_SCHEDULE, frequency=frequency)
+    assert schedules.get_last_due_time(schedule, now) == last_due_time
+    assert schedules.get_next_due_time(schedule, now) == next_due_time
+
+
+def test_is_due():
+    """Test that a backup is due once after each scheduled time."""
+    schedule = dict(schedules.DEFAULT_SCHEDULE, frequency='daily')
+    now = datetime(2020, 5, 6, 10, 30)
+    schedule['last_scheduled'] = datetime(2020, 5, 5, 3, 0).timestamp()
+    assert not schedules.is_due(schedule, now)
+
+    schedule['enabled'] = True
+    assert schedules.is_due(schedule, now)
+
+    schedule['last_scheduled'] = datetime(2020, 5, 6, 2, 5).timestamp()
+    assert not schedules.is_due(schedule, now)
+
+
+def test_archive_name():
+    """Test name of archives created by schedules."""
+    name = schedules.get_archive_name(datetime(2020, 5, 6, 2, 0))
+    assert name == 'scheduled-2020-05-06:02:00'
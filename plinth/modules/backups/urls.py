@@ -8,8 +8,9 @@ from django.conf.urls import url
 from .views import (AddRemoteRepositoryView, AddRepositoryView,
                     CreateArchiveView, DeleteArchiveView, DownloadArchiveView,
                     IndexView, RemoveRepositoryView, RestoreArchiveView,
-                    RestoreFromUploadView, UploadArchiveView,
-                    VerifySshHostkeyView, mount_repository, umount_repository)
+                    RestoreFromUploadView, ScheduleView, UploadArchiveView,
+                    VerifySshHostkeyView, cancel_job, mount_repository,
+                    refresh_repository, umount_repository)
 
 urlpatterns = [
     url(r'^sys/backups/$', IndexView.as_view(), name='index'),
@@ -35,4 +36,10 @@ urlpatterns = [
         name='repository-mount'),
     url(r'^sys/backups/repositories/(?P<uuid>[^/]+)/umount/$',
         umount_repository, name='repository-umount'),
+    url(r'^sys/backups/repositories/(?P<uuid>[^/]+)/refresh/$',
+        refresh_repository, name='repository-refresh'),
+    url(r'^sys/backups/repositories/(?P<uuid>[^/]+)/schedule/$',
+        ScheduleView.as_view(), name='schedule'),
+    url(r'^sys/backups/jobs/(?P<job_id>[^/]+)/cancel/$', cancel_job,
+        name='cancel-job'),
 ]
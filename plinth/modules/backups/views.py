@@ -17,13 +17,14 @@ from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext as _
+from django.views.decorators.http import require_POST
 from django.views.generic import FormView, TemplateView, View
 
-from plinth.errors import PlinthError
+from plinth.errors import ActionError, PlinthError
 from plinth.modules import backups, storage
 
-from . import (SESSION_PATH_VARIABLE, api, forms, get_known_hosts_path,
-               is_ssh_hostkey_verified)
+from . import (SESSION_PATH_VARIABLE, api, errors, forms,
+               get_known_hosts_path, is_ssh_hostkey_verified, jobs, schedules)
 from .decorators import delete_tmp_backup_file
 from .repository import (BorgRepository, SshBorgRepository, get_instance,
                          get_repositories)
@@ -43,6 +44,9 @@ class IndexView(TemplateView):
         context['repositories'] = [
             repository.get_view_content() for repository in get_repositories()
         ]
+        context['jobs'] = [job.get_view_content() for job in jobs.get_jobs()]
+        context['is_running'] = any(job['is_active']
+                                    for job in context['jobs'])
         return context
 
 
@@ -52,7 +56,7 @@ class CreateArchiveView(SuccessMessageMixin, FormView):
     prefix = 'backups'
     template_name = 'backups_form.html'
     success_url = reverse_lazy('backups:index')
-    success_message = _('Archive created.')
+    success_message = _('Archive is being created.')
 
     def get_context_data(self, **kwargs):
         """Return additional context for rendering the template."""
@@ -61,15 +65,68 @@ class CreateArchiveView(SuccessMessageMixin, FormView):
         return context
 
     def form_valid(self, form):
-        """Create the archive on valid form submission."""
-        repository = get_instance(form.cleaned_data['repository'])
-        if repository.flags.get('mountable'):
-            repository.mount()
-
+        """Queue creating the archive on valid form submission."""
         name = form.cleaned_data['name'] or datetime.now().strftime(
             '%Y-%m-%d:%H:%M')
-        selected_apps = form.cleaned_data['selected_apps']
-        repository.create_archive(name, selected_apps)
+        jobs.submit('create', repository=form.cleaned_data['repository'],
+                    name=name, apps=form.cleaned_data['selected_apps'])
+        return super().form_valid(form)
+
+
+class ScheduleView(SuccessMessageMixin, FormView):
+    """View to set the schedule of backups to a repository."""
+    form_class = forms.ScheduleForm
+    prefix = 'backups'
+    template_name = 'backups_schedule.html'
+    success_url = reverse_lazy('backups:index')
+    success_message = _('Schedule updated.')
+
+    def get_initial(self):
+        """Return the values of the schedule to fill in the form."""
+        initial = super().get_initial()
+        schedule = schedules.get(self.kwargs['uuid'])
+        initial.update({
+            field: schedule[field]
+            for field in ('enabled', 'frequency', 'hour', 'keep_daily',
+                          'keep_weekly', 'keep_monthly')
+        })
+        if schedule['apps'] is not None:
+            initial['selected_apps'] = schedule['apps']
+
+        return initial
+
+    def get_context_data(self, **kwargs):
+        """Return additional context for rendering the template."""
+        context = super().get_context_data(**kwargs)
+        repository = get_instance(self.kwargs['uuid'])
+        schedule = schedules.get(repository.uuid)
+        context['title'] = _('Schedule Backups')
+        context['repository'] = repository
+        if schedule['enabled']:
+            context['next_run'] = schedules.get_next_due_time(
+                schedule, datetime.now())
+
+        context['history'] = [
+            dict(run, started=datetime.fromtimestamp(run['started']))
+            for run in schedule['history']
+        ]
+        return context
+
+    def form_valid(self, form):
+        """Save the schedule on valid form submission.
+
+        If all apps are selected, apps installed later are also backed up.
+
+        """
+        values = {
+            field: form.cleaned_data[field]
+            for field in ('enabled', 'frequency', 'hour', 'keep_daily',
+                          'keep_weekly', 'keep_monthly')
+        }
+        apps = form.cleaned_data['selected_apps']
+        all_apps = {app for app, name in form.fields['selected_apps'].choices}
+        values['apps'] = None if set(apps) == all_apps else apps
+        schedules.update(self.kwargs['uuid'], **values)
         return super().form_valid(form)
 
 
@@ -89,10 +146,9 @@ class DeleteArchiveView(SuccessMessageMixin, TemplateView):
         return context
 
     def post(self, request, uuid, name):
-        """Delete the archive."""
-        repository = get_instance(uuid)
-        repository.delete_archive(name)
-        messages.success(request, _('Archive deleted.'))
+        """Queue deleting the archive."""
+        jobs.submit('delete', repository=uuid, name=name)
+        messages.success(request, _('Archive is being deleted.'))
         return redirect('backups:index')
 
 
@@ -140,7 +196,7 @@ class BaseRestoreView(SuccessMessageMixin, FormView):
     prefix = 'backups'
     template_name = 'backups_restore.html'
     success_url = reverse_lazy('backups:index')
-    success_message = _('Restored files from backup.')
+    success_message = _('Files are being restored from backup.')
 
     def get_form_kwargs(self):
         """Pass additional keyword args for instantiating the form."""
@@ -184,10 +240,14 @@ class RestoreFromUploadView(BaseRestoreView):
         return backups.get_exported_archive_apps(path)
 
     def form_valid(self, form):
-        """Restore files from the archive on valid form submission."""
-        path = self.request.session.get(SESSION_PATH_VARIABLE)
-        selected_apps = form.cleaned_data['selected_apps']
-        backups.restore_from_upload(path, selected_apps)
+        """Queue restoring files from the archive on valid submission.
+
+        The uploaded file now belongs to the job and is deleted by it.
+
+        """
+        path = self.request.session.pop(SESSION_PATH_VARIABLE)
+        jobs.submit('restore-upload', path=path,
+                    apps=form.cleaned_data['selected_apps'])
         return super().form_valid(form)
 
 
@@ -201,10 +261,10 @@ class RestoreArchiveView(BaseRestoreView):
         return repository.get_archive_apps(name)
 
     def form_valid(self, form):
-        """Restore files from the archive on valid form submission."""
-        repository = get_instance(self.kwargs['uuid'])
-        selected_apps = form.cleaned_data['selected_apps']
-        repository.restore_archive(self.kwargs['name'], selected_apps)
+        """Queue restoring files from the archive on valid submission."""
+        jobs.submit('restore', repository=self.kwargs['uuid'],
+                    name=self.kwargs['name'],
+                    apps=form.cleaned_data['selected_apps'])
         return super().form_valid(form)
 
 
@@ -401,6 +461,29 @@ class RemoveRepositoryView(SuccessMessageMixin, TemplateView):
         return redirect('backups:index')
 
 
+def refresh_repository(request, uuid):
+    """View to update the catalog of archives in a repository."""
+    repository = get_instance(uuid)
+    try:
+        repository.refresh_catalog()
+    except (errors.BorgError, ActionError) as err:
+        msg = "%s: %s" % (_('Refreshing list of archives failed'), str(err))
+        messages.error(request, msg)
+
+    return redirect('backups:index')
+
+
+@require_POST
+def cancel_job(request, job_id):
+    """View to cancel a queued or running backup job."""
+    if jobs.cancel(job_id):
+        messages.success(request, _('Operation is being cancelled.'))
+    else:
+        messages.error(request, _('Operation has already finished.'))
+
+    return redirect('backups:index')
+
+
 def umount_repository(request, uuid):
     """View to unmount a remote SSH repository."""
     repository = SshBorgRepository.load(uuid)
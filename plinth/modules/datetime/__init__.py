@@ -9,7 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from plinth import app as app_module
 from plinth import menu
-from plinth.daemon import Daemon
+from plinth.daemon import Daemon, timed_check
 
 from .manifest import backup  # noqa, pylint: disable=unused-import
 
@@ -106,6 +106,7 @@ def setup(helper, old_version=None):
     helper.call('post', app.enable)
 
 
+@timed_check
 def _diagnose_time_synchronized():
     """Check whether time is synchronized to NTP server."""
     result = 'failed'
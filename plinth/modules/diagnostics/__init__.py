@@ -4,14 +4,16 @@ FreedomBox app for system diagnostics.
 """
 
 import collections
+import concurrent.futures
 import importlib
 import logging
 import threading
+import time
 
 from django.utils.translation import ugettext_lazy as _
 
 from plinth import app as app_module
-from plinth import daemon, menu
+from plinth import cfg, daemon, menu
 from plinth.modules.apache.components import diagnose_url_on_all
 
 from .manifest import backup  # noqa, pylint: disable=unused-import
@@ -34,6 +36,8 @@ running_task = None
 
 current_results = {}
 
+_cancel_event = threading.Event()
+
 
 class DiagnosticsApp(app_module.App):
     """FreedomBox app for diagnostics."""
@@ -78,10 +82,21 @@ def start_task():
     if running_task:
         raise Exception('Task already running')
 
+    _cancel_event.clear()
     running_task = threading.Thread(target=_run_on_all_enabled_modules_wrapper)
     running_task.start()
 
 
+def cancel_task():
+    """Request the running task to stop.
+
+    Diagnostics of apps that have not started yet are skipped. Those that are
+    already running are abandoned.
+
+    """
+    _cancel_event.set()
+
+
 def _run_on_all_enabled_modules_wrapper():
     """Wrapper over actual task to catch exceptions."""
     try:
@@ -95,11 +110,23 @@ def _run_on_all_enabled_modules_wrapper():
 
 
 def run_on_all_enabled_modules():
-    """Run diagnostics on all the enabled modules and store the result."""
+    """Run diagnostics on all the enabled modules and store the result.
+
+    Apps are diagnosed concurrently in a pool of cfg.diagnostics_workers
+    threads. Diagnostics of an app that take longer than
+    cfg.diagnostics_timeout seconds are abandoned and reported as an error.
+    When all the threads are held by abandoned apps, apps that have not
+    started are reported as an error too. Time taken by each app is stored in
+    current_results['durations'] and time taken by each of its checks in
+    current_results['check_durations'].
+
+    """
     global current_results
     current_results = {
         'apps': [],
         'results': collections.OrderedDict(),
+        'durations': {},
+        'check_durations': {},
         'progress_percentage': 0
     }
 
@@ -122,7 +149,126 @@ def run_on_all_enabled_modules():
         current_results['results'][app.app_id] = None
 
     current_results['apps'] = apps
-    for current_index, (app_id, app) in enumerate(apps):
-        current_results['results'][app_id] = app.diagnose()
+    if not apps:
+        current_results['progress_percentage'] = 100
+        return
+
+    _run_on_apps(apps, daemon.SocketSnapshot())
+
+
+def _run_on_apps(apps, snapshot):
+    """Run diagnostics on given apps in a thread pool.
+
+    All apps answer their port listening checks from the given socket
+    snapshot.
+
+    """
+    start_times = {}
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=cfg.diagnostics_workers,
+        thread_name_prefix='diagnostics')
+    futures = {}
+    for app_id, app in apps:
+        future = executor.submit(_diagnose_app, app_id, app, start_times,
+                                 snapshot)
+        futures[future] = app_id
+
+    try:
+        _collect_results(futures, start_times, len(apps))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _diagnose_app(app_id, app, start_times, snapshot):
+    """Run diagnostics on an app and return results with times taken."""
+    start_times[app_id] = time.monotonic()
+    with daemon.socket_snapshot(snapshot), \
+            daemon.check_timings() as check_durations:
+        results = app.diagnose()
+
+    return results, time.monotonic() - start_times[app_id], check_durations
+
+
+def _collect_results(futures, start_times, total):
+    """Wait for diagnostics to finish, time out or get cancelled."""
+    pending = set(futures)
+    abandoned = set()
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, timeout=1,
+            return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            _set_app_result(futures[future], future)
+
+        now = time.monotonic()
+        for future in list(pending):
+            app_id = futures[future]
+            if _cancel_event.is_set() and \
+               (future.cancel() or app_id in start_times):
+                _set_app_error(app_id, _('Diagnostics cancelled'), start_times)
+            elif app_id in start_times and \
+                    now - start_times[app_id] > cfg.diagnostics_timeout:
+                logger.warning('Diagnostics timed out for app - %s', app_id)
+                message = _('Diagnostics did not finish in {timeout} seconds')
+                _set_app_error(
+                    app_id, message.format(timeout=cfg.diagnostics_timeout),
+                    start_times)
+                abandoned.add(future)
+            else:
+                continue
+
+            pending.remove(future)
+
+        _skip_if_workers_stuck(futures, pending, abandoned, start_times)
+
         current_results['progress_percentage'] = \
-            int((current_index + 1) * 100 / len(apps))
+            int((total - len(pending)) * 100 / total)
+
+
+def _skip_if_workers_stuck(futures, pending, abandoned, start_times):
+    """Give up on apps not started when all workers run abandoned apps.
+
+    A thread running diagnostics of an app that timed out can't be stopped.
+    Apps waiting for a thread would never start once all the threads are held
+    this way.
+
+    """
+    stuck = [future for future in abandoned if not future.done()]
+    if len(stuck) < cfg.diagnostics_workers:
+        return
+
+    for future in list(pending):
+        app_id = futures[future]
+        if app_id not in start_times and future.cancel():
+            logger.warning('Diagnostics skipped for app - %s', app_id)
+            _set_app_error(
+                app_id,
+                _('Diagnostics could not start, other apps did not finish'),
+                start_times)
+            pending.remove(future)
+
+
+def _set_app_result(app_id, future):
+    """Store results of an app that finished running its diagnostics."""
+    try:
+        results, duration, check_durations = future.result()
+    except Exception as exception:
+        logger.exception('Error running diagnostics for app %s - %s', app_id,
+                         exception)
+        results = [[str(exception), 'error']]
+        duration = None
+        check_durations = {}
+
+    current_results['results'][app_id] = results
+    current_results['durations'][app_id] = duration
+    current_results['check_durations'][app_id] = check_durations
+
+
+def _set_app_error(app_id, message, start_times):
+    """Store an error result for an app that could not finish diagnostics."""
+    current_results['results'][app_id] = [[message, 'error']]
+    if app_id in start_times:
+        current_results['durations'][app_id] = \
+            time.monotonic() - start_times[app_id]
+    else:
+        current_results['durations'][app_id] = None
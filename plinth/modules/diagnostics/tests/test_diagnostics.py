@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for running diagnostics on all apps.
+"""
+
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from plinth import cfg, daemon
+from plinth.modules import diagnostics
+
+# Used by diagnostics to find whether the apps below have been setup
+setup_helper = Mock(**{'get_state.return_value': 'up-to-date'})
+
+
+class FakeApp:
+    """Minimal app with diagnostics."""
+
+    def __init__(self, app_id, results=None, delay=0, exception=None,
+                 event=None):
+        self.app_id = app_id
+        self.results = results or [['test', 'passed']]
+        self.delay = delay
+        self.exception = exception
+        self.event = event
+
+    @staticmethod
+    def is_enabled():
+        return True
+
+    @staticmethod
+    def has_diagnostics():
+        return True
+
+    def diagnose(self):
+        if self.event:
+            self.event.wait()
+
+        time.sleep(self.delay)
+        if self.exception:
+            raise self.exception
+
+        return [_check(*result) for result in self.results]
+
+
+@daemon.timed_check
+def _check(test, result):
+    """Return result of a check."""
+    return [test, result]
+
+
+@pytest.fixture(name='apps')
+def fixture_apps():
+    """Patch list of apps to diagnose."""
+    apps = []
+    with patch('plinth.app.App.list', return_value=apps):
+        yield apps
+
+
+@pytest.fixture(autouse=True)
+def fixture_config():
+    """Set number of workers and timeout."""
+    old_workers, old_timeout = cfg.diagnostics_workers, \
+        cfg.diagnostics_timeout
+    cfg.diagnostics_workers = 4
+    cfg.diagnostics_timeout = 300
+    diagnostics._cancel_event.clear()
+    yield
+    cfg.diagnostics_workers = old_workers
+    cfg.diagnostics_timeout = old_timeout
+
+
+def test_run_no_apps(apps):
+    """Test running diagnostics without any apps."""
+    diagnostics.run_on_all_enabled_modules()
+    assert diagnostics.current_results['progress_percentage'] == 100
+    assert not diagnostics.current_results['results']
+
+
+def test_run_concurrently(apps):
+    """Test that apps are diagnosed concurrently with results in order."""
+    apps.extend([
+        FakeApp('app{}'.format(index), [['test', str(index)]], delay=0.2)
+        for index in range(4)
+    ])
+    start = time.monotonic()
+    diagnostics.run_on_all_enabled_modules()
+    assert time.monotonic() - start < 0.7
+
+    results = diagnostics.current_results
+    assert list(results['results']) == ['app0', 'app1', 'app2', 'app3']
+    assert results['results']['app2'] == [['test', '2']]
+    assert results['progress_percentage'] == 100
+    assert all(duration >= 0.2 for duration in results['durations'].values())
+
+
+def test_run_exception(apps):
+    """Test that error in one app does not affect others."""
+    apps.extend(
+        [FakeApp('app1', exception=RuntimeError('x')),
+         FakeApp('app2')])
+    diagnostics.run_on_all_enabled_modules()
+    results = diagnostics.current_results['results']
+    assert results['app1'] == [['x', 'error']]
+    assert results['app2'] == [['test', 'passed']]
+
+
+def test_run_timeout(apps):
+    """Test that diagnostics taking too long are abandoned."""
+    cfg.diagnostics_timeout = 0
+    event = threading.Event()
+    apps.extend([FakeApp('app1', event=event)])
+    try:
+        diagnostics.run_on_all_enabled_modules()
+    finally:
+        event.set()
+
+    result = diagnostics.current_results['results']['app1']
+    assert result[0][1] == 'error'
+    assert diagnostics.current_results['progress_percentage'] == 100
+
+
+def test_cancel(apps):
+    """Test that pending and running diagnostics are cancelled."""
+    cfg.diagnostics_workers = 1
+    event = threading.Event()
+    apps.extend([FakeApp('app1', event=event), FakeApp('app2')])
+    diagnostics.cancel_task()
+    try:
+        diagnostics.run_on_all_enabled_modules()
+    finally:
+        event.set()
+
+    results = diagnostics.current_results['results']
+    assert results['app1'][0][1] == 'error'
+    assert results['app2'][0][1] == 'error'
+
+
+def test_run_workers_stuck(apps):
+    """Test that apps not started are skipped when all workers are stuck."""
+    cfg.diagnostics_workers = 1
+    cfg.diagnostics_timeout = 0
+    event = threading.Event()
+    apps.extend([FakeApp('app1', event=event), FakeApp('app2')])
+    try:
+        diagnostics.run_on_all_enabled_modules()
+    finally:
+        event.set()
+
+    results = diagnostics.current_results
+    assert results['results']['app1'][0][1] == 'error'
+    assert results['results']['app2'][0][1] == 'error'
+    assert results['durations']['app2'] is None
+    assert results['progress_percentage'] == 100
+
+
+def test_run_check_durations(apps):
+    """Test that time taken by each check is recorded."""
+    apps.extend([FakeApp('app1', [['test1', 'passed'], ['test2', 'failed']])])
+    diagnostics.run_on_all_enabled_modules()
+    check_durations = diagnostics.current_results['check_durations']['app1']
+    assert set(check_durations) == {'test1', 'test2'}
+    assert all(duration >= 0 for duration in check_durations.values())
@@ -8,20 +8,34 @@ from django.template.response import TemplateResponse
 from django.utils.translation import ugettext_lazy as _
 from django.views.decorators.http import require_POST
 
+from plinth import daemon
 from plinth.app import App
 from plinth.modules import diagnostics
 
 
 def index(request):
     """Serve the index page"""
-    if request.method == 'POST' and not diagnostics.running_task:
-        diagnostics.start_task()
+    if request.method == 'POST':
+        if 'cancel' in request.POST:
+            diagnostics.cancel_task()
+        elif not diagnostics.running_task:
+            diagnostics.start_task()
 
+    results = diagnostics.current_results
+    durations = results.get('durations', {})
+    check_durations = results.get('check_durations', {})
+    app_results = [
+        (app_id,
+         _add_check_durations(app_result, check_durations.get(app_id, {})),
+         durations.get(app_id))
+        for app_id, app_result in results.get('results', {}).items()
+    ]
     return TemplateResponse(
         request, 'diagnostics.html', {
             'app_info': diagnostics.app.info,
             'is_running': diagnostics.running_task is not None,
-            'results': diagnostics.current_results
+            'results': results,
+            'app_results': app_results,
         })
 
 
@@ -33,8 +47,20 @@ def diagnose_app(request, app_id):
     except KeyError:
         raise Http404('App does not exist')
 
+    with daemon.socket_snapshot(), daemon.check_timings() as check_durations:
+        results = app.diagnose()
+
     return TemplateResponse(request, 'diagnostics_app.html', {
         'title': _('Diagnostic Test'),
         'app_id': app_id,
-        'results': app.diagnose()
+        'results': _add_check_durations(results, check_durations)
     })
+
+
+def _add_check_durations(results, check_durations):
+    """Return results with time taken by each check, if known."""
+    if results is None:
+        return None
+
+    return [(test, result, check_durations.get(str(test)))
+            for test, result in results]
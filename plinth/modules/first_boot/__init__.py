@@ -90,9 +90,10 @@ def next_step_or_none():
     """
     from plinth import kvstore
 
-    for step in _get_steps():
-        done = kvstore.get_default(step['id'], 0)
-        if not done:
+    steps = _get_steps()
+    done = kvstore.get_many([step['id'] for step in steps], 0)
+    for step in steps:
+        if not done[step['id']]:
             return step.get('url')
 
 
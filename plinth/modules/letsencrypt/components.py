@@ -8,7 +8,7 @@ import logging
 import pathlib
 import threading
 
-from plinth import actions, app
+from plinth import actions, app, cache
 
 logger = logging.getLogger(__name__)
 
@@ -375,6 +375,8 @@ def on_certificate_event_sync(event, domains, lineage):
 
     assert event in ('obtained', 'renewed', 'revoked', 'deleted')
 
+    cache.invalidate('letsencrypt-status')
+
     for component in LetsEncrypt.list():
         logger.info('Handling certificate event for %s: %s, %s, %s',
                     component.component_id, event, domains, lineage)
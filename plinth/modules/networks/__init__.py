@@ -135,6 +135,7 @@ def _get_interface_addresses(interfaces):
     return addresses
 
 
+@daemon.timed_check
 def _diagnose_dnssec(kind='4'):
     """Perform diagnostic on whether the system is using DNSSEC.
 
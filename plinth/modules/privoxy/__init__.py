@@ -9,7 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 from plinth import action_utils, actions
 from plinth import app as app_module
 from plinth import cfg, frontpage, menu
-from plinth.daemon import Daemon
+from plinth.daemon import Daemon, timed_check
 from plinth.modules.apache.components import diagnose_url
 from plinth.modules.firewall.components import Firewall
 from plinth.utils import format_lazy
@@ -106,6 +106,7 @@ def setup(helper, old_version=None):
     helper.call('post', app.enable)
 
 
+@timed_check
 def diagnose_url_with_proxy():
     """Run a diagnostic on a URL with a proxy."""
     url = 'https://debian.org/'  # Gives a simple redirect to www.
@@ -12,7 +12,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from plinth import actions
 from plinth import app as app_module
-from plinth import menu, module_loader
+from plinth import cache, menu, module_loader
+from plinth.signals import post_setup
 
 from .manifest import backup  # noqa, pylint: disable=unused-import
 
@@ -57,6 +58,8 @@ def init():
     app = SecurityApp()
     app.set_enabled(True)
 
+    post_setup.connect(_on_post_setup)
+
 
 def setup(helper, old_version=None):
     """Install the required packages"""
@@ -100,6 +103,12 @@ def set_restricted_access(enabled):
     actions.superuser_run('security', [action])
 
 
+def _on_post_setup(sender, module_name, **kwargs):
+    """Discard security report after an app is installed or updated."""
+    get_apps_report.invalidate()
+
+
+@cache.cached('security-apps-report', timeout=3600)
 def get_apps_report():
     """Return a security report for each app"""
     lines = subprocess.check_output(['debsecan']).decode().split('\n')
@@ -13,7 +13,7 @@ from django.utils.translation import ugettext_noop
 
 from plinth import actions
 from plinth import app as app_module
-from plinth import cfg, glib, menu, utils
+from plinth import cache, cfg, glib, menu, utils
 from plinth.errors import ActionError, PlinthError
 from plinth.utils import format_lazy, import_from_gi
 
@@ -74,6 +74,7 @@ def init():
     app.set_enabled(True)
 
 
+@cache.cached('storage-disks', timeout=30)
 def get_disks():
     """Returns list of disks by combining information from df and udisks."""
     disks = _get_disks_from_df()
@@ -183,6 +184,7 @@ def get_root_device(disks):
     return None
 
 
+@cache.cached('storage-expandable', timeout=3600)
 def is_expandable(device):
     """Return the list of partitions that can be expanded."""
     if not device:
@@ -201,6 +203,8 @@ def is_expandable(device):
 def expand_partition(device):
     """Expand a partition."""
     actions.superuser_run('storage', ['expand-partition', device])
+    get_disks.invalidate()
+    is_expandable.invalidate()
 
 
 def format_bytes(size):
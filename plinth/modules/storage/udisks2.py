@@ -6,7 +6,7 @@ Handle disk operations using UDisk2 DBus API.
 import logging
 import threading
 
-from plinth import actions
+from plinth import actions, cache
 from plinth.errors import ActionError
 from plinth.utils import import_from_gi
 
@@ -238,6 +238,7 @@ def _on_interfaces_added(_connection, _sender_name, _object_path,
 
     """
     object_path, interfaces = parameters
+    cache.invalidate('storage-disks')
     if object_path.startswith(_OBJECTS['jobs']):
         _on_job_created(object_path, interfaces)
 
@@ -254,6 +255,7 @@ def _on_interfaces_removed(_connection, _sender_name, _object_path,
 
     """
     object_path, _interfaces = parameters
+    cache.invalidate('storage-disks')
     if object_path.startswith(_OBJECTS['jobs']):
         _on_job_removed(object_path)
 
@@ -267,6 +269,11 @@ def _on_properties_changed(_connection, _sender_name, object_path,
 
     """
     interface_changed, properties_changed, _properties_invalided = parameters
+    if interface_changed == _INTERFACES['Filesystem'] and \
+       'MountPoints' in properties_changed:
+        # Mounted or unmounted, automatically or otherwise
+        cache.invalidate('storage-disks')
+
     if interface_changed == _INTERFACES['Ata'] and \
        'SmartFailing' in properties_changed:
         drive = Drive(object_path)
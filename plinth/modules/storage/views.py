@@ -84,6 +84,7 @@ def eject(request, device_path):
     try:
         drive = json.loads(
             actions.superuser_run('storage', ['eject', device_path]))
+        storage.get_disks.invalidate()
         if drive:
             messages.success(
                 request,
@@ -10,7 +10,8 @@ from django.utils.translation import ugettext_lazy as _
 from plinth import action_utils, actions
 from plinth import app as app_module
 from plinth import menu
-from plinth.daemon import Daemon, diagnose_netcat, diagnose_port_listening
+from plinth.daemon import (Daemon, diagnose_netcat, diagnose_port_listening,
+                           timed_check)
 from plinth.modules.apache.components import diagnose_url
 from plinth.modules.firewall.components import Firewall
 from plinth.modules.names.components import DomainType
@@ -185,6 +186,7 @@ def update_hidden_service_domain(status=None):
                                  name=status['hs_hostname'], services=services)
 
 
+@timed_check
 def _diagnose_control_port():
     """Diagnose whether Tor control port is open on 127.0.0.1 only."""
     results = []
@@ -205,6 +207,7 @@ def _diagnose_control_port():
     return results
 
 
+@timed_check
 def _diagnose_url_via_tor(url, kind=None):
     """Diagnose whether a URL is reachable via Tor."""
     result = diagnose_url(url, kind=kind, wrapper='torsocks')
@@ -214,6 +217,7 @@ def _diagnose_url_via_tor(url, kind=None):
     return result
 
 
+@timed_check
 def _diagnose_tor_use(url, kind=None):
     """Diagnose whether webpage at URL reports that we are using Tor."""
     expected_output = 'Congratulations. This browser is configured to use Tor.'
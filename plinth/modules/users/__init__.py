@@ -11,7 +11,7 @@ from django.utils.translation import ugettext_lazy as _
 from plinth import actions
 from plinth import app as app_module
 from plinth import cfg, menu
-from plinth.daemon import Daemon
+from plinth.daemon import Daemon, timed_check
 from plinth.utils import format_lazy
 
 from .components import UsersAndGroups
@@ -107,6 +107,7 @@ def setup(helper, old_version=None):
     create_group('freedombox-share')
 
 
+@timed_check
 def _diagnose_ldap_entry(search_item):
     """Diagnose that an LDAP entry exists."""
     result = 'failed'
@@ -19,7 +19,7 @@ from plinth.errors import ActionError
 from plinth.modules import first_boot
 from plinth.modules.security import set_restricted_access
 from plinth.translation import set_language
-from plinth.utils import is_user_admin
+from plinth.utils import invalidate_user_groups, is_user_admin
 
 from . import get_last_admin_user
 from .components import UsersAndGroups
@@ -137,6 +137,8 @@ class CreateUserForm(ValidNewUsernameCheckMixin,
                 group_object, created = Group.objects.get_or_create(name=group)
                 group_object.user_set.add(user)
 
+            invalidate_user_groups(user.get_username())
+
         return user
 
 
@@ -217,53 +219,43 @@ class UserUpdateForm(ValidNewUsernameCheckMixin,
         if commit:
             user.save()
             self.save_m2m()
+            invalidate_user_groups(self.username)
+            invalidate_user_groups(user.get_username())
 
             output = actions.superuser_run('users',
                                            ['get-user-groups', self.username])
             old_groups = output.strip().split('\n')
             old_groups = [group for group in old_groups if group]
 
+            # Run all LDAP changes in a single privileged invocation. Each
+            # command is paired with the message to show when it fails.
+            commands = []
             if self.username != user.get_username():
-                try:
-                    actions.superuser_run(
-                        'users',
-                        ['rename-user', self.username,
-                         user.get_username()])
-                except ActionError:
-                    messages.error(self.request,
-                                   _('Renaming LDAP user failed.'))
+                commands.append((('users', [
+                    'rename-user', self.username,
+                    user.get_username()
+                ], None), _('Renaming LDAP user failed.')))
 
             new_groups = user.groups.values_list('name', flat=True)
             for old_group in old_groups:
                 if old_group not in new_groups:
-                    try:
-                        actions.superuser_run('users', [
-                            'remove-user-from-group',
-                            user.get_username(), old_group
-                        ])
-                    except ActionError:
-                        messages.error(self.request,
-                                       _('Failed to remove user from group.'))
+                    commands.append((('users', [
+                        'remove-user-from-group',
+                        user.get_username(), old_group
+                    ], None), _('Failed to remove user from group.')))
 
             for new_group in new_groups:
                 if new_group not in old_groups:
-                    try:
-                        actions.superuser_run('users', [
-                            'add-user-to-group',
-                            user.get_username(), new_group
-                        ])
-                    except ActionError:
-                        messages.error(self.request,
-                                       _('Failed to add user to group.'))
+                    commands.append((('users', [
+                        'add-user-to-group',
+                        user.get_username(), new_group
+                    ], None), _('Failed to add user to group.')))
 
-            try:
-                actions.superuser_run('ssh', [
-                    'set-keys', '--username',
-                    user.get_username(), '--keys',
-                    self.cleaned_data['ssh_keys'].strip()
-                ])
-            except ActionError:
-                messages.error(self.request, _('Unable to set SSH keys.'))
+            commands.append((('ssh', [
+                'set-keys', '--username',
+                user.get_username(), '--keys',
+                self.cleaned_data['ssh_keys'].strip()
+            ], None), _('Unable to set SSH keys.')))
 
             is_active = self.cleaned_data['is_active']
             if self.initial['is_active'] != is_active:
@@ -271,14 +263,22 @@ class UserUpdateForm(ValidNewUsernameCheckMixin,
                     status = 'active'
                 else:
                     status = 'inactive'
-                try:
-                    actions.superuser_run(
-                        'users',
-                        ['set-user-status',
-                         user.get_username(), status])
-                except ActionError:
-                    messages.error(self.request,
-                                   _('Failed to change user status.'))
+
+                commands.append((('users', [
+                    'set-user-status',
+                    user.get_username(), status
+                ], None), _('Failed to change user status.')))
+
+            try:
+                results = actions.run_batch(
+                    [command for command, _message in commands])
+            except ActionError as exception:
+                results = [(None, exception)] * len(commands)
+
+            for (_command, message), (_output, error) in zip(commands,
+                                                             results):
+                if error:
+                    messages.error(self.request, message)
 
         return user
 
@@ -360,6 +360,7 @@ class FirstBootForm(ValidNewUsernameCheckMixin, auth.forms.UserCreationForm):
 
             admin_group = auth.models.Group.objects.get(name='admin')
             admin_group.user_set.add(user)
+            invalidate_user_groups(user.get_username())
 
             self.login_user(self.cleaned_data['username'],
                             self.cleaned_data['password1'])
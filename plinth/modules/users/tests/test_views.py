@@ -43,6 +43,12 @@ def action_run(action, options, **kwargs):
     return None
 
 
+def action_run_batch(commands, log_error=True):
+    """Action run_batch mock."""
+    return [(action_run(action, options, input=input_), None)
+            for action, options, input_ in commands]
+
+
 @pytest.fixture(autouse=True)
 def module_patch():
     """Patch users module."""
@@ -55,7 +61,8 @@ def module_patch():
                    reserved_usernames=['debian-minetest'])
 
     with patch('pwd.getpwall', return_value=pwd_users),\
-            patch('plinth.actions.superuser_run', side_effect=action_run):
+            patch('plinth.actions.superuser_run', side_effect=action_run), \
+            patch('plinth.actions.run_batch', side_effect=action_run_batch):
         yield
 
 
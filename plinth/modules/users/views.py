@@ -15,7 +15,7 @@ from django.views.generic.edit import (CreateView, DeleteView, FormView,
 from plinth import actions
 from plinth.errors import ActionError
 from plinth.modules import first_boot
-from plinth.utils import is_user_admin
+from plinth.utils import invalidate_user_groups, is_user_admin
 from plinth.views import AppView
 
 from . import get_last_admin_user
@@ -126,6 +126,7 @@ class UserDelete(ContextMixin, DeleteView):
         so set the success message manually here.
         """
         output = super(UserDelete, self).delete(*args, **kwargs)
+        invalidate_user_groups(self.kwargs['slug'])
 
         message = _('User {user} deleted.').format(user=self.kwargs['slug'])
         messages.success(self.request, message)
@@ -5,20 +5,31 @@ Module to provide API for showing notifications.
 
 import copy
 import logging
+import threading
 
 from django.core.exceptions import ValidationError
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.template.exceptions import TemplateDoesNotExist
 from django.template.response import SimpleTemplateResponse
-from django.utils.translation import ugettext
+from django.utils.translation import get_language, ugettext
 
 from plinth import cfg
+from plinth.utils import get_user_groups
 
 from . import models
 
 severities = {'exception': 5, 'error': 4, 'warning': 3, 'info': 2, 'debug': 1}
 logger = logging.getLogger(__name__)
 
+# Maximum number of display contexts, one for each combination of user,
+# groups and language, to keep in cache
+MAX_CACHED_DISPLAY_CONTEXTS = 100
+
+_display_contexts = {}
+_display_contexts_generation = 0
+_display_contexts_lock = threading.Lock()
+
 
 class Notification(models.StoredNotification):
     """API to create persistent global notifications to users.
@@ -267,8 +278,7 @@ class Notification(models.StoredNotification):
             filters.append(Q(app_id=app_id))
 
         if user:
-            # XXX: Consider implementing caching for user groups
-            groups = user.groups.values_list('name', flat=True)
+            groups = get_user_groups(user.username)
             filters.append(Q(user__isnull=True) | Q(user=user.username))
             filters.append(Q(group__isnull=True) | Q(group__in=groups))
 
@@ -330,7 +340,34 @@ class Notification(models.StoredNotification):
 
     @staticmethod
     def get_display_context(user):
-        """Return a list of notifications meant for display to a user."""
+        """Return a list of notifications meant for display to a user.
+
+        Display context is prepared once for a combination of user, groups of
+        the user and language. It is reused until any notification changes.
+
+        """
+        key = (user.username, get_user_groups(user.username), get_language(),
+               cfg.box_name)
+        with _display_contexts_lock:
+            context = _display_contexts.get(key)
+            generation = _display_contexts_generation
+
+        if context is not None:
+            return context
+
+        context = Notification._get_display_context(user)
+        with _display_contexts_lock:
+            if generation == _display_contexts_generation:
+                if len(_display_contexts) >= MAX_CACHED_DISPLAY_CONTEXTS:
+                    _display_contexts.clear()
+
+                _display_contexts[key] = context
+
+        return context
+
+    @staticmethod
+    def _get_display_context(user):
+        """Prepare a list of notifications meant for display to a user."""
         notifications = Notification.list(user=user)
         max_severity = max(notifications, default=None,
                            key=lambda note: note.severity_value)
@@ -362,3 +399,16 @@ class Notification(models.StoredNotification):
             })
 
         return {'notifications': notes, 'max_severity': max_severity}
+
+
+def _on_notification_changed(**kwargs):
+    """Forget all display contexts when a notification is changed."""
+    global _display_contexts_generation
+    with _display_contexts_lock:
+        _display_contexts_generation += 1
+        _display_contexts.clear()
+
+
+for _sender in (models.StoredNotification, Notification):
+    post_save.connect(_on_notification_changed, sender=_sender)
+    post_delete.connect(_on_notification_changed, sender=_sender)
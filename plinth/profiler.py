@@ -0,0 +1,123 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Measure time and memory taken by each step of service startup.
+
+Enabled with the --profile-startup command line option. Steps of startup such
+as importing and initializing each app, setting up Django, running database
+migrations and mounting applications on CherryPy are wrapped with
+:py:func:`measure`. When profiling is not enabled, this does nothing. After
+startup, a report sorted by time taken is logged and also written as a JSON
+file so that it can be compared across releases.
+"""
+
+import contextlib
+import json
+import logging
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+_enabled = False
+_start_time = None
+_records = []
+
+
+def start():
+    """Start recording measurements."""
+    global _enabled, _start_time
+    _enabled = True
+    _start_time = time.perf_counter()
+    _records.clear()
+
+    # Account for interpreter startup and imports done before profiling began
+    process = psutil.Process()
+    _records.append({
+        'category': 'python',
+        'name': 'interpreter and core imports',
+        'start': 0.0,
+        'duration': max(time.time() - process.create_time(), 0.0),
+        'memory': process.memory_info().rss,
+    })
+
+
+def is_enabled():
+    """Return whether measurements are being recorded."""
+    return _enabled
+
+
+@contextlib.contextmanager
+def measure(category, name):
+    """Record wall time and resident memory growth of a step of startup."""
+    if not _enabled:
+        yield
+        return
+
+    process = psutil.Process()
+    memory = process.memory_info().rss
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        end_time = time.perf_counter()
+        _records.append({
+            'category': category,
+            'name': name,
+            'start': start_time - _start_time,
+            'duration': end_time - start_time,
+            'memory': process.memory_info().rss - memory,
+        })
+
+
+def get_report():
+    """Return the measurements and a summary of startup as a dictionary."""
+    from plinth import __version__
+    total_time = _records[0]['duration'] + time.perf_counter() - _start_time
+    categories = {}
+    for record in _records:
+        categories.setdefault(record['category'], 0.0)
+        categories[record['category']] += record['duration']
+
+    return {
+        'version': __version__,
+        'total_time': total_time,
+        'resident_memory': psutil.Process().memory_info().rss,
+        'categories': categories,
+        'steps': sorted(_records, key=lambda record: record['duration'],
+                        reverse=True),
+    }
+
+
+def finish(path):
+    """Stop recording, log the report and write it to a JSON file."""
+    global _enabled
+    if not _enabled:
+        return
+
+    report = get_report()
+    _enabled = False
+
+    lines = [
+        'Startup profile: {:.3f}s total, {:.1f} MiB resident'.format(
+            report['total_time'], report['resident_memory'] / 2**20)
+    ]
+    for category, duration in sorted(report['categories'].items(),
+                                     key=lambda item: item[1], reverse=True):
+        lines.append('{:9.3f}s total for {}'.format(duration, category))
+
+    for step in report['steps']:
+        lines.append('{:9.3f}s {:+8.1f} MiB  {} {}'.format(
+            step['duration'], step['memory'] / 2**20, step['category'],
+            step['name']))
+
+    logger.info('\n'.join(lines))
+
+    try:
+        with open(path, 'w') as file_handle:
+            json.dump(report, file_handle, indent=2)
+    except OSError as exception:
+        logger.warning('Unable to write startup profile to %s: %s', path,
+                       exception)
+    else:
+        logger.info('Startup profile written to %s', path)
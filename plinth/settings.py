@@ -174,6 +174,9 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'plinth.context_processors.common',
             ],
+            'libraries': {
+                'static': 'plinth.templatetags.plinth_static',
+            },
         },
     },
 ]
@@ -25,6 +25,9 @@ _is_shutting_down = False
 
 _force_upgrader = None
 
+_setup_versions = None
+_setup_versions_lock = threading.Lock()
+
 
 class Helper(object):
     """Helper routines for modules to show progress."""
@@ -138,21 +141,17 @@ class Helper(object):
 
     def get_setup_version(self):
         """Return the setup version of a module."""
-        # XXX: Optimize version gets
-        from . import models
-
-        try:
-            module_entry = models.Module.objects.get(pk=self.module_name)
-            return module_entry.setup_version
-        except models.Module.DoesNotExist:
-            return 0
+        return _get_setup_versions().get(self.module_name, 0)
 
     def set_setup_version(self, version):
         """Set a module's setup version."""
         from . import models
 
-        models.Module.objects.update_or_create(
-            pk=self.module_name, defaults={'setup_version': version})
+        with _setup_versions_lock:
+            models.Module.objects.update_or_create(
+                pk=self.module_name, defaults={'setup_version': version})
+            if _setup_versions is not None:
+                _setup_versions[self.module_name] = version
 
     def has_unavailable_packages(self):
         """Find if any of the packages managed by the module are not available.
@@ -175,6 +174,27 @@ class Helper(object):
         return any(unavailable_pkgs)
 
 
+def _get_setup_versions():
+    """Return setup versions of all modules, reading them once from database.
+
+    All changes to setup versions are made through Helper.set_setup_version()
+    which keeps this cache current.
+
+    """
+    global _setup_versions
+    if _setup_versions is not None:
+        return _setup_versions
+
+    from . import models
+
+    with _setup_versions_lock:
+        if _setup_versions is None:
+            _setup_versions = dict(
+                models.Module.objects.values_list('name', 'setup_version'))
+
+    return _setup_versions
+
+
 def init(module_name, module):
     """Create a setup helper for a module for later use."""
     if not hasattr(module, 'setup_helper'):
@@ -195,6 +215,10 @@ def setup_modules(module_list=None, essential=False, allow_install=True):
     logger.info(
         'Running setup for modules, essential - %s, '
         'selected modules - %s', essential, module_list)
+    for module_name in module_list or []:
+        if plinth.module_loader.is_module_lazy(module_name):
+            plinth.module_loader.load_module(module_name)
+
     for module_name, module in plinth.module_loader.loaded_modules.items():
         if essential and not _is_module_essential(module):
             continue
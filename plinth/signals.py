@@ -7,6 +7,7 @@ from django.dispatch import Signal
 
 pre_module_loading = Signal()
 post_module_loading = Signal()
+post_app_loading = Signal(providing_args=['module_name'])
 post_setup = Signal(providing_args=['module_name'])
 pre_hostname_change = Signal(providing_args=['old_hostname', 'new_hostname'])
 post_hostname_change = Signal(providing_args=['old_hostname', 'new_hostname'])
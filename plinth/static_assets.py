@@ -0,0 +1,227 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Precompress static files and version their URLs.
+
+During build, each static directory gets gzip and, if the brotli module is
+available, brotli compressed copies of text files next to the originals. A
+manifest listing the hash of each file's content and the compressed variants
+available is written into the directory.
+
+When a static directory with a manifest is served, URLs of its files generated
+by the {% static %} template tag carry the content hash as a query parameter.
+Such URLs change whenever the file changes, so browsers are allowed to cache
+them forever. The web server picks the compressed variant accepted by the
+browser without compressing anything itself.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'static-manifest.json'
+
+MANIFEST_VERSION = 1
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.eot', '.html', '.ico', '.js', '.json',
+                           '.map', '.otf', '.svg', '.ttf', '.txt', '.xml')
+
+# Encodings in order of preference and extensions of their files
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+MINIMUM_SIZE = 256
+
+HASH_LENGTH = 12
+
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+def build(directory):
+    """Write compressed variants and manifest for a static directory."""
+    files = {}
+    for path in sorted(_walk(directory)):
+        with open(path, 'rb') as file_handle:
+            content = file_handle.read()
+
+        encodings = []
+        if path.endswith(COMPRESSIBLE_EXTENSIONS) and \
+           len(content) >= MINIMUM_SIZE:
+            for encoding, extension in ENCODINGS:
+                compressed = _compress(content, encoding)
+                if compressed and len(compressed) < len(content):
+                    _write_if_changed(path + extension, compressed)
+                    encodings.append(encoding)
+                else:
+                    _remove(path + extension)
+
+        relative_path = os.path.relpath(path, directory)
+        files[relative_path.replace(os.sep, '/')] = {
+            'hash': hashlib.sha256(content).hexdigest()[:HASH_LENGTH],
+            'encodings': encodings,
+        }
+
+    manifest = {'version': MANIFEST_VERSION, 'files': files}
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as file_handle:
+        json.dump(manifest, file_handle, indent=1, sort_keys=True)
+
+    return manifest
+
+
+def clean(directory):
+    """Remove compressed variants and manifest from a static directory."""
+    _remove(os.path.join(directory, MANIFEST_NAME))
+    for path in _walk(directory):
+        for _, extension in ENCODINGS:
+            _remove(path + extension)
+
+
+def _walk(directory):
+    """Yield paths of static files in a directory excluding generated ones."""
+    extensions = tuple(extension for _, extension in ENCODINGS)
+    for path, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if file_name == MANIFEST_NAME or file_name.endswith(extensions):
+                continue
+
+            file_path = os.path.join(path, file_name)
+            if not os.path.islink(file_path):
+                yield file_path
+
+
+def _compress(content, encoding):
+    """Return content compressed with an encoding or None if unavailable."""
+    if encoding == 'gzip':
+        return gzip.compress(content, compresslevel=9, mtime=0)
+
+    try:
+        import brotli
+    except ImportError:
+        return None
+
+    return brotli.compress(content, quality=11)
+
+
+def _write_if_changed(path, content):
+    """Write a file unless it already has the given content."""
+    try:
+        with open(path, 'rb') as file_handle:
+            if file_handle.read() == content:
+                return
+    except FileNotFoundError:
+        pass
+
+    with open(path, 'wb') as file_handle:
+        file_handle.write(content)
+
+
+def _remove(path):
+    """Remove a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def register(directory, url, read_manifest=True):
+    """Remember the static directory served on a URL and read its manifest.
+
+    Directories without a manifest are served as they are and their URLs are
+    not versioned.
+
+    """
+    if not read_manifest:
+        manifest = None
+    else:
+        manifest = _read_manifest(directory)
+
+    files = manifest['files'] if manifest else None
+    with _directories_lock:
+        _directories[url.rstrip('/') + '/'] = (directory, files)
+
+
+def _read_manifest(directory):
+    """Return the manifest of a static directory or None."""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as file_handle:
+            manifest = json.load(file_handle)
+    except FileNotFoundError:
+        manifest = None
+    except (OSError, ValueError) as exception:
+        logger.warning('Unable to read static files manifest in %s: %s',
+                       directory, exception)
+        manifest = None
+
+    if manifest and manifest.get('version') != MANIFEST_VERSION:
+        logger.warning('Ignoring static files manifest of unknown version '
+                       'in %s', directory)
+        manifest = None
+
+    return manifest
+
+
+def unregister_all():
+    """Forget all static directories."""
+    with _directories_lock:
+        _directories.clear()
+
+
+def get_versioned_url(url):
+    """Return URL with hash of file's content if it is known."""
+    directory, files, relative_path = _lookup(url)
+    entry = files.get(relative_path) if files else None
+    if not entry:
+        return url
+
+    separator = '&' if '?' in url else '?'
+    return '{}{}v={}'.format(url, separator, entry['hash'])
+
+
+def get_encodings(url):
+    """Return path of file served on URL and its compressed variants.
+
+    Returns (None, []) if the URL does not belong to a static directory. If the
+    directory has no manifest, compressed variants are looked for on disk.
+
+    """
+    directory, files, relative_path = _lookup(url)
+    if directory is None:
+        return None, []
+
+    path = os.path.normpath(os.path.join(directory, relative_path))
+    if not path.startswith(os.path.join(os.path.normpath(directory), '')):
+        return None, []
+
+    if files is not None:
+        entry = files.get(relative_path)
+        return path, entry['encodings'] if entry else []
+
+    return path, [
+        encoding for encoding, extension in ENCODINGS
+        if os.path.isfile(path + extension)
+    ]
+
+
+def _lookup(url):
+    """Return directory, its manifest files and path of URL within it."""
+    url = url.split('?', 1)[0]
+    index = len(url)
+    while index > 0:
+        index = url.rfind('/', 0, index)
+        if index < 0:
+            break
+
+        prefix = url[:index + 1]
+        try:
+            directory, files = _directories[prefix]
+        except KeyError:
+            continue
+
+        return directory, files, urllib.parse.unquote(url[index + 1:])
+
+    return None, None, None
@@ -0,0 +1,311 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Cache of systemd unit states maintained using a single D-Bus connection.
+
+Finding whether a unit is running or enabled by spawning systemctl is slow and
+is done for every daemon of an app on every app page. Instead, during startup,
+a connection is made to systemd over D-Bus from the glib main loop thread. All
+loaded units and unit files are listed once and their states are kept current
+by listening to signals emitted by systemd. Units not yet known are looked up
+over D-Bus on first query and then tracked similarly.
+
+When the cache is not available, such as when D-Bus is not reachable or when
+running inside an action, queries return None and callers are expected to
+fall back to other means.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SYSTEMD_BUS_NAME = 'org.freedesktop.systemd1'
+SYSTEMD_PATH = '/org/freedesktop/systemd1'
+MANAGER_INTERFACE = 'org.freedesktop.systemd1.Manager'
+UNIT_INTERFACE = 'org.freedesktop.systemd1.Unit'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+NO_SUCH_UNIT_ERROR = 'org.freedesktop.systemd1.NoSuchUnit'
+# Returned by GetUnitFileState for units that are not installed
+FILE_NOT_FOUND_ERROR = 'org.freedesktop.DBus.Error.FileNotFound'
+
+UNIT_TYPES = ('service', 'socket', 'device', 'mount', 'automount', 'swap',
+              'target', 'path', 'timer', 'slice', 'scope')
+
+# States for which 'systemctl is-enabled' exits successfully
+ENABLED_STATES = ('enabled', 'enabled-runtime', 'static', 'alias', 'indirect',
+                  'generated', 'transient')
+
+# States for which 'systemctl status' exits successfully
+RUNNING_STATES = ('active', 'reloading')
+
+_cache = None
+
+gio = None
+glib = None
+
+
+class UnitNotFound(Exception):
+    """Raised when systemd does not know about a unit."""
+
+
+class UnitStateCache:
+    """Track active states and unit file states of systemd units."""
+
+    def __init__(self, connection):
+        """Initialize the cache over an established D-Bus connection."""
+        self.connection = connection
+        self._lock = threading.Lock()
+        self._unit_paths = {}
+        self._active_states = {}
+        self._unit_file_states = {}
+
+    def subscribe(self):
+        """Ask systemd to emit signals and listen to the relevant ones."""
+        self._call_async(SYSTEMD_PATH, MANAGER_INTERFACE, 'Subscribe')
+
+        flags = gio.DBusSignalFlags.NONE
+        self.connection.signal_subscribe(SYSTEMD_BUS_NAME,
+                                         PROPERTIES_INTERFACE,
+                                         'PropertiesChanged', None,
+                                         UNIT_INTERFACE, flags,
+                                         self._on_signal, None)
+        for signal in ('UnitNew', 'UnitRemoved', 'UnitFilesChanged',
+                       'Reloading'):
+            self.connection.signal_subscribe(SYSTEMD_BUS_NAME,
+                                             MANAGER_INTERFACE, signal,
+                                             SYSTEMD_PATH, None, flags,
+                                             self._on_signal, None)
+
+    def populate(self):
+        """Fetch states of all loaded units and unit files."""
+        self._call_async(SYSTEMD_PATH, MANAGER_INTERFACE, 'ListUnits',
+                         callback=self._on_list_units)
+        self._call_async(SYSTEMD_PATH, MANAGER_INTERFACE, 'ListUnitFiles',
+                         callback=self._on_list_unit_files)
+
+    def is_running(self, unit):
+        """Return whether a unit is active."""
+        unit = normalize_unit_name(unit)
+        with self._lock:
+            path = self._unit_paths.get(unit, False)
+            if path is None:
+                return False  # Not loaded
+
+            state = self._active_states.get(path)
+
+        if state is not None:
+            return state in RUNNING_STATES
+
+        try:
+            path = self._call(SYSTEMD_PATH, MANAGER_INTERFACE, 'GetUnit',
+                              '(s)', (unit, ))[0]
+        except UnitNotFound:
+            with self._lock:
+                self._unit_paths[unit] = None
+
+            return False
+
+        state = self._call(path, PROPERTIES_INTERFACE, 'Get', '(ss)',
+                           (UNIT_INTERFACE, 'ActiveState'))[0]
+        with self._lock:
+            self._unit_paths[unit] = path
+            self._active_states[path] = state
+
+        return state in RUNNING_STATES
+
+    def get_unit_file_state(self, unit):
+        """Return the unit file state as shown by 'systemctl is-enabled'.
+
+        Return None if the unit file does not exist.
+
+        """
+        unit = normalize_unit_name(unit)
+        with self._lock:
+            if unit in self._unit_file_states:
+                return self._unit_file_states[unit]
+
+        try:
+            state = self._call(SYSTEMD_PATH, MANAGER_INTERFACE,
+                               'GetUnitFileState', '(s)', (unit, ))[0]
+        except UnitNotFound:
+            state = None
+
+        with self._lock:
+            self._unit_file_states[unit] = state
+
+        return state
+
+    def _call(self, path, interface, method, signature=None, arguments=None):
+        """Synchronously call a method on systemd and return unpacked result.
+
+        Raise UnitNotFound if systemd reports that the unit does not exist.
+
+        """
+        parameters = None
+        if signature:
+            parameters = glib.Variant(signature, arguments)
+
+        try:
+            result = self.connection.call_sync(SYSTEMD_BUS_NAME, path,
+                                               interface, method, parameters,
+                                               None, gio.DBusCallFlags.NONE,
+                                               -1, None)
+        except glib.Error as exception:
+            if gio.DBusError.get_remote_error(exception) in \
+               (NO_SUCH_UNIT_ERROR, FILE_NOT_FOUND_ERROR):
+                raise UnitNotFound(str(exception))
+
+            raise
+
+        return result.unpack()
+
+    def _call_async(self, path, interface, method, callback=None):
+        """Call a method on systemd without waiting for the result."""
+
+        def _on_finish(connection, result, _user_data):
+            """Handle the result of the call."""
+            try:
+                value = connection.call_finish(result).unpack()
+            except glib.Error as exception:
+                logger.warning('Error calling systemd %s: %s', method,
+                               exception)
+                return
+
+            if callback:
+                callback(value)
+
+        self.connection.call(SYSTEMD_BUS_NAME, path, interface, method, None,
+                             None, gio.DBusCallFlags.NONE, -1, None,
+                             _on_finish, None)
+
+    def _on_list_units(self, result):
+        """Store states of all the loaded units."""
+        with self._lock:
+            for unit in result[0]:
+                name, active_state, path = unit[0], unit[3], unit[6]
+                self._unit_paths[name] = path
+                self._active_states[path] = active_state
+
+        logger.info('Cached states of %d systemd units', len(result[0]))
+
+    def _on_list_unit_files(self, result):
+        """Store states of all the unit files."""
+        with self._lock:
+            for path, state in result[0]:
+                self._unit_file_states[path.rsplit('/', 1)[-1]] = state
+
+    def _on_signal(self, _connection, _sender, path, _interface, signal,
+                   parameters, _user_data):
+        """Dispatch a signal received from systemd."""
+        parameters = parameters.unpack()
+        if signal == 'PropertiesChanged':
+            self.on_properties_changed(path, parameters[1], parameters[2])
+        elif signal == 'UnitNew':
+            self.on_unit_new(parameters[0], parameters[1])
+        elif signal == 'UnitRemoved':
+            self.on_unit_removed(parameters[0], parameters[1])
+        elif signal == 'UnitFilesChanged':
+            self.on_unit_files_changed()
+        elif signal == 'Reloading' and not parameters[0]:
+            self.on_unit_files_changed()
+
+    def on_properties_changed(self, path, changed, invalidated):
+        """Update active state of a unit."""
+        with self._lock:
+            if 'ActiveState' in changed:
+                self._active_states[path] = changed['ActiveState']
+            elif 'ActiveState' in invalidated:
+                self._active_states.pop(path, None)
+
+    def on_unit_new(self, unit, path):
+        """Track a newly loaded unit."""
+        with self._lock:
+            # Units, including their aliases, that were earlier not found
+            # might be found now.
+            for name, unit_path in list(self._unit_paths.items()):
+                if unit_path is None:
+                    del self._unit_paths[name]
+
+            self._unit_paths[unit] = path
+
+    def on_unit_removed(self, unit, path):
+        """Forget about a unit that has been unloaded."""
+        with self._lock:
+            for name, unit_path in list(self._unit_paths.items()):
+                if unit_path == path:
+                    del self._unit_paths[name]
+
+            self._active_states.pop(path, None)
+
+    def on_unit_files_changed(self):
+        """Forget unit file states after units are enabled or disabled."""
+        with self._lock:
+            self._unit_file_states = {}
+
+
+def normalize_unit_name(unit):
+    """Append '.service' to a unit name without type like systemctl does."""
+    if unit.rsplit('.', 1)[-1] not in UNIT_TYPES:
+        unit += '.service'
+
+    return unit
+
+
+def init():
+    """Connect to systemd over D-Bus. Must be run from glib thread."""
+    global gio, glib
+    from plinth.utils import import_from_gi
+    gio = import_from_gi('Gio', '2.0')
+    glib = import_from_gi('GLib', '2.0')
+
+    def _on_bus_get(_source_object, result, _user_data):
+        """Start caching once the connection is available."""
+        global _cache
+        try:
+            connection = gio.bus_get_finish(result)
+        except glib.Error as exception:
+            logger.warning('Unable to connect to systemd over D-Bus: %s',
+                           exception)
+            return
+
+        cache = UnitStateCache(connection)
+        cache.subscribe()
+        cache.populate()
+        _cache = cache
+        logger.info('Caching systemd unit states using D-Bus')
+
+    gio.bus_get(gio.BusType.SYSTEM, None, _on_bus_get, None)
+
+
+def is_running(unit):
+    """Return whether a unit is running or None if cache is not available."""
+    if not _cache:
+        return None
+
+    try:
+        return _cache.is_running(unit)
+    except Exception as exception:
+        logger.warning('Unable to get state of unit %s: %s', unit, exception)
+        return None
+
+
+def is_enabled(unit, strict_check=False):
+    """Return whether a unit is enabled or None if cache is not available.
+
+    See action_utils.service_is_enabled() for the meaning of strict_check.
+
+    """
+    if not _cache:
+        return None
+
+    try:
+        state = _cache.get_unit_file_state(unit)
+    except Exception as exception:
+        logger.warning('Unable to get state of unit file %s: %s', unit,
+                       exception)
+        return None
+
+    if strict_check:
+        return state == 'enabled'
+
+    return state in ENABLED_STATES
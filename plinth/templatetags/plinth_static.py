@@ -0,0 +1,31 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Replacement for Django's static template tag library.
+
+Loaded by templates with {% load static %}. URLs of static files carry the
+hash of the file's content so that they may be cached by browsers forever.
+"""
+
+from django import template
+from django.templatetags import static
+
+from plinth import static_assets
+
+register = template.Library()
+register.tags.update(static.register.tags)
+register.filters.update(static.register.filters)
+
+
+class StaticNode(static.StaticNode):
+    """Node to render URL of a static file with its version."""
+
+    @classmethod
+    def handle_simple(cls, path):
+        """Return versioned URL of a static file."""
+        return static_assets.get_versioned_url(super().handle_simple(path))
+
+
+@register.tag('static')
+def do_static(parser, token):
+    """Return versioned URL of a static file."""
+    return StaticNode.handle_token(parser, token)
@@ -0,0 +1,167 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Benchmark throughput of database work done by requests with and without
+tuning of SQLite connections.
+
+Simulated requests run in several threads like CherryPy's thread pool. Each
+request reads setup versions, a few keys and notifications and sometimes
+writes a key. Meanwhile a background thread keeps writing like setup and
+notification handlers do. Run with:
+
+    python3 -m plinth.tests.benchmark_database
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import django
+import django.conf
+import django.core.management
+
+from plinth import cfg, database
+
+UNTUNED = {
+    'database_journal_mode': 'delete',
+    'database_synchronous': 'full',
+    'database_cache_size': -2000,
+    'database_mmap_size': 0,
+    'database_conn_max_age': 0,
+}
+
+TUNED = {
+    'database_journal_mode': 'wal',
+    'database_synchronous': 'normal',
+    'database_cache_size': -8000,
+    'database_mmap_size': 67108864,
+    'database_conn_max_age': 600,
+}
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark database throughput with and without tuning',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--threads', type=int, default=10,
+                        help='number of threads serving requests')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='number of requests served by each thread')
+    parser.add_argument('--write-ratio', type=float, default=0.1,
+                        help='fraction of requests that write a key')
+    return parser.parse_args()
+
+
+def setup_django(directory):
+    """Configure Django with only the models needed for the benchmark."""
+    django.conf.settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'initial.sqlite3'),
+                'OPTIONS': {
+                    'timeout': 30
+                },
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'plinth',
+        ],
+    )
+    django.setup()
+    database.init()
+
+
+def serve_request(write_ratio):
+    """Perform database work of a typical request."""
+    from plinth import kvstore
+    from plinth.models import Module, StoredNotification
+
+    dict(Module.objects.values_list('name', 'setup_version'))
+    kvstore.get_default('firstboot_completed', False)
+    kvstore.get_default('advanced_mode', False)
+    list(StoredNotification.objects.filter(dismissed=False))
+    if random.random() < write_ratio:
+        kvstore.set('benchmark-{}'.format(random.randrange(100)),
+                    time.time())
+
+
+def serve_requests(count, write_ratio):
+    """Serve requests in a thread, closing connections as Django does."""
+    from django.db import close_old_connections, connection
+    for _ in range(count):
+        close_old_connections()
+        serve_request(write_ratio)
+        close_old_connections()
+
+    connection.close()
+
+
+def write_in_background(stop_event):
+    """Keep writing like background tasks do."""
+    from django.db import connection
+
+    from plinth import kvstore
+    while not stop_event.is_set():
+        kvstore.set('benchmark-background', time.time())
+        time.sleep(0.001)
+
+    connection.close()
+
+
+def run(name, options, directory, arguments):
+    """Run the benchmark with given options and return requests per second."""
+    from django.db import connections
+
+    for option, value in options.items():
+        setattr(cfg, option, value)
+
+    connections.close_all()
+    settings_dict = connections.databases['default']
+    settings_dict['NAME'] = os.path.join(directory, name + '.sqlite3')
+    settings_dict['CONN_MAX_AGE'] = cfg.database_conn_max_age
+    django.core.management.call_command('migrate', verbosity=0)
+    connections.close_all()
+
+    stop_event = threading.Event()
+    writer = threading.Thread(target=write_in_background, args=(stop_event, ))
+    threads = [
+        threading.Thread(target=serve_requests,
+                         args=(arguments.requests, arguments.write_ratio))
+        for _ in range(arguments.threads)
+    ]
+    writer.start()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    duration = time.perf_counter() - start_time
+    stop_event.set()
+    writer.join()
+
+    return arguments.threads * arguments.requests / duration
+
+
+def main():
+    """Run the benchmark and print results."""
+    arguments = parse_arguments()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(directory)
+        untuned = run('untuned', UNTUNED, directory, arguments)
+        tuned = run('tuned', TUNED, directory, arguments)
+
+    print('Without tuning: {:8.1f} requests/s'.format(untuned))
+    print('With tuning:    {:8.1f} requests/s'.format(tuned))
+    print('Speedup:        {:8.2f}x'.format(tuned / untuned))
+
+
+if __name__ == '__main__':
+    main()
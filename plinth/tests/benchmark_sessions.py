@@ -0,0 +1,128 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Benchmark per-request overhead of each session backend.
+
+Requests are passed through Django's session middleware with the session
+cookie set by the previous response, like a logged in browser does. Requests
+that only read the session and requests that also modify it are measured
+separately. Run with:
+
+    python3 -m plinth.tests.benchmark_sessions
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import django
+import django.conf
+import django.core.management
+from django.http import HttpResponse
+
+from plinth import database
+
+ENGINES = {
+    'file': 'django.contrib.sessions.backends.file',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark per-request overhead of session backends',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='number of requests for each measurement')
+    return parser.parse_args()
+
+
+def setup_django(directory):
+    """Configure Django with sessions, cache and a database."""
+    django.conf.settings.configure(
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        },
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'plinth.sqlite3'),
+                'OPTIONS': {
+                    'timeout': 30
+                },
+            }
+        },
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'django.contrib.sessions',
+        ],
+        SECRET_KEY='benchmark',
+        SESSION_FILE_PATH=directory,
+    )
+    django.setup()
+    database.init()
+    django.core.management.call_command('migrate', verbosity=0)
+
+
+def read_view(request):
+    """Read from the session like most pages do."""
+    request.session.get('django_language')
+    return HttpResponse()
+
+
+def write_view(request):
+    """Modify the session like form submissions with messages do."""
+    request.session['counter'] = request.session.get('counter', 0) + 1
+    return HttpResponse()
+
+
+def measure(engine, view, count):
+    """Return average time taken in microseconds for a request."""
+    from django.conf import settings
+    from django.contrib.sessions.middleware import SessionMiddleware
+    from django.test import RequestFactory
+
+    settings.SESSION_ENGINE = engine
+    middleware = SessionMiddleware(view)
+    factory = RequestFactory()
+
+    # Create a session first, as after logging in
+    request = factory.get('/')
+    middleware.process_request(request)
+    request.session['_auth_user_id'] = '1'
+    response = middleware.process_response(request, HttpResponse())
+    cookie = response.cookies[settings.SESSION_COOKIE_NAME].value
+
+    start_time = time.perf_counter()
+    for _ in range(count):
+        request = factory.get('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = cookie
+        response = middleware(request)
+        if settings.SESSION_COOKIE_NAME in response.cookies:
+            cookie = response.cookies[settings.SESSION_COOKIE_NAME].value
+
+    return (time.perf_counter() - start_time) * 1000000 / count
+
+
+def main():
+    """Run the benchmark and print results."""
+    arguments = parse_arguments()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(directory)
+        for name, engine in ENGINES.items():
+            results[name] = (measure(engine, read_view, arguments.requests),
+                             measure(engine, write_view, arguments.requests))
+
+    print('{:16} {:>12} {:>12}'.format('Backend', 'Read (us)', 'Write (us)'))
+    for name, (read_time, write_time) in results.items():
+        print('{:16} {:12.1f} {:12.1f}'.format(name, read_time, write_time))
+
+
+if __name__ == '__main__':
+    main()
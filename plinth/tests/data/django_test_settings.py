@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.messages',
+    'django.contrib.sessions',
     'stronghold',
     'plinth',
 ]
@@ -49,4 +50,9 @@ TEMPLATES = [{
     'BACKEND': 'django.template.backends.django.DjangoTemplates',
     'APP_DIRS': True,
     'DIRS': ['plinth/tests/data/templates/'],
+    'OPTIONS': {
+        'libraries': {
+            'static': 'plinth.templatetags.plinth_static',
+        },
+    },
 }]
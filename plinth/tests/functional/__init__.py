@@ -391,10 +391,19 @@ def _click_button_and_confirm(browser, href):
             submit(browser)
 
 
+def backup_wait_for_jobs(browser):
+    """Wait until backup operations running in background are finished."""
+    nav_to_module(browser, 'backups')
+    while browser.is_element_present_by_css('.backups-job-active'):
+        time.sleep(0.5)
+        browser.reload()
+
+
 def _backup_delete_archive_by_name(browser, archive_name):
     nav_to_module(browser, 'backups')
     href = f'/plinth/sys/backups/root/delete/{archive_name}/'
     _click_button_and_confirm(browser, href)
+    backup_wait_for_jobs(browser)
 
 
 def backup_create(browser, app_name, archive_name=None):
@@ -411,12 +420,14 @@ def backup_create(browser, app_name, archive_name=None):
     browser.execute_script('window.scrollTo(0, 0)')
     browser.find_by_value(app_name).first.check()
     submit(browser)
+    backup_wait_for_jobs(browser)
 
 
 def backup_restore(browser, app_name, archive_name=None):
     nav_to_module(browser, 'backups')
     href = f'/plinth/sys/backups/root/restore-archive/{archive_name}/'
     _click_button_and_confirm(browser, href)
+    backup_wait_for_jobs(browser)
 
 
 ######################
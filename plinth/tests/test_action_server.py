@@ -0,0 +1,223 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for the privileged action server.
+"""
+
+import os
+import pathlib
+import shutil
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from plinth import action_server, cfg
+from plinth.actions import run_batch, superuser_run
+from plinth.errors import ActionError
+
+PYTHON_ACTION = '''#!/usr/bin/python3
+import sys
+
+def main():
+    if sys.argv[1] == 'fail':
+        print('failure output')
+        print('failure error', file=sys.stderr)
+        sys.exit(3)
+
+    if sys.argv[1] == 'input':
+        print(sys.stdin.read().upper(), end='')
+        return
+
+    print(' '.join(sys.argv[1:]))
+
+if __name__ == '__main__':
+    main()
+'''
+
+SHELL_ACTION = '''#!/bin/sh
+echo "shell $@"
+'''
+
+
+@pytest.fixture(name='actions_dir')
+def fixture_actions_dir(tmp_path):
+    """Create a temporary actions directory with test actions."""
+    actions_dir = tmp_path / 'actions'
+    actions_dir.mkdir()
+    for name, content in (('pyaction', PYTHON_ACTION), ('shaction',
+                                                        SHELL_ACTION)):
+        action = actions_dir / name
+        action.write_text(content)
+        action.chmod(0o755)
+
+    source_actions_dir = pathlib.Path(__file__).parent / '../../actions'
+    shutil.copy(str(source_actions_dir / 'batch'), str(actions_dir))
+
+    old_actions_dir = cfg.actions_dir
+    cfg.actions_dir = str(actions_dir)
+    action_server.load_actions(str(actions_dir))
+    yield actions_dir
+    cfg.actions_dir = old_actions_dir
+    action_server._loaded_actions.clear()
+
+
+@pytest.fixture(name='server')
+def fixture_server(actions_dir, tmp_path):
+    """Run an action server in a thread."""
+    socket_path = str(tmp_path / 'actions.socket')
+    server = action_server.ActionServer(socket_path, {os.getuid()})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    old_socket = cfg.action_server_socket
+    cfg.action_server_socket = socket_path
+    yield server
+    cfg.action_server_socket = old_socket
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_load_actions(actions_dir):
+    """Test that only Python actions are imported."""
+    assert 'pyaction' in action_server._loaded_actions
+    assert 'batch' in action_server._loaded_actions
+    assert 'shaction' not in action_server._loaded_actions
+
+
+@pytest.mark.parametrize('action', ['../pyaction', '', 'missing', None])
+def test_run_action_invalid(actions_dir, action):
+    """Test that actions outside actions directory are rejected."""
+    with pytest.raises(ValueError):
+        action_server.run_action(action, [])
+
+
+def test_run_action_invalid_options(actions_dir):
+    """Test that options must be a list of strings."""
+    with pytest.raises(ValueError):
+        action_server.run_action('pyaction', 'a b')
+
+    with pytest.raises(ValueError):
+        action_server.run_action('pyaction', [1])
+
+
+def test_run_action(actions_dir):
+    """Test running imported and executed actions."""
+    assert action_server.run_action('pyaction', ['a', 'b;c']) == \
+        (0, b'a b;c\n', b'')
+    assert action_server.run_action('shaction', ['x']) == \
+        (0, b'shell x\n', b'')
+    assert action_server.run_action('pyaction', ['input'], b'data') == \
+        (0, b'DATA', b'')
+    assert action_server.run_action('pyaction', ['fail']) == \
+        (3, b'failure output\n', b'failure error\n')
+
+
+def test_run_action_modified(actions_dir):
+    """Test that an action modified after import is executed afresh."""
+    action = actions_dir / 'pyaction'
+    action.write_text(PYTHON_ACTION.replace("' '.join", "'-'.join"))
+    os.utime(str(action), (0, 0))
+    assert action_server.run_action('pyaction', ['a', 'b']) == \
+        (0, b'a-b\n', b'')
+
+
+def test_superuser_run(server):
+    """Test that superuser_run uses the action server."""
+    with patch('subprocess.Popen') as popen:
+        assert superuser_run('pyaction', ['hello', 'world']) == \
+            'hello world\n'
+        assert superuser_run('pyaction', ['input'], input=b'x') == 'X'
+        popen.assert_not_called()
+
+
+def test_superuser_run_error(server):
+    """Test that failed actions on server raise ActionError."""
+    with pytest.raises(ActionError) as exception:
+        superuser_run('pyaction', ['fail'])
+
+    assert exception.value.args == ('pyaction', 'failure output\n',
+                                    'failure error\n')
+
+
+def test_server_rejects_invalid_action(server):
+    """Test that server repeats contract checks."""
+    response = action_server.send_request(cfg.action_server_socket,
+                                          {'action': '../pyaction'})
+    assert 'exception' in response
+
+
+def test_server_rejects_unknown_users(server):
+    """Test that connections from unknown users are closed."""
+    server.allowed_uids = {os.getuid() + 1}
+    with pytest.raises((OSError, ValueError)):
+        action_server.send_request(cfg.action_server_socket,
+                                   {'action': 'pyaction'})
+
+
+def test_fallback_to_sudo(actions_dir, tmp_path):
+    """Test that sudo is used when the action server is not available."""
+    old_socket = cfg.action_server_socket
+    cfg.action_server_socket = str(tmp_path / 'missing.socket')
+    try:
+        with patch('subprocess.Popen') as popen:
+            popen.return_value.communicate.return_value = (b'output', b'')
+            popen.return_value.returncode = 0
+            assert superuser_run('pyaction', ['a']) == 'output'
+            assert popen.call_args[0][0][:2] == ['sudo', '-n']
+    finally:
+        cfg.action_server_socket = old_socket
+
+
+def test_handle_batch_request(actions_dir):
+    """Test running multiple requests and importing actions on demand."""
+    action_server._loaded_actions.clear()
+    requests = [
+        action_server.encode_request('pyaction', ['a']),
+        action_server.encode_request('pyaction', ['input'], b'b'),
+        action_server.encode_request('missing', []),
+        action_server.encode_request('batch', []),
+    ]
+    responses = action_server.handle_batch_request(requests)
+    assert 'pyaction' in action_server._loaded_actions
+    assert action_server.decode_response(responses[0]) == (0, b'a\n', b'')
+    assert action_server.decode_response(responses[1]) == (0, b'B', b'')
+    assert 'exception' in responses[2]
+    assert 'exception' in responses[3]
+
+
+def test_run_batch(server):
+    """Test running multiple actions in a single invocation."""
+    results = run_batch([('pyaction', ['a', 'b'], None),
+                         ('pyaction', ['fail'], None),
+                         ('shaction', None, None),
+                         ('pyaction', ['input'], b'x')])
+    assert results[0] == ('a b\n', None)
+    assert results[1][0] == 'failure output\n'
+    assert isinstance(results[1][1], ActionError)
+    assert results[1][1].args == ('pyaction', 'failure output\n',
+                                  'failure error\n')
+    assert results[2] == ('shell \n', None)
+    assert results[3] == ('X', None)
+
+
+def test_run_batch_rejected(server):
+    """Test that a request rejected by the server does not stop others."""
+    results = run_batch([('pyaction', ['a'], None), ('batch', [], None),
+                         ('pyaction', ['b'], None)])
+    assert results[0] == ('a\n', None)
+    assert results[1][0] == ''
+    assert isinstance(results[1][1], ActionError)
+    assert results[1][1].args == ('batch', '',
+                                  'Batch action cannot be nested.')
+    assert results[2] == ('b\n', None)
+
+
+def test_run_batch_contract(server):
+    """Test that contract checks are done before running any action."""
+    with patch('plinth.actions.superuser_run') as run:
+        with pytest.raises(ValueError):
+            run_batch([('pyaction', ['a'], None), ('../pyaction', [], None)])
+
+        assert run_batch([]) == []
+        run.assert_not_called()
@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for caching expensive data.
+"""
+
+from unittest.mock import Mock
+
+import pytest
+
+from plinth import cache
+
+
+@pytest.fixture(name='locmem_cache', autouse=True)
+def fixture_locmem_cache(settings):
+    """Use an in-memory cache instead of the dummy cache."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }
+    }
+    cache._get_cache().clear()
+
+
+def test_cached():
+    """Test that return values are cached for each set of arguments."""
+    func = Mock(side_effect=lambda *args, **kwargs: [args, kwargs])
+    cached_func = cache.cached('test-key')(func)
+    assert cached_func() == [(), {}]
+    assert cached_func() == [(), {}]
+    assert cached_func(1, a=2) == [(1, ), {'a': 2}]
+    assert cached_func(1, a=2) == [(1, ), {'a': 2}]
+    assert func.call_count == 2
+
+
+def test_invalidate():
+    """Test that all values cached for a key are invalidated."""
+    func = Mock(return_value='value')
+    cached_func = cache.cached('test-key')(func)
+    other_func = Mock(return_value='other-value')
+    cached_other_func = cache.cached('test-other-key')(other_func)
+    cached_func()
+    cached_func('argument')
+    cached_other_func()
+
+    cached_func.invalidate()
+    cached_func()
+    cached_func('argument')
+    assert func.call_count == 4
+
+    cache.invalidate('test-other-key')
+    cached_other_func()
+    assert other_func.call_count == 2
+
+
+def test_timeout():
+    """Test that cached values expire."""
+    func = Mock(return_value='value')
+    cached_func = cache.cached('test-key', timeout=0)(func)
+    cached_func()
+    cached_func()
+    assert func.call_count == 2
+
+
+def test_dummy_cache(settings):
+    """Test that functions are called every time with the dummy cache."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }
+    }
+    func = Mock(return_value='value')
+    cached_func = cache.cached('test-key')(func)
+    assert cached_func() == 'value'
+    assert cached_func() == 'value'
+    assert func.call_count == 2
+    cached_func.invalidate()
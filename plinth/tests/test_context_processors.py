@@ -19,6 +19,7 @@ def fixture_menu():
     menu_module.init()
 
 
+@patch('plinth.utils.get_user_groups', Mock(return_value={'admin'}))
 @patch('plinth.notification.Notification')
 def test_common(Notification):
     """Verify that the common() function returns the correct values."""
@@ -27,7 +28,6 @@ def test_common(Notification):
     request = HttpRequest()
     request.path = '/aaa/bbb/ccc/'
     request.user = Mock()
-    request.user.groups.filter().exists = Mock(return_value=True)
     request.session = MagicMock()
     response = cp.common(request)
     assert response is not None
@@ -48,13 +48,13 @@ def test_common(Notification):
     assert response['user_is_admin']
 
 
+@patch('plinth.utils.get_user_groups', Mock(return_value={'admin'}))
 @patch('plinth.notification.Notification')
 def test_common_border_conditions(Notification):
     """Verify that the common() function works for border conditions."""
     request = HttpRequest()
     request.path = ''
     request.user = Mock()
-    request.user.groups.filter().exists = Mock(return_value=True)
     request.session = MagicMock()
     response = cp.common(request)
     assert response['active_menu_urls'] == []
@@ -4,13 +4,15 @@ Test module for component managing system daemons and other systemd units.
 """
 
 import socket
+import threading
 from unittest.mock import Mock, call, patch
 
 import pytest
 
 from plinth.app import App, FollowerComponent
-from plinth.daemon import (Daemon, app_is_running, diagnose_netcat,
-                           diagnose_port_listening)
+from plinth.daemon import (Daemon, app_is_running, check_timings,
+                           diagnose_netcat, diagnose_port_listening,
+                           socket_snapshot, timed_check)
 
 
 @pytest.fixture(name='daemon')
@@ -208,6 +210,108 @@ def test_diagnose_port_listening(connections):
     assert diagnose_port_listening(5678, 'udp4')[1] == 'failed'
 
 
+@patch('psutil.net_connections')
+def test_diagnose_port_listening_snapshot(connections):
+    """Test port listening diagnostics using a single socket snapshot."""
+    tcp, udp = socket.SOCK_STREAM, socket.SOCK_DGRAM
+    inet, inet6 = socket.AF_INET, socket.AF_INET6
+    connections.return_value = [
+        Mock(status='LISTEN', laddr=('0.0.0.0', 1234), family=inet, type=tcp),
+        Mock(status='ESTABLISHED', laddr=('0.0.0.0', 2345), family=inet,
+             type=tcp),
+        Mock(raddr=(), laddr=('0.0.0.0', 3456), family=inet, type=udp),
+        Mock(status='LISTEN', laddr=('::1', 5678), family=inet6, type=tcp),
+        Mock(status='LISTEN', laddr=('::', 6789), family=inet6, type=tcp),
+        Mock(raddr=(), laddr=('::', 6789), family=inet6, type=udp),
+        Mock(laddr=(), family=inet, type=udp),
+    ]
+
+    with socket_snapshot():
+        assert diagnose_port_listening(1234)[1] == 'passed'
+        assert diagnose_port_listening(1234, 'tcp', '0.0.0.0')[1] == 'passed'
+        assert diagnose_port_listening(1234, 'tcp', '1.1.1.1')[1] == 'failed'
+        assert diagnose_port_listening(1234, 'tcp4')[1] == 'passed'
+        assert diagnose_port_listening(1234, 'tcp6')[1] == 'failed'
+        assert diagnose_port_listening(1234, 'udp')[1] == 'failed'
+        assert diagnose_port_listening(2345)[1] == 'failed'
+        assert diagnose_port_listening(5678, 'tcp4')[1] == 'failed'
+        assert diagnose_port_listening(5678, 'tcp6')[1] == 'passed'
+        assert diagnose_port_listening(6789, 'tcp4')[1] == 'passed'
+        assert diagnose_port_listening(3456, 'udp')[1] == 'passed'
+        assert diagnose_port_listening(3456, 'udp4')[1] == 'passed'
+        assert diagnose_port_listening(3456, 'udp6')[1] == 'failed'
+        assert diagnose_port_listening(6789, 'udp6')[1] == 'passed'
+        assert diagnose_port_listening(3456, 'tcp')[1] == 'failed'
+
+    connections.assert_called_once_with('inet')
+
+    # Snapshot is not used outside the context
+    diagnose_port_listening(1234)
+    connections.assert_called_with('tcp')
+
+
+@patch('psutil.net_connections')
+def test_socket_snapshot_threads(connections):
+    """Test that a socket snapshot only applies to its own thread."""
+    connections.return_value = [
+        Mock(status='LISTEN', laddr=('0.0.0.0', 1234), family=socket.AF_INET,
+             type=socket.SOCK_STREAM)
+    ]
+    entered, exited = threading.Event(), threading.Event()
+
+    def _other_thread():
+        with socket_snapshot():
+            entered.set()
+            exited.wait()
+
+    thread = threading.Thread(target=_other_thread)
+    with socket_snapshot() as snapshot:
+        thread.start()
+        entered.wait()
+
+    exited.set()
+    thread.join()
+
+    # Contexts entered and left in other threads do not leave a snapshot
+    connections.reset_mock()
+    diagnose_port_listening(1234)
+    connections.assert_called_once_with('tcp')
+
+    # The same snapshot may be used again in any thread
+    connections.reset_mock()
+    with socket_snapshot(snapshot):
+        diagnose_port_listening(1234)
+        diagnose_port_listening(1234)
+
+    connections.assert_called_once_with('inet')
+
+
+def test_check_timings():
+    """Test recording time taken by diagnostic checks."""
+
+    @timed_check
+    def _check(test):
+        return [test, 'passed']
+
+    @timed_check
+    def _checks(*tests):
+        return [_check(test) for test in tests] + [['test3', 'failed']]
+
+    @timed_check
+    def _no_checks():
+        return []
+
+    _check('test0')
+    with check_timings() as timings:
+        assert _check('test1') == ['test1', 'passed']
+        assert len(_checks('test2')) == 2
+        assert _no_checks() == []
+
+    _check('test4')
+    assert set(timings) == {'test1', 'test2', 'test3'}
+    assert timings['test2'] <= timings['test3']
+
+
 @patch('subprocess.Popen')
 def test_diagnose_netcat(popen):
     """Test running diagnostic test using netcat."""
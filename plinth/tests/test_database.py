@@ -0,0 +1,54 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for tuning of database connections.
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from django.db import connection
+
+from plinth import database
+
+
+def test_get_pragmas(load_cfg):
+    """Test that pragmas are taken from configuration."""
+    assert database.get_pragmas() == [('journal_mode', 'wal'),
+                                      ('synchronous', 'normal'),
+                                      ('cache_size', -8000),
+                                      ('mmap_size', 67108864)]
+
+    load_cfg.database_journal_mode = ''
+    load_cfg.database_synchronous = 'FULL'
+    load_cfg.database_cache_size = 100
+    load_cfg.database_mmap_size = 0
+    assert database.get_pragmas() == [('synchronous', 'full'),
+                                      ('cache_size', 100),
+                                      ('mmap_size', 0)]
+
+
+def test_get_pragmas_invalid(load_cfg):
+    """Test that invalid modes are ignored."""
+    load_cfg.database_journal_mode = 'x-invalid'
+    load_cfg.database_synchronous = 'x-invalid'
+    pragmas = dict(database.get_pragmas())
+    assert 'journal_mode' not in pragmas
+    assert 'synchronous' not in pragmas
+
+
+@pytest.mark.django_db(transaction=True)
+def test_connection_created(load_cfg):
+    """Test that pragmas are set on new SQLite connections."""
+    load_cfg.database_synchronous = 'off'
+    load_cfg.database_cache_size = 1234
+    database._on_connection_created(None, connection)
+    with connection.cursor() as cursor:
+        assert cursor.execute('PRAGMA synchronous').fetchone() == (0, )
+        assert cursor.execute('PRAGMA cache_size').fetchone() == (1234, )
+
+
+def test_connection_created_other_vendor():
+    """Test that connections to other databases are not changed."""
+    other_connection = Mock(vendor='postgresql')
+    database._on_connection_created(None, other_connection)
+    other_connection.cursor.assert_not_called()
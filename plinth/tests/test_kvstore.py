@@ -4,8 +4,10 @@ Test module for key/value store.
 """
 
 import pytest
+from django.db import transaction
 
 from plinth import kvstore
+from plinth.models import KVStore
 
 pytestmark = pytest.mark.django_db
 
@@ -41,3 +43,79 @@ def test_get_default():
     expected = 'default'
     actual = kvstore.get_default('bad_key', expected)
     assert expected == actual
+
+
+def test_get_missing():
+    """Verify that getting a key that does not exist raises an error."""
+    with pytest.raises(KVStore.DoesNotExist):
+        kvstore.get('bad_key')
+
+
+def test_get_many_set_many(django_assert_num_queries):
+    """Verify that multiple keys can be retrieved and stored together."""
+    kvstore.set_many({'key1': 'value1', 'key2': [1, 2]})
+    with django_assert_num_queries(1):
+        values = kvstore.get_many(['key1', 'key2', 'bad_key'], 'default')
+
+    assert values == {
+        'key1': 'value1',
+        'key2': [1, 2],
+        'bad_key': 'default'
+    }
+
+
+def test_delete():
+    """Verify that a deleted key can't be retrieved."""
+    kvstore.set('key', 'value')
+    kvstore.delete('key')
+    assert kvstore.get_default('key', 'default') == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cache(django_assert_num_queries):
+    """Verify that values are cached and cache is updated on writes."""
+    kvstore.clear_cache()
+    stats = kvstore.get_stats()
+    kvstore.set('key', {'a': [1]})
+    with django_assert_num_queries(0):
+        value = kvstore.get('key')
+        assert value == {'a': [1]}
+
+    assert kvstore.get_default('bad_key', 'default') == 'default'
+    with django_assert_num_queries(0):
+        assert kvstore.get_default('bad_key', 'default') == 'default'
+
+    value['a'].append(2)  # Modifying returned value does not change cache
+    assert kvstore.get('key') == {'a': [1]}
+
+    kvstore.set_many({'key': 'value', 'bad_key': 'value2'})
+    with django_assert_num_queries(0):
+        assert kvstore.get_many(['key', 'bad_key']) == {
+            'key': 'value',
+            'bad_key': 'value2'
+        }
+
+    KVStore(key='key', value='changed').save()
+    assert kvstore.get('key') == 'changed'
+
+    kvstore.delete('key')
+    assert kvstore.get_default('key', None) is None
+
+    new_stats = kvstore.get_stats()
+    assert new_stats['hits'] - stats['hits'] == 5
+    assert new_stats['misses'] - stats['misses'] == 3
+    assert new_stats['size'] == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cache_rollback():
+    """Verify that values written in a rolled back transaction are not
+    cached."""
+    kvstore.clear_cache()
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            kvstore.set('key', 'value')
+            assert kvstore.get('key') == 'value'
+            raise RuntimeError
+
+    assert kvstore.get_default('key', 'default') == 'default'
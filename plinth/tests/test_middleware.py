@@ -66,6 +66,25 @@ class TestSetupMiddleware:
         response = middleware.process_view(request, **kwargs)
         assert response is None
 
+    @staticmethod
+    @patch('plinth.module_loader.loaded_modules')
+    @patch('django.urls.resolve')
+    @patch('django.urls.reverse', return_value='users:login')
+    def test_resolver_match_reused(reverse, resolve, loaded_modules,
+                                   middleware, kwargs):
+        """Test that URL resolved by Django is not resolved again."""
+        module = Mock()
+        module.setup_helper.is_finished = None
+        module.setup_helper.get_state.return_value = 'up-to-date'
+        loaded_modules.__getitem__.return_value = module
+
+        request = RequestFactory().get('/plinth/mockapp')
+        request.resolver_match = Mock(namespaces=['mockapp'])
+        response = middleware.process_view(request, **kwargs)
+        assert response is None
+        resolve.assert_not_called()
+        loaded_modules.__getitem__.assert_called_once_with('mockapp')
+
     @staticmethod
     @patch('plinth.views.SetupView')
     @patch('plinth.module_loader.loaded_modules')
@@ -134,19 +153,19 @@ class TestAdminMiddleware:
         return web_request
 
     @staticmethod
+    @patch('plinth.utils.get_user_groups', Mock(return_value={'group1'}))
     def test_that_admin_view_is_denied_for_usual_user(web_request, middleware,
                                                       kwargs):
         """Test that normal user is denied for an admin view"""
-        web_request.user.groups.filter().exists = Mock(return_value=False)
         web_request.session = MagicMock()
         with pytest.raises(PermissionDenied):
             middleware.process_view(web_request, **kwargs)
 
     @staticmethod
+    @patch('plinth.utils.get_user_groups', Mock(return_value={'admin'}))
     def test_that_admin_view_is_allowed_for_admin_user(web_request, middleware,
                                                        kwargs):
         """Test that admin user is allowed for an admin view"""
-        web_request.user.groups.filter().exists = Mock(return_value=True)
         web_request.session = MagicMock()
         response = middleware.process_view(web_request, **kwargs)
         assert response is None
@@ -0,0 +1,359 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for loading modules, including loading them only when needed.
+"""
+
+import json
+import sys
+import textwrap
+import threading
+import types
+from unittest.mock import patch
+
+import pytest
+from django import urls
+from django.conf.urls import include, url
+from django.http import HttpResponse
+
+import plinth
+from plinth import module_loader
+from plinth.menu import Menu
+
+pytestmark = pytest.mark.urls('plinth.urls')
+
+MODULE_INIT = '''
+from django.utils.translation import ugettext_lazy as _
+
+from plinth import menu
+
+version = 1
+
+initialized = False
+
+
+def init():
+    global initialized
+    initialized = True
+    menu.Menu('menu-lazytestapp', _('Lazy Test'), None, 'fa-test',
+              'lazytestapp:index', order=10)
+'''
+
+MODULE_URLS = '''
+from django.conf.urls import url
+from django.http import HttpResponse
+
+
+def view(request, page=None):
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    url(r'^apps/lazytestapp/$', view, name='index'),
+    url(r'^apps/lazytestapp/(?P<page>\\d+)/$', view, name='page'),
+]
+'''
+
+
+@pytest.fixture(name='lazy_app')
+def fixture_lazy_app(load_cfg, tmp_path):
+    """Create a test module and isolate the state of module loader."""
+    module_directory = tmp_path / 'lazytestapp'
+    module_directory.mkdir()
+    (module_directory / '__init__.py').write_text(textwrap.dedent(MODULE_INIT))
+    (module_directory / 'urls.py').write_text(textwrap.dedent(MODULE_URLS))
+    sys.path.insert(0, str(tmp_path))
+
+    # Use a project URLs module containing only the test module's URLs
+    urlconf = types.ModuleType('plinth.urls')
+    urlconf.urlpatterns = []
+
+    load_cfg.data_dir = str(tmp_path)
+    load_cfg.lazy_app_loading = True
+    with patch.dict(sys.modules, {'plinth.urls': urlconf}), \
+            patch.object(plinth, 'urls', urlconf, create=True), \
+            patch('plinth.setup._get_setup_versions', return_value={}), \
+            patch('plinth.menu.Menu._all_menus', new={}):
+        yield load_cfg
+        _forget_module()
+        module_loader._modules_to_load = None
+
+    sys.path.remove(str(tmp_path))
+    urls.clear_url_caches()
+
+
+def _forget_module():
+    """Remove test module and state of module loader."""
+    plinth.urls.urlpatterns.clear()
+    for name in ('lazytestapp', 'lazytestapp.urls'):
+        sys.modules.pop(name, None)
+
+    module_loader.loaded_modules.clear()
+    module_loader._modules_to_load = ['lazytestapp']
+    module_loader._manifest = None
+    module_loader._lazy_modules = None
+    module_loader._lazy_menus.clear()
+    module_loader._url_resolvers.clear()
+
+
+def _start():
+    """Perform the steps of module loading done during startup."""
+    _forget_module()
+    module_loader.include_urls()
+    urls.clear_url_caches()
+    module_loader.load_modules()
+
+
+def test_manifest_written(lazy_app, tmp_path):
+    """Test that all modules are loaded and manifest is written."""
+    _start()
+    assert sys.modules['lazytestapp'].initialized
+    assert list(module_loader.loaded_modules) == ['lazytestapp']
+    assert not module_loader.is_module_lazy('lazytestapp')
+
+    manifest = json.loads((tmp_path / 'app-manifest.json').read_text())
+    entry = manifest['modules']['lazytestapp']
+    assert manifest['modules_to_load'] == ['lazytestapp']
+    assert entry['lazy']
+    assert entry['url_prefixes'] == ['apps/lazytestapp/'] * 2
+    assert entry['url_names'] == [
+        ['index', '^apps/lazytestapp/$', {}],
+        ['page', r'^apps/lazytestapp/(?P<page>\d+)/$', {}],
+    ]
+    assert entry['menus'][0]['name'] == 'Lazy Test'
+    assert entry['menus'][0]['url_name'] == 'lazytestapp:index'
+    assert entry['menus'][0]['order'] == 10
+
+
+def test_lazy_loading_disabled(lazy_app, tmp_path):
+    """Test that modules are loaded during startup unless enabled."""
+    _start()
+    lazy_app.lazy_app_loading = False
+    _start()
+    assert sys.modules['lazytestapp'].initialized
+    assert not module_loader.get_lazy_module_candidates()
+
+
+def test_lazy_loading_installed(lazy_app):
+    """Test that modules that have been setup are loaded during startup."""
+    _start()
+    with patch('plinth.setup._get_setup_versions',
+               return_value={'lazytestapp': 1}):
+        _start()
+
+    assert 'lazytestapp' in module_loader.loaded_modules
+    assert module_loader.get_lazy_module_candidates() == ['lazytestapp']
+
+
+def test_lazy_loading_on_request(lazy_app):
+    """Test that module is loaded only when its URLs are requested."""
+    _start()
+    _start()
+    assert 'lazytestapp' not in sys.modules
+    assert module_loader.is_module_lazy('lazytestapp')
+
+    # Menu and URLs are available without loading the module
+    menu_item = Menu.get('lazytestapp:index')
+    assert menu_item.name == 'Lazy Test'
+    assert urls.reverse('lazytestapp:page', kwargs={'page': 2}) == \
+        '/apps/lazytestapp/2/'
+    with pytest.raises(urls.Resolver404):
+        urls.resolve('/apps/other/')
+
+    assert 'lazytestapp' not in sys.modules
+
+    # Resolving a URL of the module loads it
+    match = urls.resolve('/apps/lazytestapp/2/')
+    assert match.namespaces == ['lazytestapp']
+    assert match.kwargs == {'page': '2'}
+    assert sys.modules['lazytestapp'].initialized
+    assert module_loader.loaded_modules['lazytestapp']
+    assert Menu.get('lazytestapp:index') is not menu_item
+    assert list(Menu.list()) == [Menu.get('lazytestapp:index')]
+    assert urls.reverse('lazytestapp:index') == '/apps/lazytestapp/'
+
+
+def test_lazy_loading_on_setup(lazy_app):
+    """Test that module is loaded when its setup is requested."""
+    _start()
+    _start()
+    with patch('plinth.setup.Helper.run') as run:
+        module_loader.setup.setup_modules(['lazytestapp'])
+
+    assert sys.modules['lazytestapp'].initialized
+    run.assert_called_once_with(allow_install=True)
+
+
+def test_outdated_manifest(lazy_app, tmp_path):
+    """Test that all modules are loaded if manifest is not current."""
+    _start()
+    manifest_file = tmp_path / 'app-manifest.json'
+    manifest = json.loads(manifest_file.read_text())
+    manifest['version'] = '0.0'
+    manifest_file.write_text(json.dumps(manifest))
+
+    _start()
+    assert sys.modules['lazytestapp'].initialized
+    assert json.loads(manifest_file.read_text())['version'] != '0.0'
+
+
+def _make_module(name, depends=(), init=None):
+    """Return a module object with given dependencies and init()."""
+    module = types.ModuleType(name)
+    module.depends = list(depends)
+    if init:
+        module.init = init
+
+    return module
+
+
+def test_init_scheduler_order(load_cfg):
+    """Test that modules are initialized concurrently after dependencies."""
+    load_cfg.init_workers = 4
+    events = []
+    both_started = threading.Barrier(2, timeout=5)
+
+    def make_init(name, wait=False):
+        def init():
+            events.append(('start', name))
+            if wait:
+                both_started.wait()
+
+            events.append(('end', name))
+
+        return init
+
+    modules = {
+        'a': _make_module('a', init=make_init('a', wait=True)),
+        'b': _make_module('b', init=make_init('b', wait=True)),
+        'c': _make_module('c', depends=['a', 'b'], init=make_init('c')),
+    }
+    module_loader._InitScheduler(['a', 'b', 'c'], modules).run()
+
+    assert events.index(('start', 'c')) > events.index(('end', 'a'))
+    assert events.index(('start', 'c')) > events.index(('end', 'b'))
+    assert events[-1] == ('end', 'c')
+    assert all(hasattr(module, 'setup_helper') for module in modules.values())
+
+
+def test_init_scheduler_timeout(load_cfg):
+    """Test that slow modules are not waited for beyond timeout."""
+    load_cfg.init_workers = 4
+    load_cfg.init_timeout = 0
+    release = threading.Event()
+    finished = threading.Event()
+    initialized = []
+
+    def slow_init():
+        release.wait(timeout=5)
+        initialized.append('slow')
+
+    def dependent_init():
+        initialized.append('dependent')
+        finished.set()
+
+    modules = {
+        'slow': _make_module('slow', init=slow_init),
+        'dependent': _make_module('dependent', depends=['slow'],
+                                  init=dependent_init),
+        'fast': _make_module('fast',
+                             init=lambda: initialized.append('fast')),
+    }
+    module_loader._InitScheduler(['slow', 'dependent', 'fast'],
+                                 modules).run()
+    assert initialized == ['fast']
+
+    release.set()
+    assert finished.wait(timeout=5)
+    assert initialized == ['fast', 'slow', 'dependent']
+
+
+def test_init_scheduler_timeout_workers(load_cfg):
+    """Test that modules timing out don't keep other modules from starting."""
+    load_cfg.init_workers = 1
+    load_cfg.init_timeout = 0
+    release = threading.Event()
+    initialized = []
+
+    def slow_init():
+        release.wait(timeout=5)
+        initialized.append('slow')
+
+    modules = {
+        'slow1': _make_module('slow1', init=slow_init),
+        'slow2': _make_module('slow2', init=slow_init),
+        'fast': _make_module('fast',
+                             init=lambda: initialized.append('fast')),
+    }
+    try:
+        module_loader._InitScheduler(['slow1', 'slow2', 'fast'],
+                                     modules).run()
+    finally:
+        release.set()
+
+    assert initialized == ['fast']
+
+
+def test_init_scheduler_exception(load_cfg, develop_mode):
+    """Test that exceptions during init are raised in development mode."""
+
+    def init():
+        raise RuntimeError('test-exception')
+
+    modules = {'a': _make_module('a', init=init)}
+    with pytest.raises(RuntimeError, match='test-exception'):
+        module_loader._InitScheduler(['a'], modules).run()
+
+
+def _make_resolver(namespace, patterns):
+    """Return a resolver like a module's included URLs."""
+    patterns = [
+        url(pattern, HttpResponse, name='page{}'.format(number))
+        for number, pattern in enumerate(patterns)
+    ]
+    return url(r'', include((patterns, namespace)))
+
+
+def test_url_index():
+    """Test that only modules that may handle a path are tried."""
+    resolvers = [
+        _make_resolver('first', [r'^apps/first/$', r'^apps/first/(\d+)/$']),
+        _make_resolver('second', [r'^sys/second/$', r'^sys/second-more/']),
+        _make_resolver('third', [r'^apps/$', r'^.*/third/$']),
+        _make_resolver('fourth', [r'^apps/first/extra/$']),
+    ]
+    index = module_loader._ModuleURLIndex(resolvers)
+    assert index.index == {
+        'apps/first/': {0},
+        'sys/second/': {1},
+        'sys/second-more/': {1},
+        'apps/': {2},
+        '': {2},
+        'apps/first/extra/': {3},
+    }
+    assert index.get_resolvers('apps/first/extra/') == \
+        [resolvers[0], resolvers[2], resolvers[3]]
+    assert index.get_resolvers('sys/second/') == [resolvers[1], resolvers[2]]
+    assert index.get_resolvers('other/') == [resolvers[2]]
+
+    match = index.resolve('apps/first/1/')
+    assert match.namespaces == ['first']
+    assert match.url_name == 'page1'
+    assert index.resolve('apps/first/extra/').namespaces == ['fourth']
+    assert index.resolve('sys/second-more/x').namespaces == ['second']
+    assert index.resolve('x/third/').namespaces == ['third']
+    with pytest.raises(urls.Resolver404):
+        index.resolve('sys/third')
+
+    # Reversing URLs through the index is unchanged
+    assert index.reverse_dict == {}
+    assert set(index.namespace_dict) == {'first', 'second', 'third', 'fourth'}
+
+
+def test_url_index_lazy(lazy_app):
+    """Test that lazily loaded modules are indexed without loading them."""
+    _start()
+    _start()
+    index = plinth.urls.urlpatterns[-1]
+    assert isinstance(index, module_loader._ModuleURLIndex)
+    assert index.index == {'apps/lazytestapp/': {0}}
+    assert 'lazytestapp' not in sys.modules
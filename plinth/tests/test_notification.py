@@ -11,6 +11,7 @@ from django.contrib.auth.models import Group, User
 from django.core.exceptions import ValidationError
 
 from plinth.notification import Notification
+from plinth.utils import invalidate_user_groups
 
 pytestmark = pytest.mark.django_db
 
@@ -35,6 +36,7 @@ def fixture_user():
     user.save()
     user.groups.add(group)
     user.save()
+    invalidate_user_groups(user.username)
 
     return user
 
@@ -408,3 +410,22 @@ def test_display_context_body_template(note, user, load_cfg):
     context = Notification.get_display_context(user)
     context_note = context['notifications'][0]
     assert context_note['body'].content == b'Test notification body\n'
+
+
+def test_display_context_cached(note, user, django_assert_num_queries):
+    """Test that display context is cached until notifications change."""
+    context = Notification.get_display_context(user)
+    assert context['notifications'][0]['title'] == 'Test Title'
+    with django_assert_num_queries(0):
+        assert Notification.get_display_context(user) is context
+
+    with patch('plinth.notification.get_language', return_value='x'):
+        assert Notification.get_display_context(user) is not context
+
+    note.title = 'New Title'
+    note.save()
+    context = Notification.get_display_context(user)
+    assert context['notifications'][0]['title'] == 'New Title'
+
+    note.delete()
+    assert Notification.get_display_context(user)['notifications'] == []
@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for startup profiler.
+"""
+
+import json
+import time
+
+import pytest
+
+from plinth import profiler
+
+
+@pytest.fixture(autouse=True)
+def fixture_stop_profiler():
+    """Stop profiling after each test."""
+    yield
+    profiler._enabled = False
+    profiler._records.clear()
+
+
+def test_measure_disabled():
+    """Test that nothing is recorded when profiling is not enabled."""
+    with profiler.measure('import', 'test-module'):
+        pass
+
+    assert not profiler.is_enabled()
+    assert not profiler._records
+
+
+def test_measure(tmp_path):
+    """Test recording measurements and writing report."""
+    profiler.start()
+    assert profiler.is_enabled()
+    with profiler.measure('import', 'fast-module'):
+        pass
+
+    with profiler.measure('init', 'slow-module'):
+        time.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        with profiler.measure('init', 'failing-module'):
+            raise RuntimeError
+
+    report = profiler.get_report()
+    steps = [(step['category'], step['name']) for step in report['steps']]
+    assert ('init', 'slow-module') in steps
+    assert steps.index(('init', 'slow-module')) < \
+        steps.index(('import', 'fast-module'))
+    assert ('init', 'failing-module') in steps
+    assert report['categories']['init'] >= 0.05
+    assert report['total_time'] >= 0.05
+
+    path = tmp_path / 'profile.json'
+    profiler.finish(str(path))
+    assert not profiler.is_enabled()
+    assert json.loads(path.read_text())['steps'] == report['steps']
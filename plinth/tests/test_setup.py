@@ -0,0 +1,57 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for setup utilities.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from plinth import models, setup
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def fixture_clear_setup_versions():
+    """Clear the cache of setup versions before and after each test."""
+    with patch('plinth.setup._setup_versions', None):
+        yield
+
+
+def _get_helper(name='test-module', version=3):
+    """Return a setup helper for a fake module."""
+    module = SimpleNamespace(version=version, setup=lambda *args: None)
+    return setup.Helper(name, module)
+
+
+def test_get_setup_version():
+    """Test that setup versions are read from database."""
+    models.Module.objects.create(name='test-module', setup_version=2)
+    assert _get_helper().get_setup_version() == 2
+    assert _get_helper('other-module').get_setup_version() == 0
+
+
+def test_get_setup_version_cached(django_assert_num_queries):
+    """Test that database is queried only once for all modules."""
+    models.Module.objects.create(name='test-module', setup_version=2)
+    with django_assert_num_queries(1):
+        for _ in range(3):
+            assert _get_helper().get_setup_version() == 2
+            assert _get_helper('other-module').get_state() == 'needs-setup'
+
+
+def test_set_setup_version():
+    """Test that setting setup version updates database and cache."""
+    helper = _get_helper()
+    assert helper.get_state() == 'needs-setup'
+
+    helper.set_setup_version(2)
+    assert helper.get_setup_version() == 2
+    assert helper.get_state() == 'needs-update'
+    assert models.Module.objects.get(pk='test-module').setup_version == 2
+
+    helper.set_setup_version(3)
+    assert helper.get_state() == 'up-to-date'
+    assert models.Module.objects.get(pk='test-module').setup_version == 3
@@ -0,0 +1,113 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Tests for precompressing static files and versioning their URLs.
+"""
+
+import gzip
+import hashlib
+import json
+
+import pytest
+from django.template import Context, Template
+
+from plinth import static_assets
+
+CSS = 'body { color: black; }\n' * 100
+
+
+@pytest.fixture(name='static_dir')
+def fixture_static_dir(tmp_path):
+    """Create a static directory and forget registered ones afterwards."""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'main.css').write_text(CSS)
+    (tmp_path / 'small.js').write_text('var a = 1;')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' * 100)
+    yield tmp_path
+    static_assets.unregister_all()
+
+
+def test_build(static_dir):
+    """Test that compressed variants and manifest are written."""
+    manifest = static_assets.build(str(static_dir))
+    css_hash = hashlib.sha256(CSS.encode()).hexdigest()[:12]
+    assert manifest['files']['css/main.css'] == {
+        'hash': css_hash,
+        'encodings': ['gzip']
+    }
+    assert manifest['files']['small.js']['encodings'] == []
+    assert manifest['files']['logo.png']['encodings'] == []
+    assert gzip.decompress((static_dir / 'css' / 'main.css.gz').read_bytes()) \
+        == CSS.encode()
+    assert not (static_dir / 'small.js.gz').exists()
+    assert not (static_dir / 'logo.png.gz').exists()
+
+    written = json.loads((static_dir / 'static-manifest.json').read_text())
+    assert written == manifest
+
+    # Building again does not pick up generated files
+    assert static_assets.build(str(static_dir)) == manifest
+
+
+def test_clean(static_dir):
+    """Test that generated files are removed."""
+    static_assets.build(str(static_dir))
+    static_assets.clean(str(static_dir))
+    assert sorted(path.name for path in static_dir.rglob('*')) == \
+        ['css', 'logo.png', 'main.css', 'small.js']
+
+
+def test_versioned_url(static_dir):
+    """Test that URLs of files in manifest carry their hash."""
+    manifest = static_assets.build(str(static_dir))
+    css_hash = manifest['files']['css/main.css']['hash']
+    static_assets.register(str(static_dir), '/plinth/static/')
+    static_assets.register('/usr/share/javascript', '/javascript')
+
+    assert static_assets.get_versioned_url('/plinth/static/css/main.css') == \
+        '/plinth/static/css/main.css?v=' + css_hash
+    assert static_assets.get_versioned_url('/plinth/static/unknown.css') == \
+        '/plinth/static/unknown.css'
+    assert static_assets.get_versioned_url('/javascript/jquery.js') == \
+        '/javascript/jquery.js'
+    assert static_assets.get_versioned_url('/other/main.css') == \
+        '/other/main.css'
+
+
+def test_versioned_url_without_manifest(static_dir):
+    """Test that URLs are not versioned if manifest is not to be read."""
+    static_assets.build(str(static_dir))
+    static_assets.register(str(static_dir), '/plinth/static',
+                           read_manifest=False)
+    assert static_assets.get_versioned_url('/plinth/static/css/main.css') == \
+        '/plinth/static/css/main.css'
+
+
+def test_get_encodings(static_dir):
+    """Test finding compressed variants with and without manifest."""
+    static_assets.register(str(static_dir), '/plinth/static')
+    assert static_assets.get_encodings('/plinth/static/css/main.css') == \
+        (str(static_dir / 'css' / 'main.css'), [])
+
+    (static_dir / 'logo.png.br').write_bytes(b'')
+    assert static_assets.get_encodings('/plinth/static/logo.png') == \
+        (str(static_dir / 'logo.png'), ['br'])
+
+    static_assets.build(str(static_dir))
+    static_assets.register(str(static_dir), '/plinth/static')
+    assert static_assets.get_encodings('/plinth/static/css/main.css') == \
+        (str(static_dir / 'css' / 'main.css'), ['gzip'])
+    assert static_assets.get_encodings('/plinth/static/../secret') == \
+        (None, [])
+    assert static_assets.get_encodings('/other/main.css') == (None, [])
+
+
+def test_static_template_tag(static_dir, settings):
+    """Test that static template tag renders versioned URLs."""
+    settings.STATIC_URL = '/plinth/static/'
+    manifest = static_assets.build(str(static_dir))
+    static_assets.register(str(static_dir), settings.STATIC_URL)
+    template = Template("{% load static %}{% static 'css/main.css' %} "
+                        "{% get_static_prefix %}")
+    assert template.render(Context()) == '{}css/main.css?v={} {}'.format(
+        settings.STATIC_URL, manifest['files']['css/main.css']['hash'],
+        settings.STATIC_URL)
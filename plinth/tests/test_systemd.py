@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for systemd unit state cache.
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from plinth import systemd
+
+
+@pytest.fixture(name='cache')
+def fixture_cache():
+    """Return a unit state cache with a mocked D-Bus connection."""
+    cache = systemd.UnitStateCache(Mock())
+    cache._call = Mock()
+    with patch('plinth.systemd._cache', cache):
+        yield cache
+
+
+def _list_units(units):
+    """Return result of ListUnits D-Bus call for a list of units."""
+    return ([(name, '', 'loaded', state, '', '', path, 0, '', '/')
+             for name, state, path in units], )
+
+
+def test_normalize_unit_name():
+    """Test that unit type suffix is added when missing."""
+    assert systemd.normalize_unit_name('tor') == 'tor.service'
+    assert systemd.normalize_unit_name('tor.service') == 'tor.service'
+    assert systemd.normalize_unit_name('tor.socket') == 'tor.socket'
+    assert systemd.normalize_unit_name('openvpn@freedombox') == \
+        'openvpn@freedombox.service'
+
+
+def test_cache_not_available():
+    """Test that None is returned when cache is not available."""
+    with patch('plinth.systemd._cache', None):
+        assert systemd.is_running('tor') is None
+        assert systemd.is_enabled('tor') is None
+
+
+def test_is_running_from_list(cache):
+    """Test that states of listed units are answered from memory."""
+    cache._on_list_units(
+        _list_units([('tor.service', 'active', '/unit/tor'),
+                     ('ssh.service', 'failed', '/unit/ssh'),
+                     ('x.service', 'reloading', '/unit/x')]))
+    assert systemd.is_running('tor')
+    assert not systemd.is_running('ssh.service')
+    assert systemd.is_running('x')
+    cache._call.assert_not_called()
+
+
+def test_is_running_lookup(cache):
+    """Test that unknown units are looked up once."""
+    cache._call.side_effect = [('/unit/tor', ), ('active', )]
+    assert systemd.is_running('tor')
+    assert systemd.is_running('tor')
+    assert cache._call.call_count == 2
+
+
+def test_is_running_not_loaded(cache):
+    """Test that units not loaded are not running until they are loaded."""
+    cache._call.side_effect = systemd.UnitNotFound
+    assert not systemd.is_running('tor')
+    assert not systemd.is_running('tor')
+    assert cache._call.call_count == 1
+
+    cache.on_unit_new('tor.service', '/unit/tor')
+    cache.on_properties_changed('/unit/tor', {'ActiveState': 'active'}, [])
+    assert systemd.is_running('tor')
+
+
+def test_properties_changed(cache):
+    """Test that active state changes are tracked."""
+    cache._on_list_units(_list_units([('tor.service', 'active', '/unit/tor')
+                                      ]))
+    cache.on_properties_changed('/unit/tor', {'ActiveState': 'inactive'}, [])
+    assert not systemd.is_running('tor')
+
+    cache.on_properties_changed('/unit/tor', {'SubState': 'running'}, [])
+    assert not systemd.is_running('tor')
+
+    cache._call.return_value = ('active', )
+    cache.on_properties_changed('/unit/tor', {}, ['ActiveState'])
+    assert systemd.is_running('tor')
+
+
+def test_unit_removed(cache):
+    """Test that removed units are looked up again."""
+    cache._on_list_units(_list_units([('tor.service', 'active', '/unit/tor')
+                                      ]))
+    cache.on_unit_removed('tor.service', '/unit/tor')
+    cache._call.side_effect = systemd.UnitNotFound
+    assert not systemd.is_running('tor')
+
+
+@pytest.mark.parametrize('state,enabled,strict_enabled', [
+    ('enabled', True, True),
+    ('enabled-runtime', True, False),
+    ('static', True, False),
+    ('disabled', False, False),
+    ('masked', False, False),
+    (None, False, False),
+])
+def test_is_enabled(cache, state, enabled, strict_enabled):
+    """Test unit file states as interpreted by is-enabled."""
+    cache._unit_file_states['tor.service'] = state
+    assert systemd.is_enabled('tor') == enabled
+    assert systemd.is_enabled('tor', strict_check=True) == strict_enabled
+    cache._call.assert_not_called()
+
+
+def test_is_enabled_lookup(cache):
+    """Test that unit file states are looked up and invalidated."""
+    cache._on_list_unit_files(([('/lib/systemd/system/tor.service',
+                                 'enabled')], ))
+    assert systemd.is_enabled('tor')
+    cache._call.assert_not_called()
+
+    cache.on_unit_files_changed()
+    cache._call.return_value = ('disabled', )
+    assert not systemd.is_enabled('tor')
+    assert not systemd.is_enabled('tor')
+    assert cache._call.call_count == 1
+
+    cache.on_unit_files_changed()
+    cache._call.side_effect = systemd.UnitNotFound
+    assert not systemd.is_enabled('missing')
+
+
+@pytest.mark.parametrize('error, cached', [
+    ('org.freedesktop.systemd1.NoSuchUnit', True),
+    ('org.freedesktop.DBus.Error.FileNotFound', True),
+    ('org.freedesktop.DBus.Error.AccessDenied', False),
+])
+@patch('plinth.systemd.gio')
+@patch('plinth.systemd.glib')
+def test_unit_file_not_found(glib, gio, error, cached):
+    """Test that missing unit files are cached and other errors are not."""
+    glib.Error = RuntimeError
+    gio.DBusError.get_remote_error.return_value = error
+    cache = systemd.UnitStateCache(Mock())
+    cache.connection.call_sync.side_effect = RuntimeError(error)
+    with patch('plinth.systemd._cache', cache):
+        assert not systemd.is_enabled('missing')
+        assert not systemd.is_enabled('missing')
+
+    expected_calls = 1 if cached else 2
+    assert cache.connection.call_sync.call_count == expected_calls
+    assert ('missing.service' in cache._unit_file_states) == cached
+
+
+def test_lookup_error(cache):
+    """Test that None is returned when D-Bus calls fail."""
+    cache._call.side_effect = RuntimeError
+    assert systemd.is_running('tor') is None
+    assert systemd.is_enabled('tor') is None
+
+
+@patch('plinth.systemd.is_running')
+@patch('subprocess.run')
+def test_action_utils_uses_cache(run, is_running):
+    """Test that action utilities use the cache when available."""
+    from plinth import action_utils
+    is_running.return_value = True
+    assert action_utils.service_is_running('tor')
+    run.assert_not_called()
+
+    is_running.return_value = None
+    action_utils.service_is_running('tor')
+    run.assert_called()
@@ -4,12 +4,13 @@ Test module for utilities.
 """
 
 import tempfile
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 import ruamel.yaml
 from django.test.client import RequestFactory
 
+from plinth import utils
 from plinth.utils import YAMLFile, is_user_admin
 
 
@@ -33,15 +34,17 @@ class TestIsAdminUser:
         assert not is_user_admin(web_request, cached=True)
 
     @staticmethod
-    def test_values_for_authenticated_users(web_request):
+    @patch('plinth.utils.get_user_groups')
+    def test_values_for_authenticated_users(get_user_groups, web_request):
         """Test correct return values for authenticated users."""
-        web_request.user.groups.filter().exists = Mock(return_value=False)
+        get_user_groups.return_value = {'group1'}
         assert not is_user_admin(web_request)
-        web_request.user.groups.filter().exists = Mock(return_value=True)
+        get_user_groups.return_value = {'group1', 'admin'}
         assert is_user_admin(web_request)
 
     @staticmethod
-    def test_caching_of_values(web_request):
+    @patch('plinth.utils.get_user_groups')
+    def test_caching_of_values(get_user_groups, web_request):
         """Test that caching of values for authenticate users."""
         session_mock = MagicMock()
         session_dict = {}
@@ -50,26 +53,47 @@ class TestIsAdminUser:
         session_mock.__contains__.side_effect = session_dict.__contains__
         web_request.session = session_mock
 
-        mock = Mock(return_value=False)
-        web_request.user.groups.filter().exists = mock
+        get_user_groups.return_value = set()
         assert not is_user_admin(web_request)
-        mock.assert_called_once_with()
+        get_user_groups.assert_called_once_with(web_request.user.username)
         session_mock.__setitem__.assert_called_once_with(
             'cache_user_is_admin', False)
 
-        mock = Mock(return_value=False)
-        web_request.user.groups.filter().exists = mock
+        get_user_groups.reset_mock()
         assert not is_user_admin(web_request, cached=True)
-        mock.assert_not_called()
+        get_user_groups.assert_not_called()
         session_mock.__getitem__.assert_called_once_with('cache_user_is_admin')
 
-        mock = Mock(return_value=False)
-        web_request.user.groups.filter().exists = mock
+        get_user_groups.reset_mock()
         assert not is_user_admin(web_request, cached=False)
-        mock.assert_called_once_with()
+        get_user_groups.assert_called_once_with(web_request.user.username)
         session_mock.__getitem__.assert_called_once_with('cache_user_is_admin')
 
 
+@pytest.mark.django_db
+def test_get_user_groups(django_assert_num_queries):
+    """Test that group membership is cached until invalidated."""
+    from django.contrib.auth.models import Group, User
+    utils.invalidate_user_groups()
+    user = User.objects.create(username='test-user')
+    user.groups.add(Group.objects.create(name='admin'))
+    with django_assert_num_queries(1):
+        assert utils.get_user_groups('test-user') == {'admin'}
+        assert utils.get_user_groups('test-user') == {'admin'}
+
+    user.groups.add(Group.objects.create(name='group1'))
+    utils.invalidate_user_groups('test-user')
+    assert utils.get_user_groups('test-user') == {'admin', 'group1'}
+
+    user.groups.clear()
+    with patch('plinth.utils.USER_GROUPS_CACHE_TTL', 0):
+        assert utils.get_user_groups('test-user') == set()
+
+    assert utils.get_user_groups('other-user') == set()
+    utils.invalidate_user_groups()
+    assert not utils._user_groups
+
+
 class TestYAMLFileUtil:
     """Check updating YAML files"""
 
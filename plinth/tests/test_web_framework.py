@@ -0,0 +1,133 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""
+Test module for Django web framework setup.
+"""
+
+import datetime
+from unittest.mock import patch
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from plinth import web_framework
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(name='call_command')
+def fixture_call_command(load_cfg, tmp_path):
+    """Use a temporary data directory and don't actually run migrate."""
+    load_cfg.data_dir = str(tmp_path)
+    with patch('django.core.management.call_command') as call_command:
+        yield call_command
+
+
+def test_migrate_first_time(call_command, tmp_path):
+    """Test that migrate is run when there is no fingerprint."""
+    web_framework._migrate()
+    call_command.assert_called_once_with('migrate', '--fake-initial',
+                                         interactive=False, verbosity=0)
+    assert (tmp_path / 'migrations-fingerprint').read_text() == \
+        web_framework._get_migrations_fingerprint()
+
+
+def test_migrate_skipped(call_command):
+    """Test that migrate is not run when migrations have not changed."""
+    web_framework._migrate()
+    call_command.reset_mock()
+
+    web_framework._migrate()
+    call_command.assert_not_called()
+
+
+def test_migrate_changed(call_command):
+    """Test that migrate is run when migrations have changed."""
+    web_framework._migrate()
+    call_command.reset_mock()
+
+    with patch('django.db.migrations.recorder.MigrationRecorder.'
+               'applied_migrations', return_value=set()):
+        web_framework._migrate()
+
+    call_command.assert_called_once()
+
+
+@pytest.mark.parametrize('backend,engine', [
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+    ('file', 'django.contrib.sessions.backends.file'),
+    ('x-invalid', 'django.contrib.sessions.backends.cached_db'),
+])
+def test_get_session_engine(load_cfg, backend, engine):
+    """Test that session engine is chosen based on configuration."""
+    load_cfg.session_backend = backend
+    assert web_framework._get_session_engine() == engine
+
+
+def test_prune_expired_sessions():
+    """Test that expired sessions are removed a few at a time."""
+    now = timezone.now()
+    for index in range(3):
+        Session.objects.create(session_key='expired-{}'.format(index),
+                               session_data='',
+                               expire_date=now - datetime.timedelta(days=1))
+
+    Session.objects.create(session_key='current', session_data='',
+                           expire_date=now + datetime.timedelta(days=1))
+
+    with patch('plinth.web_framework.SESSION_PRUNE_BATCH_SIZE', 2):
+        assert web_framework._prune_expired_sessions(None) == 2
+        assert web_framework._prune_expired_sessions(None) == 1
+        assert web_framework._prune_expired_sessions(None) == 0
+
+    assert list(Session.objects.values_list('session_key',
+                                            flat=True)) == ['current']
+
+
+def test_remove_session_files(tmp_path):
+    """Test that sessions of file backend are removed."""
+    session_dir = tmp_path / 'sessions'
+    session_dir.mkdir()
+    (session_dir / 'sessionid1234').write_text('')
+    (session_dir / 'sessionid5678').write_text('')
+    with patch('django.conf.settings.SESSION_FILE_PATH', str(session_dir)):
+        assert web_framework._remove_session_files(None) == 2
+
+    assert not session_dir.exists()
+
+    (tmp_path / 'other').mkdir()
+    (tmp_path / 'other' / 'unrelated').write_text('')
+    with patch('django.conf.settings.SESSION_FILE_PATH',
+               str(tmp_path / 'other')):
+        assert web_framework._remove_session_files(None) == 0
+
+    assert (tmp_path / 'other' / 'unrelated').exists()
+
+
+@pytest.mark.parametrize('engine,exists,scheduled', [
+    ('django.contrib.sessions.backends.file', True, ['clearsessions']),
+    ('django.contrib.sessions.backends.cached_db', True,
+     ['prune', 'remove']),
+    ('django.contrib.sessions.backends.cached_db', False, ['prune']),
+    ('django.contrib.sessions.backends.signed_cookies', True, ['remove']),
+])
+def test_schedule_session_cleanup(tmp_path, engine, exists, scheduled):
+    """Test that cleanup suitable for the session backend is scheduled."""
+    names = {
+        web_framework._cleanup_expired_sessions: 'clearsessions',
+        web_framework._prune_expired_sessions: 'prune',
+        web_framework._remove_session_files: 'remove',
+    }
+    session_dir = tmp_path / 'sessions'
+    if exists:
+        session_dir.mkdir()
+
+    with patch('django.conf.settings.SESSION_ENGINE', engine), \
+            patch('django.conf.settings.SESSION_FILE_PATH',
+                  str(session_dir)), \
+            patch('plinth.glib.schedule') as schedule:
+        web_framework._schedule_session_cleanup()
+
+    assert [names[call[0][1]] for call in schedule.call_args_list] == \
+        scheduled
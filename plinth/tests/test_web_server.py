@@ -3,17 +3,22 @@
 Tests for CherryPy web server setup and its components.
 """
 
-from unittest.mock import call, patch
+from unittest.mock import Mock, call, patch
 
+import cherrypy
 import pytest
+from cherrypy.lib import httputil
 
-from plinth.web_server import StaticFiles
+from plinth import static_assets
+from plinth.web_server import LongResponses, StaticFiles, _serve_static_asset
 
 
 @pytest.fixture(autouse=True)
 def fixture_cleanup_static_files():
     """Ensure that global list of static files is clean."""
     StaticFiles._all_instances = {}
+    yield
+    static_assets.unregister_all()
 
 
 def test_static_files_init():
@@ -48,7 +53,8 @@ def test_static_files_mount(mount, load_cfg):
                 '/': {
                     'tools.staticdir.root': '/b',
                     'tools.staticdir.on': True,
-                    'tools.staticdir.dir': '.'
+                    'tools.staticdir.dir': '.',
+                    'tools.static_assets.on': True,
                 }
             }),
         call(
@@ -56,8 +62,125 @@ def test_static_files_mount(mount, load_cfg):
                 '/': {
                     'tools.staticdir.root': '/d',
                     'tools.staticdir.on': True,
-                    'tools.staticdir.dir': '.'
+                    'tools.staticdir.dir': '.',
+                    'tools.static_assets.on': True,
                 }
             })
     ]
     mount.assert_has_calls(calls)
+
+
+class _StreamingResult(list):
+    """A streaming WSGI result like Django's StreamingHttpResponse."""
+    streaming = True
+    close = Mock()
+
+
+def _make_application(result):
+    """Return a WSGI application that returns a given result."""
+
+    def application(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return result
+
+    return application
+
+
+@patch('plinth.web_server._resize_thread_pool')
+def test_long_responses_regular(resize):
+    """Test that regular responses are passed through."""
+    start_response = Mock()
+    middleware = LongResponses(_make_application([b'data']), 2)
+    assert middleware({}, start_response) == [b'data']
+    start_response.assert_called_once_with(
+        '200 OK', [('Content-Type', 'text/plain')], None)
+    resize.assert_not_called()
+
+
+@patch('plinth.web_server._resize_thread_pool')
+def test_long_responses_streaming(resize):
+    """Test that threads are added for streaming responses up to a limit."""
+    start_response = Mock()
+    middleware = LongResponses(
+        _make_application(_StreamingResult([b'a', b'b'])), 1)
+    response1 = middleware({}, start_response)
+    assert list(response1) == [b'a', b'b']
+    start_response.assert_called_once_with(
+        '200 OK', [('Content-Type', 'text/plain')], None)
+    resize.assert_called_once_with(1)
+
+    start_response.reset_mock()
+    response2 = middleware({}, start_response)
+    assert start_response.call_args[0][0] == '503 Service Unavailable'
+    _StreamingResult.close.assert_called_once_with()
+
+    _StreamingResult.close.reset_mock()
+    response1.close()
+    _StreamingResult.close.assert_called_once_with()
+    resize.assert_called_with(-1)
+
+    start_response.reset_mock()
+    response2 = middleware({}, start_response)
+    assert list(response2) == [b'a', b'b']
+    assert start_response.call_args[0][0] == '200 OK'
+
+
+@patch('plinth.web_server._resize_thread_pool')
+def test_long_responses_disabled(resize):
+    """Test that no threads are added if disabled."""
+    result = _StreamingResult([b'a'])
+    middleware = LongResponses(_make_application(result), 0)
+    assert middleware({}, Mock()) is result
+    resize.assert_not_called()
+
+
+@pytest.fixture(name='static_request')
+def fixture_static_request(load_cfg, tmp_path):
+    """Serve a precompressed static directory and return a fake request."""
+    (tmp_path / 'main.css').write_text('body { color: black; }\n' * 100)
+    static_assets.build(str(tmp_path))
+    static_assets.register(str(tmp_path), '/plinth/static')
+    load_cfg.server_static_precompressed = True
+    load_cfg.server_static_max_age = 3600
+
+    request = Mock(script_name='/plinth/static', path_info='/main.css',
+                   params={}, headers=httputil.HeaderMap())
+    response = Mock(headers=httputil.HeaderMap())
+    with patch.object(cherrypy, 'serving', Mock(request=request,
+                                                response=response)), \
+            patch('cherrypy.lib.static.serve_file') as serve_file:
+        yield request, response, serve_file
+
+
+def test_serve_static_asset_compressed(static_request, tmp_path):
+    """Test that the compressed variant accepted by browser is served."""
+    request, response, serve_file = static_request
+    request.headers['Accept-Encoding'] = 'br;q=0, gzip, deflate'
+    assert _serve_static_asset()
+    serve_file.assert_called_once_with(str(tmp_path / 'main.css.gz'),
+                                       'text/css')
+    assert request.handler is None
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert 'Cache-Control' not in response.headers
+
+
+def test_serve_static_asset_uncompressed(static_request, load_cfg):
+    """Test that the original file is served when needed."""
+    request, response, serve_file = static_request
+    assert not _serve_static_asset()
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+    load_cfg.server_static_precompressed = False
+    request.headers['Accept-Encoding'] = 'gzip'
+    assert not _serve_static_asset()
+    serve_file.assert_not_called()
+
+
+def test_serve_static_asset_versioned(static_request):
+    """Test that versioned URLs may be cached forever."""
+    request, response, _ = static_request
+    request.params['v'] = '1234'
+    _serve_static_asset()
+    assert response.headers['Cache-Control'] == \
+        'public, max-age=3600, immutable'
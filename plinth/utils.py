@@ -9,6 +9,8 @@ import os
 import random
 import re
 import string
+import threading
+import time
 from distutils.version import LooseVersion
 
 import markupsafe
@@ -17,6 +19,13 @@ from django.utils.functional import lazy
 
 Version = LooseVersion  # Abstraction over distutils.version.LooseVersion
 
+# Time in seconds for which group membership of a user is cached
+USER_GROUPS_CACHE_TTL = 60
+
+_user_groups = {}
+_user_groups_generation = 0
+_user_groups_lock = threading.Lock()
+
 
 def import_from_gi(library, version):
     """Import and return a GObject introspection library."""
@@ -60,11 +69,51 @@ def is_user_admin(request, cached=False):
     if 'cache_user_is_admin' in request.session and cached:
         return request.session['cache_user_is_admin']
 
-    user_is_admin = request.user.groups.filter(name='admin').exists()
+    user_is_admin = 'admin' in get_user_groups(request.user.username)
     request.session['cache_user_is_admin'] = user_is_admin
     return user_is_admin
 
 
+def get_user_groups(username):
+    """Return the set of names of groups that a user belongs to.
+
+    Group membership is needed on almost every page and is cached for a short
+    while. Code that changes group membership of a user must call
+    invalidate_user_groups().
+
+    """
+    now = time.monotonic()
+    with _user_groups_lock:
+        entry = _user_groups.get(username)
+        generation = _user_groups_generation
+
+    if entry and now - entry[0] < USER_GROUPS_CACHE_TTL:
+        return entry[1]
+
+    from django.contrib.auth.models import Group
+    groups = frozenset(
+        Group.objects.filter(user__username=username).values_list(
+            'name', flat=True))
+
+    with _user_groups_lock:
+        # Don't store if invalidated while querying
+        if generation == _user_groups_generation:
+            _user_groups[username] = (now, groups)
+
+    return groups
+
+
+def invalidate_user_groups(username=None):
+    """Forget cached group membership of a user or all users if None."""
+    global _user_groups_generation
+    with _user_groups_lock:
+        _user_groups_generation += 1
+        if username is None:
+            _user_groups.clear()
+        else:
+            _user_groups.pop(username, None)
+
+
 class YAMLFile(object):
     """A context management class for updating YAML files"""
     def __init__(self, yaml_file):
@@ -3,9 +3,12 @@
 Setup Django web framework.
 """
 
+import hashlib
+import json
 import logging
 import os
 import pathlib
+import pkgutil
 import random
 import stat
 
@@ -15,10 +18,14 @@ import django.core.wsgi
 from django.conf import global_settings
 from django.contrib.messages import constants as message_constants
 
-from . import cfg, glib, log, module_loader, settings
+from . import cfg, database, glib, log, module_loader, profiler, settings
 
 logger = logging.getLogger(__name__)
 
+SESSION_PRUNE_INTERVAL = 3600
+
+SESSION_PRUNE_BATCH_SIZE = 500
+
 
 def init():
     """Setup Django configuration in the absence of .settings file"""
@@ -29,15 +36,19 @@ def init():
     if cfg.use_x_forwarded_for:
         settings.IPWARE_META_PRECEDENCE_ORDER = ('HTTP_X_FORWARDED_FOR', )
 
+    settings.CACHES = {'default': _get_cache_configuration()}
     settings.DATABASES['default']['NAME'] = cfg.store_file
+    settings.DATABASES['default']['CONN_MAX_AGE'] = cfg.database_conn_max_age
     settings.DEBUG = cfg.develop
     settings.FORCE_SCRIPT_NAME = cfg.server_dir
-    settings.INSTALLED_APPS += module_loader.get_modules_to_load()
+    settings.INSTALLED_APPS += _get_installed_apps()
     settings.LANGUAGES = get_languages()
     settings.LOGGING = log.get_configuration()
     settings.MESSAGE_TAGS = {message_constants.ERROR: 'danger'}
     settings.SECRET_KEY = _get_secret_key()
+    settings.SESSION_ENGINE = _get_session_engine()
     settings.SESSION_FILE_PATH = os.path.join(cfg.data_dir, 'sessions')
+    settings.TEMPLATES[0]['DIRS'] = _get_template_directories()
     settings.STATIC_URL = '/'.join([cfg.server_dir,
                                     'static/']).replace('//', '/')
     settings.USE_X_FORWARDED_HOST = cfg.use_x_forwarded_host
@@ -47,19 +58,112 @@ def init():
         if setting.isupper():
             kwargs[setting] = getattr(settings, setting)
 
-    django.conf.settings.configure(**kwargs)
-    django.setup(set_prefix=True)
+    database.init()
+
+    with profiler.measure('django', 'setup'):
+        django.conf.settings.configure(**kwargs)
+        django.setup(set_prefix=True)
 
     logger.debug('Configured Django with applications - %s',
                  settings.INSTALLED_APPS)
 
+    with profiler.measure('django', 'migrate'):
+        _migrate()
+    os.chmod(cfg.store_file, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP)
+
+    _schedule_session_cleanup()
+
+
+def _migrate():
+    """Create or add new tables to data file if migrations have changed."""
+    fingerprint_file = pathlib.Path(cfg.data_dir) / 'migrations-fingerprint'
+    try:
+        old_fingerprint = fingerprint_file.read_text()
+    except OSError:
+        old_fingerprint = None
+
+    if old_fingerprint and old_fingerprint == _get_migrations_fingerprint():
+        logger.debug('Database schema is up-to-date')
+        return
+
     logger.debug('Creating or adding new tables to data file')
     django.core.management.call_command('migrate', '--fake-initial',
                                         interactive=False, verbosity=0)
-    os.chmod(cfg.store_file, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP)
+    try:
+        fingerprint_file.write_text(_get_migrations_fingerprint())
+    except OSError as exception:
+        logger.warning('Unable to write migrations fingerprint: %s',
+                       exception)
+
+
+def _get_migrations_fingerprint():
+    """Return a hash of migrations on disk and those applied to database.
+
+    Migrations on disk are found in the same way as Django does but without
+    loading them.
+
+    """
+    from django.apps import apps
+    from django.db import connection
+    from django.db.migrations.recorder import MigrationRecorder
+
+    migrations = []
+    for app_config in apps.get_app_configs():
+        directory = os.path.join(app_config.path, 'migrations')
+        for module_info in pkgutil.iter_modules([directory]):
+            if not module_info.ispkg and module_info.name[0] not in '_~':
+                migrations.append((app_config.label, module_info.name))
+
+    applied = MigrationRecorder(connection).applied_migrations()
+    data = json.dumps([sorted(migrations), sorted(applied)])
+    return hashlib.sha256(data.encode()).hexdigest()
+
 
-    # Cleanup expired sessions every day
-    glib.schedule(24 * 3600, _cleanup_expired_sessions, in_thread=True)
+def _get_installed_apps():
+    """Return modules to register as Django applications.
+
+    Modules that may be loaded only when needed are not registered so that they
+    are not imported when Django is setup. They don't have any models.
+
+    """
+    lazy_candidates = module_loader.get_lazy_module_candidates()
+    return [
+        module_import_path
+        for module_import_path in module_loader.get_modules_to_load()
+        if module_import_path not in lazy_candidates
+    ]
+
+
+def _get_template_directories():
+    """Return template directories of modules not registered with Django."""
+    directories = []
+    for module_import_path in module_loader.get_lazy_module_candidates():
+        directory = os.path.join(
+            module_loader.get_module_directory(module_import_path),
+            'templates')
+        if os.path.isdir(directory):
+            directories.append(directory)
+
+    return directories
+
+
+def _get_cache_configuration():
+    """Return Django cache configuration for the configured backend."""
+    backends = {
+        'dummy': 'django.core.cache.backends.dummy.DummyCache',
+        'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+        'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    }
+    backend = cfg.cache_backend
+    if backend not in backends:
+        logger.warning('Unknown cache backend %s, using locmem', backend)
+        backend = 'locmem'
+
+    configuration = {'BACKEND': backends[backend]}
+    if backend == 'file':
+        configuration['LOCATION'] = os.path.join(cfg.data_dir, 'cache')
+
+    return configuration
 
 
 def _get_secret_key():
@@ -108,12 +212,82 @@ def get_languages():
         ])
 
 
+def _get_session_engine():
+    """Return Django session engine for the configured backend."""
+    engines = {
+        'cached_db': 'django.contrib.sessions.backends.cached_db',
+        'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+        'file': 'django.contrib.sessions.backends.file',
+    }
+    backend = cfg.session_backend
+    if backend not in engines:
+        logger.warning('Unknown session backend %s, using cached_db', backend)
+        backend = 'cached_db'
+
+    return engines[backend]
+
+
+def _schedule_session_cleanup():
+    """Schedule removal of expired sessions suitable for session backend."""
+    engine = django.conf.settings.SESSION_ENGINE
+    if engine.endswith('.file'):
+        # Cleanup expired sessions every day
+        glib.schedule(24 * 3600, _cleanup_expired_sessions, in_thread=True)
+        return
+
+    if engine.endswith('db'):
+        # Remove a few expired sessions at a time, often
+        glib.schedule(SESSION_PRUNE_INTERVAL, _prune_expired_sessions,
+                      in_thread=True)
+
+    # Sessions left by file backend, used by default earlier, are unusable
+    if os.path.isdir(django.conf.settings.SESSION_FILE_PATH):
+        glib.schedule(60, _remove_session_files, repeat=False)
+
+
 def _cleanup_expired_sessions(data):
     """Cleanup expired Django sessions."""
     verbosity = 1 if cfg.develop else 0
     django.core.management.call_command('clearsessions', verbosity=verbosity)
 
 
+def _remove_session_files(data):
+    """Remove sessions kept in files when another backend is in use."""
+    session_dir = pathlib.Path(django.conf.settings.SESSION_FILE_PATH)
+    prefix = django.conf.settings.SESSION_COOKIE_NAME
+    count = 0
+    for path in session_dir.glob(prefix + '*'):
+        try:
+            path.unlink()
+            count += 1
+        except OSError as exception:
+            logger.warning('Unable to remove session file %s: %s', path,
+                           exception)
+
+    try:
+        session_dir.rmdir()
+    except OSError:
+        pass
+
+    logger.info('Removed %d sessions of file backend', count)
+    return count
+
+
+def _prune_expired_sessions(data):
+    """Delete a limited number of expired sessions from the database."""
+    from django.contrib.sessions.models import Session
+    from django.utils import timezone
+
+    expired = Session.objects.filter(
+        expire_date__lt=timezone.now()).values_list('pk', flat=True)
+    keys = list(expired[:SESSION_PRUNE_BATCH_SIZE])
+    if keys:
+        Session.objects.filter(pk__in=keys).delete()
+        logger.debug('Removed %d expired sessions', len(keys))
+
+    return len(keys)
+
+
 def get_wsgi_application():
     """Return Django wsgi application."""
     return django.core.wsgi.get_wsgi_application()
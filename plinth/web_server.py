@@ -4,12 +4,17 @@ Setup CherryPy web server.
 """
 
 import logging
+import mimetypes
 import os
+import threading
 import warnings
 
 import cherrypy
+from cherrypy.lib import static
 
-from . import app, cfg, log, module_loader, web_framework
+from . import (app, cfg, log, module_loader, profiler, static_assets,
+               web_framework)
+from .signals import post_app_loading
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +24,57 @@ def _mount_static_directory(static_dir, static_url):
         '/': {
             'tools.staticdir.root': static_dir,
             'tools.staticdir.on': True,
-            'tools.staticdir.dir': '.'
+            'tools.staticdir.dir': '.',
+            'tools.static_assets.on': True,
         }
     }
     app = cherrypy.tree.mount(None, static_url, config)
     log.setup_cherrypy_static_directory(app)
+    static_assets.register(static_dir, static_url,
+                           read_manifest=not cfg.develop)
+
+
+def _serve_static_asset():
+    """Set cache headers and serve precompressed variant of a static file.
+
+    Versioned URLs change along with the file's content and may be cached
+    forever. Returns True if the request was handled.
+
+    """
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    if request.params.get('v') and cfg.server_static_max_age:
+        response.headers['Cache-Control'] = \
+            'public, max-age={}, immutable'.format(cfg.server_static_max_age)
+
+    if not cfg.server_static_precompressed or cfg.develop:
+        return False
+
+    path, encodings = static_assets.get_encodings(request.script_name +
+                                                  request.path_info)
+    if not encodings:
+        return False
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    accepted = {
+        element.value.lower()
+        for element in request.headers.elements('Accept-Encoding')
+        if element.qvalue > 0
+    }
+    for encoding, extension in static_assets.ENCODINGS:
+        if encoding in encodings and encoding in accepted:
+            content_type = mimetypes.guess_type(path)[0] or 'text/plain'
+            response.headers['Content-Encoding'] = encoding
+            response.body = static.serve_file(path + extension, content_type)
+            request.handler = None
+            return True
+
+    return False
+
+
+# Run before the staticdir tool, whose default priority is 50
+cherrypy.tools.static_assets = cherrypy.Tool('before_handler',
+                                             _serve_static_asset, priority=40)
 
 
 def init():
@@ -35,14 +86,32 @@ def init():
         'server.max_request_body_size': 0,
         'server.socket_host': cfg.host,
         'server.socket_port': cfg.port,
-        'server.thread_pool': 10,
+        'server.thread_pool': cfg.server_thread_pool,
+        'server.thread_pool_max':
+            cfg.server_thread_pool + cfg.server_long_request_threads,
+        'server.socket_queue_size': cfg.server_socket_queue_size,
+        'server.socket_timeout': cfg.server_socket_timeout,
+        'server.accepted_queue_size': cfg.server_accepted_queue_size,
+        'server.accepted_queue_timeout': cfg.server_accepted_queue_timeout,
+        'server.protocol_version':
+            'HTTP/1.1' if cfg.server_keep_alive else 'HTTP/1.0',
         # Avoid stating files once per second in production
         'engine.autoreload.on': cfg.develop,
     })
 
-    application = web_framework.get_wsgi_application()
-    cherrypy.tree.graft(application, cfg.server_dir)
+    with profiler.measure('cherrypy', 'mount web application'):
+        application = LongResponses(web_framework.get_wsgi_application(),
+                                    cfg.server_long_request_threads)
+        cherrypy.tree.graft(application, cfg.server_dir)
 
+    with profiler.measure('cherrypy', 'mount static directories'):
+        _mount_static_directories()
+
+    cherrypy.engine.signal_handler.subscribe()
+
+
+def _mount_static_directories():
+    """Serve static files of core and all apps."""
     static_dir = os.path.join(cfg.file_root, 'static')
     _mount_static_directory(static_dir, web_framework.get_static_url())
 
@@ -58,18 +127,125 @@ def init():
     _mount_static_directory('/usr/share/javascript', '/javascript')
 
     for module_name, module in module_loader.loaded_modules.items():
-        module_path = os.path.dirname(module.__file__)
-        static_dir = os.path.join(module_path, 'static')
-        if not os.path.isdir(static_dir):
-            continue
-
-        urlprefix = "%s%s" % (web_framework.get_static_url(), module_name)
-        _mount_static_directory(static_dir, urlprefix)
+        _mount_module_static_directory(module_name, module)
 
     for component in StaticFiles.list():
         component.mount()
 
-    cherrypy.engine.signal_handler.subscribe()
+    post_app_loading.connect(_on_post_app_loading)
+
+
+def _mount_module_static_directory(module_name, module):
+    """Serve static files shipped in an app's module directory."""
+    module_path = os.path.dirname(module.__file__)
+    static_dir = os.path.join(module_path, 'static')
+    if not os.path.isdir(static_dir):
+        return
+
+    urlprefix = "%s%s" % (web_framework.get_static_url(), module_name)
+    _mount_static_directory(static_dir, urlprefix)
+
+
+def _on_post_app_loading(sender, module_name, **kwargs):
+    """Serve static files of a module loaded after the server was setup."""
+    module = module_loader.loaded_modules[module_name]
+    _mount_module_static_directory(module_name, module)
+
+    app_ = getattr(module, 'app', None)
+    if app_:
+        for component in app_.get_components_of_type(StaticFiles):
+            component.mount()
+
+
+class LongResponses:
+    """WSGI middleware to send long responses using additional threads.
+
+    Streaming responses, such as backup downloads, occupy the thread serving
+    them until the client has received all of the data. For each such
+    response, a thread is added to the server's thread pool and removed once
+    the response is finished. This way, slow downloads don't leave fewer
+    threads for serving other pages. When the limit on additional threads is
+    reached, further streaming responses are refused. A limit of 0 disables
+    adding threads.
+
+    """
+
+    def __init__(self, application, max_threads):
+        """Initialize the middleware."""
+        self.application = application
+        self.max_threads = max_threads
+        self.semaphore = threading.BoundedSemaphore(max(max_threads, 1))
+
+    def __call__(self, environ, start_response):
+        """Run the application and add a thread for streaming responses."""
+        headers_sent = []
+
+        def _start_response(status, headers, exc_info=None):
+            """Delay starting response until it is known to be accepted."""
+            headers_sent[:] = [status, headers, exc_info]
+
+        result = self.application(environ, _start_response)
+        if not self.max_threads or not getattr(result, 'streaming', False):
+            start_response(*headers_sent)
+            return result
+
+        if not self.semaphore.acquire(blocking=False):
+            logger.warning('Too many long responses, refusing %s',
+                           environ.get('PATH_INFO'))
+            _close(result)
+            start_response('503 Service Unavailable',
+                           [('Content-Type', 'text/plain'),
+                            ('Retry-After', '60')])
+            return [b'Too many downloads in progress, try again later.']
+
+        _resize_thread_pool(1)
+        start_response(*headers_sent)
+        return _LongResponse(result, self._finish)
+
+    def _finish(self):
+        """Remove the thread added for a long response."""
+        _resize_thread_pool(-1)
+        self.semaphore.release()
+
+
+class _LongResponse:
+    """Iterable response that calls a method when closed by the server."""
+
+    def __init__(self, result, on_close):
+        """Initialize the response."""
+        self.result = result
+        self.on_close = on_close
+
+    def __iter__(self):
+        """Return an iterator over response data."""
+        return iter(self.result)
+
+    def close(self):
+        """Close the response and run the callback."""
+        try:
+            _close(self.result)
+        finally:
+            self.on_close()
+
+
+def _close(result):
+    """Close a WSGI response if it can be closed."""
+    close = getattr(result, 'close', None)
+    if close:
+        close()
+
+
+def _resize_thread_pool(amount):
+    """Add or remove threads from the web server's thread pool."""
+    server = getattr(cherrypy.server, 'httpserver', None)
+    pool = getattr(server, 'requests', None)
+    if not pool:
+        return
+
+    if amount > 0:
+        pool.grow(amount)
+    else:
+        pool.shrink(-amount)
 
 
 def run(on_web_server_stop):
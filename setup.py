@@ -53,6 +53,8 @@ REMOVED_FILES = [
 
 LOCALE_PATHS = ['plinth/locale']
 
+STATIC_DIRECTORIES = ['static'] + sorted(glob.glob('plinth/modules/*/static'))
+
 
 class DjangoCommand(Command):
     """Setup command to run a Django management command."""
@@ -103,9 +105,32 @@ class UpdateTranslations(DjangoCommand):
                      verbosity=1)
 
 
+class CompressStatic(Command):
+    """New command to precompress static files and write their manifests."""
+    description = 'precompress static files and hash their contents'
+    user_options = []
+
+    def initialize_options(self):
+        """Declare the options for this command."""
+        pass
+
+    def finalize_options(self):
+        """Declare options dependent on others."""
+        pass
+
+    def run(self):
+        """Execute the command."""
+        from plinth import static_assets
+        for directory in STATIC_DIRECTORIES:
+            log.info("compressing static files in '%s'", directory)
+            static_assets.build(directory)
+
+
 class CustomBuild(build):
-    """Override build command to add a subcommand for translations."""
-    sub_commands = [('compile_translations', None)] + build.sub_commands
+    """Override build command to add subcommands for translations and static
+    files."""
+    sub_commands = [('compile_translations', None),
+                    ('compress_static', None)] + build.sub_commands
 
 
 class CustomClean(clean):
@@ -122,6 +147,11 @@ class CustomClean(clean):
                     log.info("removing '%s'", file_path)
                     subprocess.check_call(['rm', '-f', file_path])
 
+        from plinth import static_assets
+        for directory in STATIC_DIRECTORIES:
+            log.info("removing compressed static files in '%s'", directory)
+            static_assets.clean(directory)
+
         clean.run(self)
 
 
@@ -317,6 +347,7 @@ setuptools.setup(
         'build': CustomBuild,
         'clean': CustomClean,
         'compile_translations': CompileTranslations,
+        'compress_static': CompressStatic,
         'install_data': CustomInstallData,
         'update_translations': UpdateTranslations,
     },